@@ -0,0 +1,194 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Optional
+
+import metrics
+
+# 🚦 Controle de admissão do /ws/chat (por worker):
+#   - WS_MAX_CONNECTIONS WebSockets abertos ao mesmo tempo
+#   - token bucket de mensagens por usuário e por IP (mensagens/minuto + rajada); sem
+#     login, "usuário" é a conexão, e o teto compartilhado por quem está atrás do mesmo
+#     NAT/proxy é o do IP. A mensagem só gasta ficha se os dois buckets permitem.
+#   - WS_MAX_INFLIGHT gerações simultâneas (busca + LLM); as demais esperam numa fila
+#     justa entre usuários (round-robin) e recebem a posição enquanto esperam
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "200"))
+WS_USER_RATE_PER_MIN = float(os.getenv("WS_USER_RATE_PER_MIN", "10"))
+WS_USER_BURST = int(os.getenv("WS_USER_BURST", "5"))
+WS_IP_RATE_PER_MIN = float(os.getenv("WS_IP_RATE_PER_MIN", "30"))
+WS_IP_BURST = int(os.getenv("WS_IP_BURST", "15"))
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "8"))
+
+# Buckets guardados (os menos usados saem primeiro)
+MAX_BUCKETS = 10_000
+
+_METRIC_REJEITADOS = metrics.counter(
+    "ws_admission_rejected_total", "Conexões/mensagens recusadas pelo controle de admissão, por motivo"
+)
+_METRIC_ESPERA = metrics.histogram(
+    "generation_queue_wait_seconds", "Espera na fila de gerações",
+    [0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60],
+)
+
+class LimitadorTaxa:
+    """Token buckets por chave: `taxa_por_min` fichas por minuto, até `rajada` acumuladas."""
+
+    def __init__(self, taxa_por_min: float, rajada: int, max_chaves: int = MAX_BUCKETS):
+        self.taxa = taxa_por_min / 60.0
+        self.rajada = max(rajada, 1)
+        self.max_chaves = max_chaves
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # chave -> (fichas, instante)
+
+    def _fichas(self, chave: str, agora: float) -> float:
+        fichas, instante = self._buckets.get(chave, (float(self.rajada), agora))
+        return min(float(self.rajada), fichas + (agora - instante) * self.taxa)
+
+    def espera(self, chave: str) -> float:
+        """Segundos até haver uma ficha (0 se já há), sem gastar."""
+        if self.taxa <= 0:
+            return 0.0
+        fichas = self._fichas(chave, time.monotonic())
+        return 0.0 if fichas >= 1 else (1 - fichas) / self.taxa
+
+    def consumir(self, chave: str) -> float:
+        """Gasta uma ficha. Retorna 0 se permitido, ou os segundos até a próxima ficha."""
+        if self.taxa <= 0:
+            return 0.0
+        agora = time.monotonic()
+        fichas = self._fichas(chave, agora)
+        self._buckets.pop(chave, None)
+        espera = 0.0
+        if fichas >= 1:
+            fichas -= 1
+        else:
+            espera = (1 - fichas) / self.taxa
+        self._buckets[chave] = (fichas, agora)
+        while len(self._buckets) > self.max_chaves:
+            self._buckets.popitem(last=False)
+        return espera
+
+def consumir_todos(limites: list[tuple[str, LimitadorTaxa, str]]) -> tuple[Optional[str], float]:
+    """
+    Confere todos os buckets [(motivo, limitador, chave)] antes de gastar: só consome
+    se todos permitem, para que uma mensagem recusada por um não gaste ficha do outro.
+    Retorna (None, 0) se permitido, ou o motivo e a espera do bucket mais restritivo.
+    """
+    motivo, espera = None, 0.0
+    for nome, limitador, chave in limites:
+        segundos = limitador.espera(chave)
+        if segundos > espera:
+            motivo, espera = nome, segundos
+    if motivo is None:
+        for _, limitador, chave in limites:
+            limitador.consumir(chave)
+    return motivo, espera
+
+class FilaGeracoes:
+    """
+    Limita as gerações simultâneas a `limite`. Quem não tem vaga espera numa fila por
+    usuário; as vagas liberadas são distribuídas em round-robin entre os usuários, para
+    que um usuário com várias perguntas não passe na frente dos outros.
+    Usar sempre do mesmo event loop.
+    """
+
+    def __init__(self, limite: int = WS_MAX_INFLIGHT):
+        self.limite = max(limite, 1)
+        self.ocupadas = 0
+        self._filas: OrderedDict[str, deque] = OrderedDict()   # usuário -> futures, na ordem de vez
+        self._mudou: Optional[asyncio.Event] = None
+
+    @property
+    def esperando(self) -> int:
+        return sum(len(fila) for fila in self._filas.values())
+
+    def posicao(self, usuario: str, futuro: asyncio.Future) -> int:
+        """Posição (1 = próximo) de um pedido na ordem round-robin."""
+        fila = self._filas.get(usuario)
+        if not fila or futuro not in fila:
+            return 0
+        indice = fila.index(futuro)
+        posicao = 1
+        antes = True
+        for outro, pedidos in self._filas.items():
+            if outro == usuario:
+                antes = False
+                posicao += indice
+            else:
+                posicao += min(len(pedidos), indice + 1 if antes else indice)
+        return posicao
+
+    async def entrar(self, usuario: str,
+                     avisar: Optional[Callable[[int], Awaitable[None]]] = None) -> None:
+        """Espera uma vaga; `avisar(posicao)` é chamado quando a posição na fila muda."""
+        if self.ocupadas < self.limite and not self._filas:
+            self.ocupadas += 1
+            _METRIC_ESPERA.observe(0.0)
+            return
+        if self._mudou is None:
+            self._mudou = asyncio.Event()
+        futuro = asyncio.get_running_loop().create_future()
+        self._filas.setdefault(usuario, deque()).append(futuro)
+        inicio = time.perf_counter()
+        ultima = None
+        try:
+            while not futuro.done():
+                posicao = self.posicao(usuario, futuro)
+                if avisar is not None and posicao != ultima:
+                    ultima = posicao
+                    await avisar(posicao)
+                if futuro.done():
+                    break
+                mudou = asyncio.ensure_future(self._mudou.wait())
+                try:
+                    await asyncio.wait({futuro, mudou}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    mudou.cancel()
+        except BaseException:
+            if futuro.done() and not futuro.cancelled():
+                self.sair()   # a vaga chegou junto com o cancelamento: devolve
+            else:
+                futuro.cancel()
+                self._remover(usuario, futuro)
+            raise
+        _METRIC_ESPERA.observe(time.perf_counter() - inicio)
+
+    def sair(self) -> None:
+        """Libera a vaga e a entrega ao próximo usuário da vez."""
+        self.ocupadas -= 1
+        while self._filas and self.ocupadas < self.limite:
+            usuario, fila = next(iter(self._filas.items()))
+            futuro = fila.popleft()
+            # O usuário vai para o fim da rodada (ou sai, se não tem mais pedidos)
+            del self._filas[usuario]
+            if fila:
+                self._filas[usuario] = fila
+            if futuro.done():
+                continue
+            self.ocupadas += 1
+            futuro.set_result(None)
+        self._notificar()
+
+    def _remover(self, usuario: str, futuro: asyncio.Future) -> None:
+        fila = self._filas.get(usuario)
+        if fila and futuro in fila:
+            fila.remove(futuro)
+            if not fila:
+                del self._filas[usuario]
+        self._notificar()
+
+    def _notificar(self) -> None:
+        # Acorda quem espera para recalcular a posição
+        if self._mudou is not None:
+            self._mudou.set()
+            self._mudou = asyncio.Event()
+
+def rejeitado(motivo: str) -> None:
+    _METRIC_REJEITADOS.inc(motivo=motivo)
+
+limitador_usuarios = LimitadorTaxa(WS_USER_RATE_PER_MIN, WS_USER_BURST)
+limitador_ips = LimitadorTaxa(WS_IP_RATE_PER_MIN, WS_IP_BURST)
+fila_geracoes = FilaGeracoes(WS_MAX_INFLIGHT)
+
+metrics.gauge("generation_queue_waiting", "Gerações esperando vaga na fila", lambda: fila_geracoes.esperando)
+metrics.gauge("generation_slots_busy", "Vagas de geração ocupadas", lambda: fila_geracoes.ocupadas)
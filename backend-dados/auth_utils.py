@@ -1,3 +1,10 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
 from fastapi import Request, HTTPException, status
 from fastapi.responses import RedirectResponse
 from jose import JWTError, jwt
@@ -5,12 +12,51 @@ from jose import JWTError, jwt
 SECRET_KEY = "segredo-teste"
 ALGORITHM = "HS256"
 
-def get_current_user(request: Request):
-    token = request.cookies.get("token")
+# Usuários com acesso às rotas /admin (separados por vírgula)
+ADMIN_USERS = {u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip()}
+
+# 🔑 Cache de tokens já verificados: sha256 do token -> (usuário, exp). Evita decodificar
+# e checar a assinatura do mesmo JWT a cada requisição; a entrada vale até o exp do token.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_tokens_verificados: OrderedDict[str, tuple[Optional[str], float]] = OrderedDict()
+_tokens_lock = threading.Lock()   # rotas síncronas rodam no threadpool
+
+def usuario_do_token(token: Optional[str]) -> Optional[str]:
+    """Usuário (sub) de um JWT válido e não expirado, ou None (sem redirecionar; ex.: WebSocket)."""
     if not token:
-        raise HTTPException(status_code=status.HTTP_303_SEE_OTHER, headers={"Location": "/login"})
+        return None
+    chave = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    agora = time.time()
+    with _tokens_lock:
+        encontrado = _tokens_verificados.get(chave)
+        if encontrado is not None:
+            usuario, exp = encontrado
+            if exp > agora:
+                _tokens_verificados.move_to_end(chave)
+                return usuario
+            del _tokens_verificados[chave]
+            return None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
     except JWTError:
+        return None
+    exp = float(payload.get("exp") or float("inf"))
+    with _tokens_lock:
+        _tokens_verificados[chave] = (payload.get("sub"), exp)
+        while len(_tokens_verificados) > AUTH_CACHE_SIZE:
+            _tokens_verificados.popitem(last=False)
+    return payload.get("sub")
+
+def get_current_user(request: Request):
+    usuario = usuario_do_token(request.cookies.get("token"))
+    if not usuario:
         raise HTTPException(status_code=status.HTTP_303_SEE_OTHER, headers={"Location": "/login"})
+    return usuario
+
+def get_admin_user(request: Request):
+    """Usuário autenticado que também está em ADMIN_USERS (403 para os demais)."""
+    user = get_current_user(request)
+    if user not in ADMIN_USERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito a administradores")
+    return user
@@ -0,0 +1,393 @@
+"""
+Benchmark ponta a ponta do /ws/chat com um LLM falso local (reprodutível, sem custo).
+
+Sobe dois processos:
+  - servidor falso compatível com a API Anthropic (POST /v1/messages, com e sem stream),
+    que responde com --tokens tokens após --ttft-ms, a --tokens-por-s tokens/s;
+  - o backend (uvicorn main:app) com LLM_BASE_URL apontando para o servidor falso e
+    LOGS_DB_PATH numa cópia temporária do logs.db (o banco real não é alterado).
+Depois, --alunos alunos simulados conectam no /ws/chat e enviam --perguntas perguntas
+cada (de logs.db, completadas com intent_examples.json), com --pausa-s entre elas.
+
+Mede tempo até o primeiro text_chunk (TTFT) e latência do turno (p50/p95/p99), vazão,
+CPU e pico de RSS do backend, e grava tudo em JSON (com o commit) em bench-results/.
+
+Uso:
+    cd backend-dados && python bench_e2e.py [--alunos 20] [--perguntas 5] [--ttft-ms 300]
+    cd backend-dados && python bench_e2e.py --comparar ../bench-results/a.json ../bench-results/b.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent
+BASE_DIR = BACKEND_DIR.parent
+LOGS_DB_PATH = str(BASE_DIR / "logs.db")
+RESULTADOS_DIR = BASE_DIR / "bench-results"
+
+PALAVRAS = (
+    "a camada silver consolida os leads em uma tabela única com eventos e a gold guarda "
+    "o score de cada lead para o CRM usar nas políticas de RLS do Supabase"
+).split()
+
+# ---------- Servidor falso compatível com Anthropic ----------
+
+def _criar_app_falso(ttft_ms: float, tokens_por_s: float, tokens: int):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+
+    def _texto(n: int) -> list[str]:
+        return [PALAVRAS[i % len(PALAVRAS)] + " " for i in range(n)]
+
+    def _sse(evento: str, dados: dict) -> bytes:
+        return f"event: {evento}\ndata: {json.dumps(dados)}\n\n".encode("utf-8")
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        corpo = await request.json()
+        n = min(tokens, int(corpo.get("max_tokens", tokens)))
+        mensagem = {
+            "id": "msg_bench", "type": "message", "role": "assistant", "model": corpo.get("model", "bench"),
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 0},
+        }
+        if not corpo.get("stream"):
+            await asyncio.sleep(ttft_ms / 1000 + n / max(tokens_por_s, 1e-9))
+            mensagem.update(content=[{"type": "text", "text": "".join(_texto(n))}], stop_reason="end_turn")
+            mensagem["usage"]["output_tokens"] = n
+            return JSONResponse(mensagem)
+
+        async def eventos():
+            yield _sse("message_start", {"type": "message_start", "message": mensagem})
+            yield _sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                               "content_block": {"type": "text", "text": ""}})
+            await asyncio.sleep(ttft_ms / 1000)
+            intervalo = 1 / tokens_por_s if tokens_por_s > 0 else 0
+            proximo = time.perf_counter()
+            for pedaco in _texto(n):
+                yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                   "delta": {"type": "text_delta", "text": pedaco}})
+                proximo += intervalo
+                espera = proximo - time.perf_counter()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+            yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield _sse("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn",
+                                         "stop_sequence": None}, "usage": {"output_tokens": n}})
+            yield _sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(eventos(), media_type="text/event-stream")
+
+    return app
+
+def _rodar_servidor_falso(porta: int, ttft_ms: float, tokens_por_s: float, tokens: int) -> None:
+    import uvicorn
+    uvicorn.run(_criar_app_falso(ttft_ms, tokens_por_s, tokens), host="127.0.0.1", port=porta, log_level="warning")
+
+# ---------- Processos e amostragem de CPU/RSS ----------
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _esperar_http(url: str, timeout: float, proc: Optional[subprocess.Popen] = None) -> None:
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"processo terminou (código {proc.returncode}) antes de {url} responder")
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} não respondeu em {timeout:.0f}s")
+
+class AmostradorProcesso(threading.Thread):
+    """CPU (utime+stime) e RSS de um processo pelo /proc, a cada `intervalo` segundos."""
+
+    def __init__(self, pid: int, intervalo: float = 0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.parar = threading.Event()
+        self.rss_mb: list[float] = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def cpu_s(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            campos = f.read().rsplit(")", 1)[1].split()
+        return (int(campos[11]) + int(campos[12])) / self._ticks
+
+    def rss(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+        return 0.0
+
+    def run(self):
+        while not self.parar.wait(self.intervalo):
+            try:
+                self.rss_mb.append(self.rss())
+            except OSError:
+                return
+
+# ---------- Alunos simulados ----------
+
+def _perguntas() -> list[str]:
+    perguntas: list[str] = []
+    try:
+        conn = sqlite3.connect(LOGS_DB_PATH)
+        try:
+            perguntas = [r[0] for r in conn.execute(
+                "SELECT pergunta FROM logs WHERE pergunta IS NOT NULL AND TRIM(pergunta) != '' ORDER BY id"
+            )]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+    if not perguntas:
+        with open(BACKEND_DIR / "intent_examples.json", "r", encoding="utf-8") as f:
+            perguntas = [p for exemplos in json.load(f).values() for p in exemplos]
+    return perguntas
+
+async def _aluno(url: str, subprotocolo: str, conversation_id: str, perguntas: list[str], pausa_s: float,
+                 turnos: list[dict], rng: random.Random) -> None:
+    import websockets
+
+    protocolos = [subprotocolo] if subprotocolo else None
+    async with websockets.connect(url, subprotocols=protocolos, max_size=None,
+                                  compression="deflate") as ws:
+        for pergunta in perguntas:
+            turno = {"ttft_s": None, "latencia_s": None, "frames": 0, "bytes": 0, "fila": False, "erro": None}
+            inicio = time.perf_counter()
+            # conversation_id próprio: sem ele o servidor gera conv_<segundo> e alunos que
+            # conectam juntos dividiriam o mesmo histórico
+            await ws.send(json.dumps({"message": pergunta, "conversation_id": conversation_id}))
+            while True:
+                bruto = await ws.recv()
+                turno["frames"] += 1
+                turno["bytes"] += len(bruto)
+                if isinstance(bruto, bytes):
+                    import msgpack
+                    msg = msgpack.unpackb(bruto, raw=False)
+                else:
+                    msg = json.loads(bruto)
+                tipo = msg.get("type")
+                if tipo == "text_chunk" and turno["ttft_s"] is None:
+                    turno["ttft_s"] = time.perf_counter() - inicio
+                elif tipo == "queued":
+                    turno["fila"] = True
+                elif tipo == "result":
+                    turno["latencia_s"] = time.perf_counter() - inicio
+                    break
+                elif tipo in ("error", "cancelled"):
+                    turno["erro"] = msg.get("error") or tipo
+                    break
+            turnos.append(turno)
+            await asyncio.sleep(pausa_s * rng.uniform(0.5, 1.5))
+
+def _percentis(valores: list[float]) -> dict:
+    if not valores:
+        return {}
+    valores = sorted(valores)
+
+    def p(q: float) -> float:
+        return round(valores[min(int(len(valores) * q), len(valores) - 1)] * 1000, 1)
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99), "max_ms": round(valores[-1] * 1000, 1)}
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+async def _carga(args, url: str) -> tuple[list[dict], float]:
+    perguntas = _perguntas()
+    rng = random.Random(args.seed)
+    turnos: list[dict] = []
+    tarefas = []
+    for aluno in range(args.alunos):
+        inicio = (aluno * args.perguntas) % len(perguntas)
+        lista = [perguntas[(inicio + i) % len(perguntas)] for i in range(args.perguntas)]
+        tarefas.append(_aluno(url, args.subprotocolo, f"bench_{args.seed}_{aluno}", lista, args.pausa_s,
+                              turnos, random.Random(rng.random())))
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*tarefas, return_exceptions=True)
+    for r in resultados:
+        if isinstance(r, Exception):
+            turnos.append({"ttft_s": None, "latencia_s": None, "frames": 0, "bytes": 0, "fila": False,
+                           "erro": f"conexão: {r}"})
+    return turnos, time.perf_counter() - inicio
+
+def _copiar_logs_db(destino: Path) -> None:
+    """Cópia consistente do logs.db (backup do SQLite) para o backend do benchmark gravar."""
+    origem = sqlite3.connect(LOGS_DB_PATH) if Path(LOGS_DB_PATH).exists() else None
+    copia = sqlite3.connect(destino)
+    try:
+        if origem is not None:
+            origem.backup(copia)
+    finally:
+        copia.close()
+        if origem is not None:
+            origem.close()
+
+def _executar(args) -> dict:
+    # Os turnos do benchmark (logs, health plan, jobs) vão para uma cópia temporária do
+    # logs.db: o banco real não recebe perguntas falsas e as próximas rodadas repetem as
+    # mesmas perguntas
+    tmp_dir = tempfile.TemporaryDirectory(prefix="bench-e2e-")
+    logs_db = Path(tmp_dir.name) / "logs.db"
+    _copiar_logs_db(logs_db)
+
+    porta_llm, porta_api = _porta_livre(), _porta_livre()
+    llm = subprocess.Popen(
+        [sys.executable, __file__, "--servidor-falso", "--porta", str(porta_llm), "--ttft-ms", str(args.ttft_ms),
+         "--tokens-por-s", str(args.tokens_por_s), "--tokens", str(args.tokens)],
+        cwd=BACKEND_DIR,
+    )
+    env = {
+        **os.environ,
+        "LLM_BASE_URL": f"http://127.0.0.1:{porta_llm}",
+        "MINIMAX_API_KEY": "bench",
+        "INDEX_WATCH": "0",
+        "LOGS_DB_PATH": str(logs_db),
+    }
+    if not args.manter_limites:
+        # Todos os alunos vêm do mesmo IP (um bucket por IP só) e mandam perguntas mais
+        # rápido que uma pessoa: sem os token buckets. Cada aluno é uma conexão anônima,
+        # então a fila justa continua em round-robin entre eles.
+        env.update(WS_IP_RATE_PER_MIN="0", WS_USER_RATE_PER_MIN="0")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta_api),
+         "--ws", "websockets", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL if args.silencioso else None,
+    )
+    try:
+        _esperar_http(f"http://127.0.0.1:{porta_llm}/docs", 60, llm)
+        inicio_subida = time.perf_counter()
+        _esperar_http(f"http://127.0.0.1:{porta_api}/metrics", args.timeout_subida, api)
+        subida_s = time.perf_counter() - inicio_subida
+
+        amostrador = AmostradorProcesso(api.pid)
+        rss_ocioso = amostrador.rss()
+        cpu_inicio = amostrador.cpu_s()
+        amostrador.start()
+        turnos, duracao = asyncio.run(_carga(args, f"ws://127.0.0.1:{porta_api}/ws/chat"))
+        amostrador.parar.set()
+        cpu = amostrador.cpu_s() - cpu_inicio
+        metricas = urllib.request.urlopen(f"http://127.0.0.1:{porta_api}/metrics", timeout=10).read().decode()
+    finally:
+        for proc in (api, llm):
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        tmp_dir.cleanup()
+
+    ok = [t for t in turnos if t["erro"] is None]
+    return {
+        "commit": _commit(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+                   if k not in ("comparar", "servidor_falso", "porta")},
+        "subida_s": round(subida_s, 2),
+        "duracao_s": round(duracao, 2),
+        "turnos": len(turnos),
+        "erros": len(turnos) - len(ok),
+        "exemplos_erro": sorted({t["erro"] for t in turnos if t["erro"]})[:5],
+        "vazao_turnos_por_s": round(len(ok) / duracao, 2) if duracao else 0.0,
+        "ttft": _percentis([t["ttft_s"] for t in ok if t["ttft_s"] is not None]),
+        "latencia": _percentis([t["latencia_s"] for t in ok]),
+        "frames_por_turno": round(sum(t["frames"] for t in ok) / max(len(ok), 1), 1),
+        "bytes_por_turno": round(sum(t["bytes"] for t in ok) / max(len(ok), 1)),
+        "turnos_em_fila": sum(t["fila"] for t in turnos),
+        "cpu_s": round(cpu, 2),
+        "cpu_pct": round(100 * cpu / duracao, 1) if duracao else 0.0,
+        "rss_ocioso_mb": round(rss_ocioso, 1),
+        "rss_pico_mb": round(max(amostrador.rss_mb, default=rss_ocioso), 1),
+        "metrics": metricas,
+    }
+
+# ---------- Comparação ----------
+
+CAMPOS_COMPARADOS = [
+    ("ttft", "p50_ms"), ("ttft", "p95_ms"), ("ttft", "p99_ms"),
+    ("latencia", "p50_ms"), ("latencia", "p95_ms"), ("latencia", "p99_ms"),
+    ("vazao_turnos_por_s", None), ("cpu_pct", None), ("rss_pico_mb", None),
+    ("frames_por_turno", None), ("bytes_por_turno", None), ("erros", None),
+]
+
+def _comparar(antes_path: str, depois_path: str) -> None:
+    with open(antes_path, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(depois_path, encoding="utf-8") as f:
+        depois = json.load(f)
+    print(f"{'':<22}{antes.get('commit') or 'antes':>12}{depois.get('commit') or 'depois':>12}{'Δ':>9}")
+    for campo, sub in CAMPOS_COMPARADOS:
+        a = antes.get(campo, {}).get(sub) if sub else antes.get(campo)
+        b = depois.get(campo, {}).get(sub) if sub else depois.get(campo)
+        nome = f"{campo}.{sub}" if sub else campo
+        delta = f"{(b - a) / a:+.0%}" if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a else ""
+        print(f"{nome:<22}{str(a):>12}{str(b):>12}{delta:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do /ws/chat com LLM falso")
+    parser.add_argument("--alunos", type=int, default=20)
+    parser.add_argument("--perguntas", type=int, default=5, help="perguntas por aluno")
+    parser.add_argument("--pausa-s", type=float, default=1.0, help="pausa média entre perguntas")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="atraso do primeiro token no LLM falso")
+    parser.add_argument("--tokens-por-s", type=float, default=80.0, help="vazão de tokens do LLM falso")
+    parser.add_argument("--tokens", type=int, default=300, help="tokens por resposta do LLM falso")
+    parser.add_argument("--subprotocolo", default="chat.v2.json", help='"" para o protocolo legado')
+    parser.add_argument("--manter-limites", action="store_true", help="não desliga os limites de taxa por IP/usuário")
+    parser.add_argument("--timeout-subida", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", type=Path, default=None, help="arquivo JSON (padrão: bench-results/e2e-<data>-<commit>.json)")
+    parser.add_argument("--silencioso", action="store_true", help="sem a saída do backend")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    parser.add_argument("--servidor-falso", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--porta", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servidor_falso:
+        _rodar_servidor_falso(args.porta, args.ttft_ms, args.tokens_por_s, args.tokens)
+        return
+    if args.comparar:
+        _comparar(*args.comparar)
+        return
+
+    resultado = _executar(args)
+    saida = args.saida or RESULTADOS_DIR / f"e2e-{datetime.now():%Y%m%d-%H%M%S}-{resultado['commit'] or 'sem-git'}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    print(f"👥 {args.alunos} alunos x {args.perguntas} perguntas: {resultado['turnos']} turnos, "
+          f"{resultado['erros']} erros, {resultado['vazao_turnos_por_s']} turnos/s")
+    print(f"⏱️ TTFT     {resultado['ttft']}")
+    print(f"⏱️ Latência {resultado['latencia']}")
+    print(f"🖥️ CPU {resultado['cpu_pct']}% | RSS ocioso {resultado['rss_ocioso_mb']} MB, "
+          f"pico {resultado['rss_pico_mb']} MB | {resultado['frames_por_turno']} frames/turno")
+    print(f"💾 {saida}")
+
+if __name__ == "__main__":
+    main()
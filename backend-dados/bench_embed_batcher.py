@@ -0,0 +1,78 @@
+"""
+Ganho do micro-batching de embeddings (embed_batcher.py) com usuários concorrentes.
+
+Cada usuário simulado envia --por-usuario perguntas em sequência; todos ao mesmo tempo.
+Compara embedding individual por pergunta (to_thread, como sem o batcher) com o
+MicroBatcher, e mostra vazão (perguntas/s), latência p50/p99 e tamanho médio do lote.
+
+Uso:
+    cd backend-dados && python bench_embed_batcher.py [--usuarios 1 8 32] [--janela-ms 3] [--max-lote 16]
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from embed_batcher import MicroBatcher, embed_queries_batch
+from embeddings import criar_embed_model
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+def _perguntas() -> list[str]:
+    with open(BACKEND_DIR / "intent_examples.json", "r", encoding="utf-8") as f:
+        return [p for perguntas in json.load(f).values() for p in perguntas]
+
+async def _rodar(usuarios: int, por_usuario: int, embed, perguntas: list[str]):
+    latencias: list[float] = []
+
+    async def usuario(u: int):
+        for i in range(por_usuario):
+            pergunta = perguntas[(u * por_usuario + i) % len(perguntas)]
+            inicio = time.perf_counter()
+            await embed(pergunta)
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario(u) for u in range(usuarios)))
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    return (
+        len(latencias) / total,
+        latencias[len(latencias) // 2] * 1e3,
+        latencias[min(int(len(latencias) * 0.99), len(latencias) - 1)] * 1e3,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão do micro-batcher de embeddings")
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--por-usuario", type=int, default=20)
+    parser.add_argument("--janela-ms", type=float, default=3.0)
+    parser.add_argument("--max-lote", type=int, default=16)
+    args = parser.parse_args()
+
+    model = criar_embed_model()
+    perguntas = _perguntas()
+    lote = embed_queries_batch(model)
+    lote(perguntas[:8])  # aquecimento
+
+    async def individual(pergunta):
+        return await asyncio.to_thread(model.get_query_embedding, pergunta)
+
+    for usuarios in args.usuarios:
+        tamanhos: list[int] = []
+
+        def lote_medido(textos):
+            tamanhos.append(len(textos))
+            return lote(textos)
+
+        batcher = MicroBatcher(lote_medido, max_batch=args.max_lote, window_ms=args.janela_ms)
+        sem = asyncio.run(_rodar(usuarios, args.por_usuario, individual, perguntas))
+        com = asyncio.run(_rodar(usuarios, args.por_usuario, batcher.embed, perguntas))
+        media_lote = sum(tamanhos) / max(len(tamanhos), 1)
+        print(f"👥 {usuarios:>3} usuários | sem lote: {sem[0]:7.1f} perg/s p50={sem[1]:6.1f} ms p99={sem[2]:6.1f} ms"
+              f" | micro-batch: {com[0]:7.1f} perg/s p50={com[1]:6.1f} ms p99={com[2]:6.1f} ms"
+              f" (lote médio {media_lote:.1f}) | ganho {com[0] / sem[0]:.2f}x")
+
+if __name__ == "__main__":
+    main()
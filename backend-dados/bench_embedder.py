@@ -0,0 +1,132 @@
+"""
+Paridade e desempenho dos backends de embedding (embeddings.py).
+
+  --paridade: embeda as mesmas frases com torch e ONNX (float32 e int8) e compara o
+              cosseno par a par; sai com código 1 se algum ficar abaixo de --min-cos.
+  (padrão):   para cada backend, num processo separado, mede import + carga do modelo,
+              latência p50/p99 de embedding de uma pergunta e o pico de RSS do processo.
+
+Frases: perguntas de logs.db, completadas com intent_examples.json.
+
+Uso:
+    cd backend-dados && python export_onnx.py --int8
+    cd backend-dados && python bench_embedder.py --paridade
+    cd backend-dados && python bench_embedder.py [--consultas 300] [--threads 1 4]
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+LOGS_DB_PATH = str(BACKEND_DIR.parent / "logs.db")
+
+BACKENDS = [("torch", "0"), ("onnx", "0"), ("onnx", "1")]
+
+def _frases(limite: int) -> list[str]:
+    frases: list[str] = []
+    try:
+        conn = sqlite3.connect(LOGS_DB_PATH)
+        try:
+            frases = [r[0] for r in conn.execute(
+                "SELECT pergunta FROM logs WHERE pergunta IS NOT NULL AND TRIM(pergunta) != '' ORDER BY id DESC LIMIT ?",
+                (limite,),
+            )]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+    if len(frases) < limite:
+        with open(BACKEND_DIR / "intent_examples.json", "r", encoding="utf-8") as f:
+            for perguntas in json.load(f).values():
+                frases.extend(perguntas)
+    return frases[:limite]
+
+def _nome(backend: str, int8: str) -> str:
+    return backend + ("-int8" if int8 == "1" else "")
+
+def _worker(consultas: int) -> None:
+    """Roda dentro do subprocesso (backend definido pelas variáveis de ambiente)."""
+    inicio = time.perf_counter()
+    from embeddings import criar_embed_model
+
+    model = criar_embed_model()
+    carga = time.perf_counter() - inicio
+
+    frases = _frases(consultas)
+    for frase in frases[:5]:
+        model.get_query_embedding(frase)  # aquecimento
+    latencias = []
+    for i in range(consultas):
+        t = time.perf_counter()
+        model.get_query_embedding(frases[i % len(frases)])
+        latencias.append((time.perf_counter() - t) * 1e3)
+    latencias.sort()
+    print(json.dumps({
+        "carga_s": round(carga, 2),
+        "p50_ms": round(latencias[len(latencias) // 2], 2),
+        "p99_ms": round(latencias[min(int(len(latencias) * 0.99), len(latencias) - 1)], 2),
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+def _paridade(limite: int, min_cos: float) -> int:
+    import numpy as np
+    import embeddings
+
+    frases = _frases(limite)
+    referencia = np.asarray(embeddings.criar_embed_model("torch").get_text_embedding_batch(frases))
+    falhou = False
+    for int8 in (False, True):
+        embeddings.EMBED_ONNX_INT8 = int8
+        try:
+            vetores = np.asarray(embeddings.criar_embed_model("onnx").get_text_embedding_batch(frases))
+        except FileNotFoundError as e:
+            print(f"⏭️ {e}")
+            continue
+        cos = (referencia * vetores).sum(axis=1) / (
+            np.linalg.norm(referencia, axis=1) * np.linalg.norm(vetores, axis=1)
+        )
+        nome = "onnx-int8" if int8 else "onnx"
+        ok = cos.min() >= min_cos
+        falhou |= not ok
+        print(f"{'✅' if ok else '❌'} {nome:<10} cosseno com torch: mín={cos.min():.4f} "
+              f"média={cos.mean():.4f} ({len(frases)} frases)")
+    return 1 if falhou else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e latência dos backends de embedding")
+    parser.add_argument("--paridade", action="store_true")
+    parser.add_argument("--min-cos", type=float, default=0.99)
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="EMBED_THREADS (0 = padrão)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args.consultas)
+        return
+    if args.paridade:
+        sys.exit(_paridade(args.consultas, args.min_cos))
+
+    for threads in args.threads:
+        for backend, int8 in BACKENDS:
+            env = {**os.environ, "EMBED_BACKEND": backend, "EMBED_ONNX_INT8": int8, "EMBED_THREADS": str(threads)}
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", "--consultas", str(args.consultas)],
+                env=env, cwd=BACKEND_DIR, capture_output=True, text=True,
+            )
+            nome = f"{_nome(backend, int8)} (threads={threads or 'padrão'})"
+            if proc.returncode != 0:
+                print(f"⏭️ {nome}: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'falhou'}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{nome:<30} carga={r['carga_s']:6.2f}s  p50={r['p50_ms']:7.2f} ms  "
+                  f"p99={r['p99_ms']:7.2f} ms  RSS={r['rss_mb']:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
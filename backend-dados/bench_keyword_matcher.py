@@ -0,0 +1,233 @@
+"""
+Micro-benchmark do classificador por palavras-chave (keyword_matcher).
+
+Compara as implementações antigas (checagens `in` sequenciais e listas recriadas a cada
+chamada) com os matchers pré-compilados, e confere que ambas classificam igual.
+
+Uso:
+    cd backend-dados && python bench_keyword_matcher.py [--n 20000]
+"""
+import argparse
+import sqlite3
+import timeit
+from pathlib import Path
+
+from keyword_matcher import categorias, classificar, is_saudacao
+
+BACKEND_DIR = Path(__file__).resolve().parent
+LOGS_DB_PATH = str(BACKEND_DIR.parent / "logs.db")
+
+PERGUNTAS_EXEMPLO = [
+    "oi",
+    "tudo bem?",
+    "meu nome é Ana, sou pediatra",
+    "Como montar meu health plan para pacientes com ansiedade?",
+    "Qual o valor que devo cobrar por consulta?",
+    "Como configurar RLS policies numa tabela do Supabase?",
+    "Me dá um exemplo prático de pipeline Bronze → Silver → Gold",
+    "Errei na função de trigger, não entendi o erro",
+    "Preciso de uma mensagem automática para o fim de semana",
+    "Faz um resumo da aula de ontem",
+    "Muitos perguntam como atrair pacientes sem marketing",
+    "explique o conceito de lead scoring no CRM",
+    "passo a passo para criar a camada gold",
+    "obrigado!",
+]
+
+# ---------- Implementações antigas (referência) ----------
+def _legacy_inferir_tipo_de_prompt(pergunta: str) -> str:
+    pergunta_lower = pergunta.lower()
+
+    # 📩 Mensagens automáticas (WhatsApp, e-mail, direct, etc.)
+    termos_mensagem_auto = [
+        "mensagem automática", "resposta automática", "mensagem padrão",
+        "robô", "responder depois", "responder mais tarde", "sem tempo para responder",
+        "fim de semana", "fora do horário", "mensagem fora do expediente"
+    ]
+    if any(t in pergunta_lower for t in termos_mensagem_auto):
+        return "mensagem_automatica"
+
+    # 🔎 Health Plan
+    if (
+        "health plan" in pergunta_lower
+        or "plano de tratamento" in pergunta_lower
+        or "meu health plan" in pergunta_lower
+        or "fazer meu health plan" in pergunta_lower
+        or "fazer meu plano" in pergunta_lower
+        or "dúvida no health" in pergunta_lower
+        or "dúvida no plano" in pergunta_lower
+        or "como montar meu health" in pergunta_lower
+        or "como montar meu plano" in pergunta_lower
+        or "criar meu plano" in pergunta_lower
+        or "montar health plan" in pergunta_lower
+        or "montar plano" in pergunta_lower
+        or ("sou pediatra" in pergunta_lower and "health" in pergunta_lower)
+        or ("sou psicóloga" in pergunta_lower and "ansiedade" in pergunta_lower)
+    ):
+        return "health_plan"
+
+    # 💰 Precificação
+    if (
+        "preço" in pergunta_lower
+        or "valor" in pergunta_lower
+        or "cobrar" in pergunta_lower
+        or "precificar" in pergunta_lower
+    ):
+        return "precificacao"
+
+    # 📣 Captação sem marketing digital
+    if (
+        "atrair pacientes" in pergunta_lower
+        or "sem marketing" in pergunta_lower
+        or "sem instagram" in pergunta_lower
+    ):
+        return "capitacao_sem_marketing_digital"
+
+    # 🔧 Aplicação prática
+    if (
+        "como aplicar" in pergunta_lower
+        or "exemplo prático" in pergunta_lower
+        or "na prática" in pergunta_lower
+    ):
+        return "aplicacao"
+
+    # ❌ Correção de erro
+    if (
+        "errei" in pergunta_lower
+        or "confundi" in pergunta_lower
+        or "não entendi" in pergunta_lower
+    ):
+        return "correcao"
+
+    # 🧠 Revisão rápida
+    if (
+        "resumo" in pergunta_lower
+        or "revisão" in pergunta_lower
+    ):
+        return "revisao"
+
+    # ❓ Dúvida frequente
+    if (
+        "muitos perguntam" in pergunta_lower
+        or "pergunta comum" in pergunta_lower
+    ):
+        return "faq"
+
+    # 📘 Explicação padrão
+    return "explicacao"
+
+def _legacy_detectar_cenario(pergunta: str) -> str:
+    pergunta = pergunta.lower()
+    
+    # Detecta perguntas técnicas sobre sistemas, banco de dados, arquitetura
+    termos_tecnicos = [
+        "data lake", "crm", "supabase", "postgres", "sql", "rls", "policy", "schema",
+        "bronze", "silver", "gold", "lead", "evento", "função", "trigger", "tabela"
+    ]
+    
+    if any(t in pergunta for t in termos_tecnicos):
+        return "duvida_tecnica"
+    
+    # Detecta perguntas gerais
+    if any(p in pergunta for p in [
+        "tenho uma dúvida", "tenho outra dúvida", "minha dúvida", "não entendi", "duvida", "dúvida", "me explica",
+        "poderia explicar", "por que", "como", "o que", "quais", "qual", "explique", "me fale", "exemplo", "caso prático",
+        "me mostre", "me explique", "?"
+    ]):
+        return "duvida_pontual"
+    elif any(p in pergunta for p in [
+        "exemplo prático", "me dá um exemplo", "passo a passo", "como fazer isso", "como faço", "me ensina", "ensinar", "me mostre como"
+    ]):
+        return "exemplo_pratico"
+    else:
+        return "geral"
+
+def _legacy_is_saudacao(question):
+    mensagem_generica = question.strip().lower()
+    saudacoes_vagas = [
+        "olá", "ola", "oi", "bom dia", "boa tarde", "boa noite", "pode me ajudar?", "oi, tudo bem?",
+        "olá bom dia", "tudo bem?", "tudo certo?", "como vai?", "você pode me ajudar?", "me ajuda?", "olá, boa noite"
+    ]
+    apresentacoes_vagas = ["meu nome é", "sou ", "me apresentando", "me apresento", "me chamo"]
+    return (
+        mensagem_generica in saudacoes_vagas
+        or any(mensagem_generica.startswith(apr) for apr in apresentacoes_vagas)
+    )
+
+def _legacy_flags_contexto(lower):
+    flags = set()
+    for frase in ("não tenho certeza", "desculpe", "não sei"):
+        if frase in lower:
+            flags.add("incerteza")
+    proibidos = [
+        "instagram", "vídeos para instagram", "celular para gravar", "smartphone",
+        "tiktok", "post viral", "gravar vídeos", "microfone", "câmera",
+        "edição de vídeo", "hashtags", "stories", "marketing de conteúdo",
+        "produção de vídeo", "influencer"
+    ]
+    if any(tp in lower for tp in proibidos):
+        flags.add("proibido")
+    return flags
+
+# ---------- Benchmark ----------
+
+def _carregar_perguntas_logs(limite=2000):
+    try:
+        conn = sqlite3.connect(LOGS_DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT pergunta FROM logs WHERE pergunta IS NOT NULL ORDER BY id DESC LIMIT ?", (limite,))
+        perguntas = [row[0] for row in cursor.fetchall() if row[0]]
+        conn.close()
+        return perguntas
+    except Exception:
+        return []
+
+def _carregar_contextos(tamanho=1500, quantidade=20):
+    texto = (BACKEND_DIR / "transcricoes.txt").read_text(encoding="utf-8", errors="ignore")
+    passo = max(1, len(texto) // quantidade)
+    return [texto[i:i + tamanho].lower() for i in range(0, passo * quantidade, passo)]
+
+def _legacy_turno(pergunta):
+    return (_legacy_inferir_tipo_de_prompt(pergunta), _legacy_detectar_cenario(pergunta), _legacy_is_saudacao(pergunta))
+
+def _novo_turno(pergunta):
+    return (classificar("tipo_prompt", pergunta), classificar("cenario", pergunta), is_saudacao(pergunta))
+
+def _medir(func, itens, n, repeticoes=5):
+    """Melhor de `repeticoes` rodadas, em µs por item."""
+    def rodada():
+        for item in itens:
+            func(item)
+    numero = max(1, n // len(itens))
+    melhor = min(timeit.repeat(rodada, number=numero, repeat=repeticoes))
+    return melhor / (numero * len(itens)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do keyword_matcher")
+    parser.add_argument("--n", type=int, default=20000, help="número de classificações por medição")
+    args = parser.parse_args()
+
+    perguntas = PERGUNTAS_EXEMPLO + _carregar_perguntas_logs()
+    contextos = _carregar_contextos()
+
+    # Equivalência com as regras antigas
+    divergencias = [p for p in perguntas if _legacy_turno(p) != _novo_turno(p)]
+    divergencias += [c[:60] for c in contextos if _legacy_flags_contexto(c) != categorias("contexto", c, minusculo=True)]
+    print(f"✅ {len(perguntas)} perguntas e {len(contextos)} contextos conferidos, {len(divergencias)} divergências")
+    for d in divergencias[:10]:
+        print(f"   ⚠️ {d!r}")
+
+    resultados = [
+        ("turno (tipo_prompt + cenário + saudação)", _legacy_turno, _novo_turno, perguntas),
+        ("tipo_prompt", _legacy_inferir_tipo_de_prompt, lambda p: classificar("tipo_prompt", p), perguntas),
+        ("cenário", _legacy_detectar_cenario, lambda p: classificar("cenario", p), perguntas),
+        ("filtro de contexto (~1500 chars)", _legacy_flags_contexto, lambda c: categorias("contexto", c, minusculo=True), contextos),
+    ]
+    print(f"\n{'medição':<42}{'antigo (µs)':>14}{'novo (µs)':>12}{'ganho':>9}")
+    for nome, antigo, novo, itens in resultados:
+        t_antigo = _medir(antigo, itens, args.n)
+        t_novo = _medir(novo, itens, args.n)
+        print(f"{nome:<42}{t_antigo:>14.2f}{t_novo:>12.2f}{t_antigo / t_novo:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
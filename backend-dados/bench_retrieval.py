@@ -0,0 +1,307 @@
+"""
+Benchmark e regressão da busca (search_engine) sobre o índice persistido em storage/.
+
+Mede, num conjunto fixo de perguntas:
+  - carga a frio: import do search_engine (modelo de embedding + índice da versão ativa)
+    e recargas do índice (load_vector_index + load_lexical_index);
+  - latência do embedding da pergunta, da busca (retrieve_nodes, com o embedding pronto),
+    da busca + reranker (retrieve_scored_context) e de ponta a ponta
+    (retrieve_relevant_context, com o embedding calculado como no /ws/chat);
+  - qualidade: recall@k e MRR dos candidatos da busca e acerto no contexto final,
+    contra as perguntas rotuladas de retrieval_labels.json; perguntas fora do tema
+    (sem trechos esperados) precisam voltar com o contexto vazio.
+
+Serve para validar um formato de índice, quantização (VECTOR_STORE=int8) ou modo de busca
+(RETRIEVAL_MODE) novo nas duas frentes. O resultado vai em JSON (com o commit e a
+configuração) para bench-results/; --comparar mostra a diferença entre dois resultados e
+--min-recall faz o script sair com erro se o acerto no contexto cair abaixo do mínimo.
+
+Uso:
+    cd backend-dados && python bench_retrieval.py [--repeticoes 5] [--k 1 3 5 12] [--min-recall 0.8]
+    cd backend-dados && python bench_retrieval.py --comparar ../bench-results/a.json ../bench-results/b.json
+
+retrieval_labels.json: lista de {"pergunta": "...", "trechos": ["...", ...]}; a pergunta
+acerta quando um chunk recuperado contém algum dos trechos (sem diferenciar maiúsculas e
+espaços). Trechos curtos sobrevivem a rechunking, ao contrário de ids de chunk.
+"trechos": [] marca uma pergunta fora do tema (acerta se o contexto vier vazio).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from bench_e2e import RESULTADOS_DIR, _commit
+
+BACKEND_DIR = Path(__file__).resolve().parent
+LOGS_DB_PATH = str(BACKEND_DIR.parent / "logs.db")
+ROTULOS_PATH = BACKEND_DIR / "retrieval_labels.json"
+
+# top_k do /ws/chat (retrieve_relevant_context padrão)
+TOP_K_CONTEXTO = 3
+
+CAMPOS_COMPARADOS = [
+    ("carga", "import_s"), ("carga", "recarga_p50_s"),
+    ("embedding", "p50_ms"), ("embedding", "p95_ms"),
+    ("busca", "p50_ms"), ("busca", "p95_ms"),
+    ("busca_rerank", "p50_ms"), ("busca_rerank", "p95_ms"),
+    ("ponta_a_ponta", "p50_ms"), ("ponta_a_ponta", "p95_ms"),
+    ("recall", None), ("mrr", None), ("acerto_contexto", None), ("rejeicao_fora_do_tema", None),
+]
+
+def _normalizar(texto: str) -> str:
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+def _carregar_rotulos(path: Path) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        rotulos = [r for r in json.load(f) if r.get("pergunta") and isinstance(r.get("trechos"), list)]
+    for r in rotulos:
+        r["trechos"] = [_normalizar(t) for t in r["trechos"]]
+    return rotulos
+
+def _perguntas_de_logs(limite: int) -> list[str]:
+    if limite <= 0:
+        return []
+    conn = sqlite3.connect(LOGS_DB_PATH)
+    try:
+        return [r[0] for r in conn.execute(
+            "SELECT pergunta FROM logs WHERE pergunta IS NOT NULL AND TRIM(pergunta) != '' ORDER BY id DESC LIMIT ?",
+            (limite,),
+        )]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+def _acerta(texto: str, trechos: list[str]) -> bool:
+    texto = _normalizar(texto)
+    return any(t in texto for t in trechos)
+
+def _percentis(segundos: list[float]) -> dict:
+    if not segundos:
+        return {}
+    ms = np.asarray(segundos) * 1e3
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+def _cronometrar(funcao, *args, **kwargs):
+    # As funções da busca imprimem DEBUG a cada chamada; fora da medição
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        return resultado, time.perf_counter() - inicio
+
+def _medir_carga(cargas: int) -> tuple[dict, object]:
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import search_engine
+    import_s = time.perf_counter() - inicio
+
+    import index_store
+    path = index_store.version_dir(search_engine.index_version)
+    recargas = []
+    for _ in range(cargas):
+        def carregar():
+            vetorial = search_engine.load_vector_index(path)
+            return vetorial, search_engine.load_lexical_index(path, vetorial)
+        _, segundos = _cronometrar(carregar)
+        recargas.append(segundos)
+    carga = {"import_s": round(import_s, 3)}
+    if recargas:
+        carga["recarga_p50_s"] = round(float(np.median(recargas)), 3)
+        carga["recarga_max_s"] = round(max(recargas), 3)
+    return carga, search_engine
+
+def _medir_latencias(se, perguntas: list[str], repeticoes: int, top_k: int) -> dict:
+    tempos = {"embedding": [], "busca": [], "busca_rerank": [], "ponta_a_ponta": []}
+
+    def ponta_a_ponta(pergunta: str) -> str:
+        # Mesmo caminho do /ws/chat: pergunta de termo exato não calcula embedding
+        embedding = None if se.lexical_fast_path(pergunta) else se.embed_question(pergunta)
+        return se.retrieve_relevant_context(pergunta, query_embedding=embedding)
+
+    # Primeira passada só aquece (caches do tokenizador, do modelo e do reranker)
+    for pergunta in perguntas:
+        embedding, _ = _cronometrar(se.embed_question, pergunta)
+        _cronometrar(se.retrieve_scored_context, pergunta, TOP_K_CONTEXTO, embedding)
+    for _ in range(repeticoes):
+        for pergunta in perguntas:
+            embedding, segundos = _cronometrar(se.embed_question, pergunta)
+            tempos["embedding"].append(segundos)
+            tempos["busca"].append(_cronometrar(se.retrieve_nodes, pergunta, top_k, embedding)[1])
+            tempos["busca_rerank"].append(
+                _cronometrar(se.retrieve_scored_context, pergunta, TOP_K_CONTEXTO, embedding)[1]
+            )
+            tempos["ponta_a_ponta"].append(_cronometrar(ponta_a_ponta, pergunta)[1])
+    return {nome: _percentis(valores) for nome, valores in tempos.items()}
+
+def _checar_fora_do_tema(se) -> None:
+    """O reranker descarta chunk sem nenhum termo da pergunta, mesmo com cosseno alto."""
+    from llama_index.core.schema import NodeWithScore, TextNode
+    from reranker import RERANKER, rerank
+
+    if RERANKER != "overlap":
+        return
+    node = TextNode(text="Health Plan: como apresentar o plano de tratamento ao paciente.", id_="bench-checagem")
+    pontuados = rerank("xyzzy plugh quasar", [NodeWithScore(node=node, score=1.0)], TOP_K_CONTEXTO,
+                       se.lexical_index, similaridades={"bench-checagem": 0.95})
+    if pontuados:
+        raise SystemExit(f"❌ Reranker aceitou um chunk sem termos da pergunta: {pontuados}")
+
+def _medir_qualidade(se, rotulos: list[dict], ks: list[int], verboso: bool) -> dict:
+    fora_do_tema = [r for r in rotulos if not r["trechos"]]
+    rotulos = [r for r in rotulos if r["trechos"]]
+    rejeitadas = 0
+    for rotulo in fora_do_tema:
+        embedding = None if se.lexical_fast_path(rotulo["pergunta"]) else se.embed_question(rotulo["pergunta"])
+        contexto, _ = _cronometrar(se.retrieve_relevant_context, rotulo["pergunta"], query_embedding=embedding)
+        rejeitadas += not contexto
+        if verboso:
+            print(f"{'✅' if not contexto else '❌'} fora do tema  {rotulo['pergunta']}")
+
+    acertos = {k: 0 for k in ks}
+    rr_total = 0.0
+    acertos_contexto = 0
+    erros = []
+    for rotulo in rotulos:
+        pergunta, trechos = rotulo["pergunta"], rotulo["trechos"]
+        embedding = None if se.lexical_fast_path(pergunta) else se.embed_question(pergunta)
+        nodes, _ = _cronometrar(se.retrieve_nodes, pergunta, max(ks), embedding)
+        posicao: Optional[int] = next(
+            (i for i, n in enumerate(nodes, start=1) if _acerta(n.node.get_content(), trechos)), None
+        )
+        for k in ks:
+            acertos[k] += posicao is not None and posicao <= k
+        rr_total += 1.0 / posicao if posicao else 0.0
+        contexto, _ = _cronometrar(se.retrieve_relevant_context, pergunta, query_embedding=embedding)
+        no_contexto = _acerta(contexto, trechos)
+        acertos_contexto += no_contexto
+        if not no_contexto:
+            erros.append({"pergunta": pergunta, "posicao_busca": posicao})
+        if verboso:
+            print(f"{'✅' if no_contexto else '❌'} posição {posicao or '-':>3}  {pergunta}")
+    n = max(len(rotulos), 1)
+    return {
+        "perguntas_rotuladas": len(rotulos),
+        "recall": {f"@{k}": round(acertos[k] / n, 3) for k in ks},
+        "mrr": round(rr_total / n, 3),
+        "acerto_contexto": round(acertos_contexto / n, 3),
+        "fora_do_tema": len(fora_do_tema),
+        "rejeicao_fora_do_tema": round(rejeitadas / max(len(fora_do_tema), 1), 3) if fora_do_tema else None,
+        "falhas": erros,
+    }
+
+def _comparar(antes_path: str, depois_path: str) -> None:
+    with open(antes_path, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(depois_path, encoding="utf-8") as f:
+        depois = json.load(f)
+
+    def linhas():
+        for campo, sub in CAMPOS_COMPARADOS:
+            if campo == "recall":
+                for chave in sorted(set(antes.get("recall", {})) | set(depois.get("recall", {})),
+                                    key=lambda c: int(c[1:])):
+                    yield f"recall{chave}", antes.get("recall", {}).get(chave), depois.get("recall", {}).get(chave)
+            elif sub:
+                yield f"{campo}.{sub}", antes.get(campo, {}).get(sub), depois.get(campo, {}).get(sub)
+            else:
+                yield campo, antes.get(campo), depois.get(campo)
+
+    print(f"{'':<24}{antes.get('commit') or 'antes':>12}{depois.get('commit') or 'depois':>12}{'Δ':>9}")
+    for nome, a, b in linhas():
+        delta = f"{(b - a) / a:+.0%}" if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a else ""
+        print(f"{nome:<24}{str(a):>12}{str(b):>12}{delta:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência e recall@k da busca sobre o índice persistido")
+    parser.add_argument("--rotulos", type=Path, default=ROTULOS_PATH, help="perguntas rotuladas (JSON)")
+    parser.add_argument("--perguntas-log", type=int, default=0,
+                        help="acrescenta as N perguntas mais recentes de logs.db à medição de latência")
+    parser.add_argument("--repeticoes", type=int, default=5, help="passadas de medição sobre as perguntas")
+    parser.add_argument("--cargas", type=int, default=2, help="recargas do índice medidas")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 12])
+    parser.add_argument("--min-recall", type=float, default=None,
+                        help="sai com código 1 se o acerto no contexto final ficar abaixo disso")
+    parser.add_argument("--saida", type=Path, default=None,
+                        help="arquivo JSON (padrão: bench-results/retrieval-<data>-<commit>.json)")
+    parser.add_argument("--verboso", action="store_true", help="mostra o resultado de cada pergunta rotulada")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args()
+
+    if args.comparar:
+        _comparar(*args.comparar)
+        return
+
+    rotulos = _carregar_rotulos(args.rotulos)
+    if not rotulos:
+        raise SystemExit(f"Nenhuma pergunta rotulada em {args.rotulos}")
+    perguntas = [r["pergunta"] for r in rotulos] + _perguntas_de_logs(args.perguntas_log)
+    ks = sorted(set(k for k in args.k if k > 0))
+
+    carga, se = _medir_carga(args.cargas)
+    print(f"📦 Índice {se.index_version or 'legado'}: {len(se.index.docstore.docs)} chunks | "
+          f"import {carga['import_s']}s | recarga {carga.get('recarga_p50_s', '-')}s")
+
+    _checar_fora_do_tema(se)
+    latencias = _medir_latencias(se, perguntas, args.repeticoes, max(ks))
+    qualidade = _medir_qualidade(se, rotulos, ks, args.verboso)
+
+    from embeddings import descricao_backend
+    resultado = {
+        "commit": _commit(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "index_version": se.index_version,
+            "chunks": len(se.index.docstore.docs),
+            "retrieval_mode": se.RETRIEVAL_MODE,
+            "vector_store": se.VECTOR_STORE,
+            "embed_backend": descricao_backend(),
+            "rerank_candidates": se.RERANK_CANDIDATES,
+            "perguntas": len(perguntas),
+            "repeticoes": args.repeticoes,
+            "ambiente": {k: os.environ[k] for k in sorted(os.environ)
+                         if k.startswith(("RETRIEVAL_", "VECTOR_", "EMBED_", "RERANK_", "HYBRID_",
+                                          "LEXICAL_", "INT8_", "CHUNK_"))},
+        },
+        "carga": carga,
+        **latencias,
+        **qualidade,
+    }
+    saida = args.saida or RESULTADOS_DIR / f"retrieval-{datetime.now():%Y%m%d-%H%M%S}-{resultado['commit'] or 'sem-git'}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    for nome in ("embedding", "busca", "busca_rerank", "ponta_a_ponta"):
+        print(f"⏱️ {nome:<14} {resultado[nome]}")
+    recall = "  ".join(f"recall{k}={v:.0%}" for k, v in resultado["recall"].items())
+    print(f"🎯 {recall}  MRR={resultado['mrr']:.3f}  contexto={resultado['acerto_contexto']:.0%} "
+          f"({resultado['perguntas_rotuladas']} perguntas)")
+    if resultado["fora_do_tema"]:
+        print(f"🚫 Fora do tema com contexto vazio: {resultado['rejeicao_fora_do_tema']:.0%} "
+              f"({resultado['fora_do_tema']} perguntas)")
+    print(f"💾 {saida}")
+
+    if args.min_recall is not None and resultado["acerto_contexto"] < args.min_recall:
+        print(f"❌ Acerto no contexto {resultado['acerto_contexto']:.0%} abaixo do mínimo {args.min_recall:.0%}")
+        sys.exit(1)
+    if args.min_recall is not None and resultado["rejeicao_fora_do_tema"] not in (None, 1.0):
+        print("❌ Pergunta fora do tema voltou com contexto")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
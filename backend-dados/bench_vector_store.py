@@ -0,0 +1,126 @@
+"""
+Benchmark do vector store: SimpleVectorStore atual (listas de floats) x float32 x int8.
+
+Mede, sobre os vetores de storage/ (versão ativa), recall@k contra a busca exata,
+memória residente dos vetores e latência por consulta. Consultas: vetores do próprio
+índice com ruído gaussiano (--ruido), ou perguntas reais de logs.db embedadas com o
+modelo da busca (--perguntas, carrega o MiniLM). --escala replica o corpus com ruído
+para simular o curso inteiro.
+
+Uso:
+    cd backend-dados && python bench_vector_store.py [--consultas 200] [--escala 50000] [--perguntas]
+"""
+import argparse
+import gc
+import json
+import sqlite3
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import index_store
+from int8_vectors import Int8Vectors, _normalizar
+
+BACKEND_DIR = Path(__file__).resolve().parent
+LOGS_DB_PATH = str(BACKEND_DIR.parent / "logs.db")
+
+def _carregar_embeddings(escala: int, ruido: float, rng) -> dict[str, list[float]]:
+    path = index_store.current_version_dir() / "default__vector_store.json"
+    with open(path, "r", encoding="utf-8") as f:
+        embeddings = json.load(f)["embedding_dict"]
+    base = list(embeddings.items())
+    i = 0
+    while len(embeddings) < escala:
+        node_id, vetor = base[i % len(base)]
+        v = np.asarray(vetor, dtype=np.float32)
+        embeddings[f"{node_id}-r{i}"] = (v + rng.normal(0, ruido * np.abs(v).mean(), v.shape)).tolist()
+        i += 1
+    return embeddings
+
+def _consultas_sinteticas(matriz: np.ndarray, n: int, ruido: float, rng) -> np.ndarray:
+    base = matriz[rng.integers(0, len(matriz), n)]
+    return _normalizar(base + rng.normal(0, ruido * np.abs(base).mean(), base.shape).astype(np.float32))
+
+def _consultas_reais(n: int) -> np.ndarray:
+    conn = sqlite3.connect(LOGS_DB_PATH)
+    try:
+        perguntas = [r[0] for r in conn.execute(
+            "SELECT pergunta FROM logs WHERE pergunta IS NOT NULL AND TRIM(pergunta) != '' ORDER BY id DESC LIMIT ?",
+            (n,),
+        )]
+    except sqlite3.OperationalError:
+        perguntas = []
+    finally:
+        conn.close()
+    if not perguntas:
+        raise SystemExit("Nenhuma pergunta em logs.db; rode sem --perguntas")
+    from llama_index.core import Settings
+    import search_engine  # noqa: F401  (configura o modelo de embedding)
+    return _normalizar(np.asarray(Settings.embed_model.get_text_embedding_batch(perguntas), dtype=np.float32))
+
+def _busca_simple(embedding_dict: dict[str, list[float]], consulta: list[float], k: int) -> list[str]:
+    """Mesmo caminho do SimpleVectorStore.query: lista -> np.array -> cosseno a cada consulta."""
+    ids = list(embedding_dict)
+    matriz = np.array([embedding_dict[i] for i in ids])
+    q = np.array(consulta)
+    sims = matriz @ q / (np.linalg.norm(matriz, axis=1) * np.linalg.norm(q))
+    return [ids[i] for i in np.argsort(-sims)[:k]]
+
+def _medir(nome: str, buscar, consultas, verdade: list[list[str]], k: int, memoria: int):
+    latencias, acertos = [], 0
+    for consulta, esperado in zip(consultas, verdade):
+        inicio = time.perf_counter()
+        obtido = buscar(consulta, k)
+        latencias.append(time.perf_counter() - inicio)
+        acertos += len(set(obtido) & set(esperado))
+    lat = np.asarray(latencias) * 1e3
+    recall = acertos / max(len(verdade) * k, 1)
+    print(f"{nome:<28} recall@{k}={recall:6.1%}  memória={memoria / 1e6:8.2f} MB  "
+          f"p50={np.percentile(lat, 50):7.3f} ms  p99={np.percentile(lat, 99):7.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall x memória x latência dos vector stores")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--escala", type=int, default=0, help="número total de vetores (replica com ruído)")
+    parser.add_argument("--ruido", type=float, default=0.3, help="ruído relativo das consultas sintéticas")
+    parser.add_argument("--perguntas", action="store_true", help="usa perguntas de logs.db como consultas")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 12])
+    parser.add_argument("--rescore", type=int, default=10, help="fator de rescoring do int8")
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    gc.collect()
+    tracemalloc.start()
+    embedding_dict = _carregar_embeddings(args.escala, 0.05, rng)
+    memoria_simple = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    ids = list(embedding_dict)
+    matriz = _normalizar(np.asarray([embedding_dict[i] for i in ids], dtype=np.float32))
+    int8 = Int8Vectors.construir(embedding_dict)
+    print(f"📦 {len(ids)} vetores de {matriz.shape[1]} dimensões")
+
+    consultas = _consultas_reais(args.consultas) if args.perguntas else \
+        _consultas_sinteticas(matriz, args.consultas, args.ruido, rng)
+
+    def busca_float32(consulta, k):
+        sims = matriz @ consulta
+        top = np.argpartition(-sims, k - 1)[:k]
+        return [ids[i] for i in top[np.argsort(-sims[top])]]
+
+    for k in args.k:
+        verdade = [busca_float32(c, k) for c in consultas]
+        print(f"\n— top {k} —")
+        _medir("simple (atual)", lambda c, k: _busca_simple(embedding_dict, c.tolist(), k),
+               consultas, verdade, k, memoria_simple)
+        _medir("float32 numpy", busca_float32, consultas, verdade, k, matriz.nbytes)
+        _medir("int8 sem rescoring", lambda c, k: [i for i, _ in int8.buscar(c, k, rescore_factor=0)],
+               consultas, verdade, k, int8.nbytes_residentes())
+        _medir(f"int8 + rescoring x{args.rescore}",
+               lambda c, k: [i for i, _ in int8.buscar(c, k, rescore_factor=args.rescore)],
+               consultas, verdade, k, int8.nbytes_residentes())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import threading
+from typing import Iterable
+
+from keyword_matcher import categorias, fingerprint
+
+# 🚩 Flags de política por chunk (grupo "contexto" de keyword_rules.json: incerteza,
+# proibido), calculadas no build do índice e guardadas nos metadados do node.
+# Na busca, filtrar vira consulta a um conjunto em vez de varrer o texto.
+
+GRUPO = "contexto"
+FLAGS_KEY = "flags_contexto"
+FLAGS_REGRAS_KEY = "flags_regras"   # fingerprint das regras usadas no cálculo
+
+# Flag extra (não vem das regras): chunk sem texto útil
+FLAG_VAZIO = "vazio"
+
+def calcular_flags(texto: str) -> frozenset[str]:
+    lower = texto.strip().lower()
+    if not lower or lower in ("none", "null"):
+        return frozenset({FLAG_VAZIO})
+    return frozenset(categorias(GRUPO, lower, minusculo=True))
+
+def anotar_nodes(nodes: Iterable) -> list:
+    """
+    Grava as flags nos metadados dos nodes cujas flags faltam ou foram calculadas
+    com outras regras. Os metadados ficam fora do texto de embedding e do LLM.
+    Retorna os nodes alterados (para regravar no docstore).
+    """
+    atual = fingerprint(GRUPO)
+    alterados = []
+    for node in nodes:
+        if node.metadata.get(FLAGS_REGRAS_KEY) == atual:
+            continue
+        node.metadata[FLAGS_KEY] = sorted(calcular_flags(node.get_content()))
+        node.metadata[FLAGS_REGRAS_KEY] = atual
+        for chave in (FLAGS_KEY, FLAGS_REGRAS_KEY):
+            if chave not in node.excluded_embed_metadata_keys:
+                node.excluded_embed_metadata_keys.append(chave)
+            if chave not in node.excluded_llm_metadata_keys:
+                node.excluded_llm_metadata_keys.append(chave)
+        alterados.append(node)
+    return alterados
+
+# Regras mudaram depois do build: flags recalculadas uma vez por node e guardadas aqui
+_recalculadas: dict[str, frozenset[str]] = {}
+_recalculadas_regras = ""
+_lock = threading.Lock()
+
+def flags_do_node(node) -> frozenset[str]:
+    """Flags do node: as do build, ou recalculadas (uma vez) se as regras mudaram."""
+    global _recalculadas, _recalculadas_regras
+    atual = fingerprint(GRUPO)
+    if node.metadata.get(FLAGS_REGRAS_KEY) == atual:
+        return frozenset(node.metadata.get(FLAGS_KEY, ()))
+    with _lock:
+        if _recalculadas_regras != atual:
+            _recalculadas, _recalculadas_regras = {}, atual
+        flags = _recalculadas.get(node.node_id)
+        if flags is None:
+            flags = _recalculadas[node.node_id] = calcular_flags(node.get_content())
+    return flags
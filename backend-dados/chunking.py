@@ -0,0 +1,210 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# ✂️ Chunking das transcrições no build do índice: fronteiras em parágrafos e frases
+# (nunca no meio de uma frase, exceto frases maiores que o chunk), blocos de código
+# inteiros, sobreposição configurável e metadados de origem por chunk.
+
+# Tamanho e sobreposição em tokens (contar_tokens: tokenizador do llama_index, o mesmo
+# no build e no orçamento da expansão de vizinhos na busca).
+# Chunks pequenos: o MiniLM só embeda os primeiros 128 tokens (embeddings.MAX_LENGTH);
+# o contexto maior vem da expansão para os vizinhos na busca (search_engine).
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "128"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "16"))
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_MODULO_RE = re.compile(r"\bm[óo]dulo\s*0*(\d{1,2})\b", re.IGNORECASE)
+_AULA_RE = re.compile(r"\baula\s*0*(\d{1,2}(?:\.\d{1,2}){0,2})\b", re.IGNORECASE)
+_FRASE_RE = re.compile(r"(?<=[.!?…:;])\s+(?=\S)")
+_PALAVRA_RE = re.compile(r"\S+\s*")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Títulos até este nível sempre começam um chunk novo (sem sobreposição com a seção anterior)
+NIVEL_QUEBRA = 2
+
+@dataclass
+class Trecho:
+    texto: str
+    inicio_byte: int
+    fim_byte: int
+    secao: str                 # caminho de títulos: "Seção > Subseção"
+    modulo: Optional[str]
+    aula: Optional[str]
+
+@dataclass
+class _Unidade:
+    inicio: int                # offsets em caracteres no texto
+    fim: int
+    tokens: int
+    nivel_titulo: int = 0      # 1..6 se a unidade é um título markdown
+    secao: tuple = ()
+    modulo: Optional[str] = None
+    aula: Optional[str] = None
+
+def contar_tokens_aprox(texto: str) -> int:
+    """Aproximação sem dependências: palavras + pontuação."""
+    return len(_TOKEN_RE.findall(texto))
+
+def contar_tokens(texto: str) -> int:
+    """Tokens do tokenizador do llama_index (tiktoken), a unidade de CHUNK_SIZE."""
+    from llama_index.core.utils import get_tokenizer
+    return len(get_tokenizer()(texto))
+
+def _blocos(texto: str) -> list[tuple[int, int, int]]:
+    """Parágrafos (separados por linha em branco), títulos e blocos ``` inteiros: (início, fim, nível do título)."""
+    blocos = []
+    inicio = None
+    em_codigo = False
+    pos = 0
+    for linha in texto.splitlines(keepends=True):
+        fim_linha = pos + len(linha)
+        conteudo = linha.strip()
+        if conteudo.startswith("```"):
+            # "```sql" sempre abre um bloco (recupera arquivos com cercas desbalanceadas)
+            abre = not em_codigo or len(conteudo) > 3
+            if abre and inicio is not None:
+                blocos.append((inicio, pos, 0))
+                inicio = None
+            if inicio is None:
+                inicio = pos
+            em_codigo = abre
+            if not em_codigo:
+                blocos.append((inicio, fim_linha, 0))
+                inicio = None
+        elif em_codigo:
+            pass
+        elif not conteudo:
+            if inicio is not None:
+                blocos.append((inicio, pos, 0))
+                inicio = None
+        elif (titulo := _HEADING_RE.match(conteudo)):
+            if inicio is not None:
+                blocos.append((inicio, pos, 0))
+                inicio = None
+            blocos.append((pos, fim_linha, len(titulo.group(1))))
+        elif inicio is None:
+            inicio = pos
+        pos = fim_linha
+    if inicio is not None:
+        blocos.append((inicio, pos, 0))
+    return blocos
+
+def _partir(texto: str, inicio: int, fim: int, limite: int, contar) -> list[tuple[int, int]]:
+    """Divide um bloco maior que o chunk em frases (e, se preciso, em palavras)."""
+    trecho = texto[inicio:fim]
+    if contar(trecho) <= limite:
+        return [(inicio, fim)]
+    partes = []
+    cortes = [0] + [m.end() for m in _FRASE_RE.finditer(trecho)] + [len(trecho)]
+    for a, b in zip(cortes, cortes[1:]):
+        if a == b:
+            continue
+        if contar(trecho[a:b]) <= limite:
+            partes.append((inicio + a, inicio + b))
+            continue
+        # Frase maior que o chunk: corta por palavras
+        atual, tokens = a, 0
+        for palavra in _PALAVRA_RE.finditer(trecho, a, b):
+            n = contar(palavra.group())
+            if tokens and tokens + n > limite:
+                partes.append((inicio + atual, inicio + palavra.start()))
+                atual, tokens = palavra.start(), 0
+            tokens += n
+        partes.append((inicio + atual, inicio + b))
+    return partes
+
+def _unidades(texto: str, limite: int, contar) -> list[_Unidade]:
+    unidades = []
+    secao: list[tuple[int, str]] = []
+    modulo = aula = None
+    for inicio, fim, nivel in _blocos(texto):
+        if nivel:
+            titulo = _HEADING_RE.match(texto[inicio:fim].strip()).group(2)
+            secao = [s for s in secao if s[0] < nivel] + [(nivel, titulo)]
+        # Marcadores de aula em títulos ou no começo do bloco ("Módulo 2 - Aula 3")
+        cabeca = texto[inicio:min(fim, inicio + 120)]
+        if (m := _MODULO_RE.search(cabeca)):
+            modulo = m.group(1)
+        if (a := _AULA_RE.search(cabeca)):
+            aula = a.group(1)
+        caminho = tuple(t for _, t in secao)
+        for a_ini, a_fim in _partir(texto, inicio, fim, limite, contar):
+            unidades.append(_Unidade(a_ini, a_fim, contar(texto[a_ini:a_fim]), nivel, caminho, modulo, aula))
+    return unidades
+
+def dividir_texto(texto: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                  contar: Callable[[str], int] = contar_tokens_aprox) -> list[Trecho]:
+    """
+    Chunks de até `chunk_size` tokens, cada um terminando em fim de parágrafo ou frase.
+    Cada chunk novo repete as últimas frases do anterior (até `chunk_overlap` tokens),
+    exceto quando começa uma seção de nível <= NIVEL_QUEBRA. Um título (de qualquer
+    nível) no fim de um chunk passa para o começo do próximo, junto do seu conteúdo.
+    O texto de cada Trecho é exatamente texto.encode()[inicio_byte:fim_byte].
+    """
+    chunk_overlap = min(chunk_overlap, chunk_size // 2)
+    unidades = _unidades(texto, chunk_size, contar)
+
+    grupos: list[list[_Unidade]] = []
+    atual: list[_Unidade] = []
+    novas = 0                  # unidades do chunk atual que não vieram da sobreposição
+    tokens = 0
+    for unidade in unidades:
+        quebra_secao = 0 < unidade.nivel_titulo <= NIVEL_QUEBRA
+        if novas and (tokens + unidade.tokens > chunk_size or quebra_secao):
+            # Títulos soltos no fim vão para o chunk seguinte, com o conteúdo que abrem.
+            # Numa quebra de seção, só se o chunk for apenas títulos ("# A" seguido de "## B")
+            titulos = 0
+            while titulos < novas and atual[-1 - titulos].nivel_titulo:
+                titulos += 1
+            if (quebra_secao and titulos < novas) or \
+                    (titulos and sum(u.tokens for u in atual[-titulos:]) + unidade.tokens > chunk_size):
+                titulos = 0
+            sobra: list[_Unidade] = atual[len(atual) - titulos:]
+            if titulos < novas:
+                grupos.append(atual[:len(atual) - titulos])
+            if not (quebra_secao or titulos):
+                total = 0
+                for anterior in reversed(atual):
+                    if anterior.nivel_titulo or total + anterior.tokens > chunk_overlap \
+                            or total + anterior.tokens + unidade.tokens > chunk_size:
+                        break
+                    sobra.insert(0, anterior)
+                    total += anterior.tokens
+            atual, tokens, novas = sobra, sum(u.tokens for u in sobra), titulos
+        atual.append(unidade)
+        tokens += unidade.tokens
+        novas += 1
+    if novas:
+        grupos.append(atual)
+
+    spans = []
+    for grupo in grupos:
+        inicio, fim = grupo[0].inicio, grupo[-1].fim
+        # Sem espaços nas pontas (mantendo o texto igual à fatia do arquivo)
+        bruto = texto[inicio:fim]
+        inicio += len(bruto) - len(bruto.lstrip())
+        fim -= len(bruto) - len(bruto.rstrip())
+        if fim > inicio:
+            spans.append((inicio, fim, next((u for u in grupo if not u.nivel_titulo), grupo[0])))
+
+    # Offsets em bytes: uma passada sobre as posições ordenadas (chunks se sobrepõem)
+    bytes_em: dict[int, int] = {}
+    anterior = total = 0
+    for pos in sorted({p for inicio, fim, _ in spans for p in (inicio, fim)}):
+        total += len(texto[anterior:pos].encode("utf-8"))
+        bytes_em[pos] = total
+        anterior = pos
+
+    return [
+        Trecho(
+            texto=texto[inicio:fim],
+            inicio_byte=bytes_em[inicio],
+            fim_byte=bytes_em[fim],
+            secao=" > ".join(referencia.secao),
+            modulo=referencia.modulo,
+            aula=referencia.aula,
+        )
+        for inicio, fim, referencia in spans
+    ]
@@ -1,9 +1,11 @@
+import os
 import sqlite3
 from datetime import datetime
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # /assistente-fontes
-DB_PATH = str(BASE_DIR / "logs.db")
+# LOGS_DB_PATH: outro banco (ex.: cópia temporária do bench_e2e)
+DB_PATH = os.getenv("LOGS_DB_PATH", str(BASE_DIR / "logs.db"))
 
 def registrar_log(usuario, pergunta, resposta, contexto, tipo_prompt, modulo=None, aula=None, data=None):
     conn = sqlite3.connect(DB_PATH)
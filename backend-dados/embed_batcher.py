@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from typing import Callable, Optional
+
+import metrics
+
+# 📦 Micro-batching dos embeddings de pergunta: turnos simultâneos de WebSocket
+# esperam até EMBED_BATCH_WINDOW_MS (ou EMBED_BATCH_MAX perguntas) e viram um único
+# forward pass em lote no modelo, fora do event loop.
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "3"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "16"))
+# Forward passes simultâneos (1: o modelo já usa todos os núcleos; enquanto um lote
+# roda, o próximo vai se formando)
+EMBED_BATCH_CONCURRENCY = int(os.getenv("EMBED_BATCH_CONCURRENCY", "1"))
+
+_METRIC_BATCH = metrics.histogram(
+    "embed_batch_size", "Perguntas por forward pass do micro-batcher", [1, 2, 4, 8, 16, 32, 64]
+)
+_METRIC_SECONDS = metrics.histogram(
+    "embed_batch_seconds", "Duração do forward pass em lote",
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+)
+
+class MicroBatcher:
+    """
+    Junta chamadas concorrentes de `embed(texto)` em lotes de até `max_batch` itens,
+    esperando no máximo `window_ms` pelo lote encher. Cada chamador recebe o seu vetor
+    (ou a exceção do lote). Usar sempre do mesmo event loop.
+    """
+
+    def __init__(self, embed_batch: Callable[[list[str]], list[list[float]]],
+                 max_batch: int = EMBED_BATCH_MAX, window_ms: float = EMBED_BATCH_WINDOW_MS,
+                 concurrency: int = EMBED_BATCH_CONCURRENCY):
+        self.embed_batch = embed_batch
+        self.max_batch = max(max_batch, 1)
+        self.window = max(window_ms, 0.0) / 1000
+        self._pendentes: list[tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._concurrency = max(concurrency, 1)
+
+    async def embed(self, texto: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self._concurrency)
+        futuro = loop.create_future()
+        self._pendentes.append((texto, futuro))
+        if len(self._pendentes) >= self.max_batch or self.window == 0:
+            self._disparar()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._disparar)
+        return await futuro
+
+    def _disparar(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pendentes:
+            lote, self._pendentes = self._pendentes[:self.max_batch], self._pendentes[self.max_batch:]
+            asyncio.ensure_future(self._rodar(lote))
+
+    async def _rodar(self, lote: list[tuple[str, asyncio.Future]]) -> None:
+        async with self._semaforo:
+            inicio = time.perf_counter()
+            try:
+                vetores = await asyncio.to_thread(self.embed_batch, [texto for texto, _ in lote])
+            except Exception as e:
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                return
+            _METRIC_BATCH.observe(len(lote))
+            _METRIC_SECONDS.observe(time.perf_counter() - inicio)
+        for (_, futuro), vetor in zip(lote, vetores):
+            if not futuro.done():  # chamador cancelado (ex.: WebSocket fechou)
+                futuro.set_result(vetor)
+
+def embed_queries_batch(embed_model) -> Callable[[list[str]], list[list[float]]]:
+    """Função de lote para perguntas: usa o caminho de query do modelo quando existe."""
+    lote = getattr(embed_model, "_get_query_embeddings", None)
+    if callable(lote):
+        return lote
+    return embed_model.get_text_embedding_batch
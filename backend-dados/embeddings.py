@@ -0,0 +1,127 @@
+import os
+from pathlib import Path
+from typing import Any, List, Optional
+
+# 🤖 Backend do modelo de embedding (mesmo modelo nos dois):
+#   "torch" (padrão): HuggingFaceEmbedding / sentence-transformers sobre PyTorch
+#   "onnx": grafo ONNX exportado por export_onnx.py rodando no onnxruntime, sem importar
+#           o PyTorch (import e RSS menores); EMBED_ONNX_INT8=1 usa o grafo quantizado
+BASE_DIR = Path(__file__).resolve().parent.parent      # /assistente-fontes
+
+EMBED_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").strip().lower()
+EMBED_ONNX_DIR = Path(os.getenv(
+    "EMBED_ONNX_DIR", str(BASE_DIR / "models" / "paraphrase-multilingual-MiniLM-L12-v2-onnx")
+))
+EMBED_ONNX_INT8 = os.getenv("EMBED_ONNX_INT8", "0") == "1"
+
+# Threads do forward pass: intra-op (paralelismo dentro de cada operação) e
+# inter-op (operações independentes em paralelo). 0 = padrão do runtime (todos os núcleos)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+EMBED_INTER_THREADS = int(os.getenv("EMBED_INTER_THREADS", "0"))
+
+# Limite de tokens do modelo (max_seq_length do sentence-transformers)
+MAX_LENGTH = 128
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+def descricao_backend(backend: Optional[str] = None) -> str:
+    """Identifica modelo + backend (vetores de backends diferentes não são idênticos)."""
+    backend = backend or EMBED_BACKEND
+    if backend == "onnx":
+        return f"{EMBED_MODEL_NAME}@onnx{'-int8' if EMBED_ONNX_INT8 else ''}"
+    return EMBED_MODEL_NAME
+
+def _criar_onnx_embedding(embed_batch_size: int, threads: int):
+    import numpy as np
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.bridge.pydantic import PrivateAttr
+
+    class OnnxEmbedding(BaseEmbedding):
+        """MiniLM no onnxruntime: tokenização (tokenizers), mean pooling e normalização L2,
+        como o HuggingFaceEmbedding faz com o sentence-transformers."""
+
+        _sessao: Any = PrivateAttr()
+        _tokenizer: Any = PrivateAttr()
+        _entradas: Any = PrivateAttr()
+
+        def __init__(self, model_dir: Path, int8: bool, threads: int, **kwargs: Any):
+            super().__init__(**kwargs)
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+
+            opcoes = ort.SessionOptions()
+            opcoes.intra_op_num_threads = threads
+            opcoes.inter_op_num_threads = EMBED_INTER_THREADS
+            opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            arquivo = model_dir / (ONNX_INT8_FILE if int8 else ONNX_FILE)
+            if not arquivo.exists():
+                raise FileNotFoundError(f"{arquivo} não encontrado; rode export_onnx.py")
+            self._sessao = ort.InferenceSession(str(arquivo), opcoes, providers=["CPUExecutionProvider"])
+            self._entradas = {i.name for i in self._sessao.get_inputs()}
+
+            tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=MAX_LENGTH)
+            pad = tokenizer.token_to_id("<pad>") or 0
+            tokenizer.enable_padding(pad_id=pad, pad_token="<pad>")
+            self._tokenizer = tokenizer
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "OnnxEmbedding"
+
+        def _embed(self, textos: List[str]) -> List[List[float]]:
+            codificados = self._tokenizer.encode_batch(textos)
+            ids = np.asarray([c.ids for c in codificados], dtype=np.int64)
+            mascara = np.asarray([c.attention_mask for c in codificados], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mascara}
+            if "token_type_ids" in self._entradas:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            tokens = self._sessao.run(None, feeds)[0]                     # (lote, tokens, 384)
+            peso = mascara[..., None].astype(np.float32)
+            media = (tokens * peso).sum(axis=1) / np.clip(peso.sum(axis=1), 1e-9, None)
+            media /= np.clip(np.linalg.norm(media, axis=1, keepdims=True), 1e-12, None)
+            return media.tolist()
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return self._embed([query])[0]
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return self._embed([text])[0]
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            return self._embed(texts)
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            return self._get_query_embedding(query)
+
+        async def _aget_text_embedding(self, text: str) -> List[float]:
+            return self._get_text_embedding(text)
+
+    return OnnxEmbedding(
+        EMBED_ONNX_DIR, EMBED_ONNX_INT8, threads,
+        model_name=descricao_backend("onnx"),
+        embed_batch_size=embed_batch_size,
+    )
+
+def criar_embed_model(backend: Optional[str] = None, embed_batch_size: int = 10,
+                      threads: Optional[int] = None):
+    """Modelo de embedding para llama_index Settings.embed_model, conforme EMBED_BACKEND."""
+    backend = backend or EMBED_BACKEND
+    threads = EMBED_THREADS if threads is None else threads
+    if backend == "onnx":
+        return _criar_onnx_embedding(embed_batch_size, threads)
+
+    import torch
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    if threads:
+        torch.set_num_threads(threads)
+    if EMBED_INTER_THREADS:
+        try:
+            torch.set_num_interop_threads(EMBED_INTER_THREADS)
+        except RuntimeError:
+            pass  # só pode ser definido antes do primeiro forward
+    # sentence-transformers local, gratuito; multilíngue otimizado para português
+    return HuggingFaceEmbedding(model_name=EMBED_MODEL_NAME, embed_batch_size=embed_batch_size)
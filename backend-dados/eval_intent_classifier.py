@@ -0,0 +1,130 @@
+"""
+Avaliação offline do classificador de intenção por embedding (intent_classifier).
+
+Compara, nas perguntas históricas de logs.db (coluna `pergunta`), o tipo_prompt dado
+pelas regras de palavras-chave atuais com o da centróide mais próxima, e mostra:
+  - validação leave-one-out nas perguntas de exemplo (intent_examples.json);
+  - concordância com as regras e matriz de confusão (regras x embedding);
+  - acurácia de ambos contra rótulos manuais, se --rotulos for informado;
+  - custo da classificação por centróide (sem contar o embedding, que já é da busca).
+
+Uso:
+    cd backend-dados && python eval_intent_classifier.py [--limite 5000] [--rotulos rotulos.json]
+
+rotulos.json: lista de {"pergunta": "...", "tipo_prompt": "..."}.
+"""
+import argparse
+import json
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from intent_classifier import INTENT_MIN_SCORE, IntentClassifier, carregar_exemplos
+from keyword_matcher import classificar
+
+BACKEND_DIR = Path(__file__).resolve().parent
+LOGS_DB_PATH = str(BACKEND_DIR.parent / "logs.db")
+
+def _carregar_perguntas(limite: int) -> list[str]:
+    conn = sqlite3.connect(LOGS_DB_PATH)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT pergunta FROM logs WHERE pergunta IS NOT NULL AND TRIM(pergunta) != '' ORDER BY id DESC LIMIT ?",
+            (limite,),
+        )
+        return [row[0] for row in cursor.fetchall()]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+def _leave_one_out(exemplos: dict[str, list[str]], vetores: dict[str, np.ndarray]) -> float:
+    """Acurácia de cada exemplo classificado pelas centróides calculadas sem ele."""
+    acertos = total = 0
+    tipos = list(exemplos)
+    somas = {t: vetores[t].sum(axis=0) for t in tipos}
+    for tipo in tipos:
+        for i in range(len(vetores[tipo])):
+            centroides = []
+            for t in tipos:
+                soma, n = somas[t], len(vetores[t])
+                if t == tipo:
+                    soma, n = soma - vetores[t][i], n - 1
+                centroides.append(soma / max(n, 1))
+            centroides = np.vstack(centroides)
+            centroides /= np.linalg.norm(centroides, axis=1, keepdims=True)
+            acertos += tipos[int(np.argmax(centroides @ vetores[tipo][i]))] == tipo
+            total += 1
+    return acertos / max(total, 1)
+
+def _imprimir_confusao(pares: list[tuple[str, str]]) -> None:
+    linhas = sorted({a for a, _ in pares})
+    colunas = sorted({b for _, b in pares})
+    contagem = Counter(pares)
+    largura = max([len(c) for c in colunas + linhas] + [8])
+    print(" " * (largura + 2) + "".join(f"{c[:largura]:>{largura + 1}}" for c in colunas))
+    for linha in linhas:
+        print(f"{linha:<{largura + 2}}" + "".join(f"{contagem[(linha, c)]:>{largura + 1}}" for c in colunas))
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação do classificador de intenção por embedding")
+    parser.add_argument("--limite", type=int, default=5000, help="máximo de perguntas lidas de logs.db")
+    parser.add_argument("--rotulos", help="JSON com perguntas rotuladas manualmente")
+    parser.add_argument("--min-score", type=float, default=INTENT_MIN_SCORE)
+    args = parser.parse_args()
+
+    # Mesmo modelo de embedding da busca (configurado em search_engine)
+    from llama_index.core import Settings
+    import search_engine  # noqa: F401
+
+    embed_batch = Settings.embed_model.get_text_embedding_batch
+    exemplos = carregar_exemplos()
+
+    vetores = {}
+    for tipo, perguntas in exemplos.items():
+        v = np.asarray(embed_batch(perguntas), dtype=np.float32)
+        vetores[tipo] = v / np.linalg.norm(v, axis=1, keepdims=True)
+    print(f"📋 {sum(len(p) for p in exemplos.values())} exemplos em {len(exemplos)} tipos")
+    print(f"🔁 Leave-one-out nos exemplos: {_leave_one_out(exemplos, vetores):.1%}")
+
+    classifier = IntentClassifier(exemplos, embed_batch)
+
+    def avaliar(perguntas: list[str]) -> list[tuple[str, str]]:
+        embeddings = embed_batch(perguntas) if perguntas else []
+        pares = []
+        inicio = time.perf_counter()
+        for pergunta, embedding in zip(perguntas, embeddings):
+            tipo, _ = classifier.classificar(embedding, min_score=args.min_score)
+            pares.append((classificar("tipo_prompt", pergunta), tipo or "(regras)"))
+        if perguntas:
+            custo = (time.perf_counter() - inicio) / len(perguntas) * 1e6
+            print(f"⏱️ Classificação por centróide + regras: {custo:.1f} µs/pergunta")
+        return pares
+
+    perguntas = _carregar_perguntas(args.limite)
+    print(f"\n📨 {len(perguntas)} perguntas históricas em logs.db")
+    if perguntas:
+        pares = avaliar(perguntas)
+        cobertas = [(r, e) for r, e in pares if e != "(regras)"]
+        concordancia = sum(r == e for r, e in cobertas) / max(len(cobertas), 1)
+        print(f"✅ Concordância com as regras: {concordancia:.1%} "
+              f"({len(cobertas)} classificadas por embedding, {len(pares) - len(cobertas)} abaixo de {args.min_score})")
+        print("\nMatriz de confusão (linhas: regras, colunas: embedding)")
+        _imprimir_confusao(pares)
+
+    if args.rotulos:
+        with open(args.rotulos, "r", encoding="utf-8") as f:
+            rotulados = [r for r in json.load(f) if r.get("pergunta") and r.get("tipo_prompt")]
+        pares = avaliar([r["pergunta"] for r in rotulados])
+        ouro = [r["tipo_prompt"] for r in rotulados]
+        acc_regras = sum(o == r for o, (r, _) in zip(ouro, pares)) / max(len(ouro), 1)
+        # Abaixo do score mínimo vale o que as regras disseram (mesmo comportamento do prompt_router)
+        acc_embedding = sum(o == (e if e != "(regras)" else r) for o, (r, e) in zip(ouro, pares)) / max(len(ouro), 1)
+        print(f"\n🏷️ {len(ouro)} perguntas rotuladas — regras: {acc_regras:.1%} | embedding: {acc_embedding:.1%}")
+
+if __name__ == "__main__":
+    main()
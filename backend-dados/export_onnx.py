@@ -0,0 +1,56 @@
+"""
+Exporta o MiniLM de embedding para ONNX (EMBED_BACKEND=onnx).
+
+Gera em EMBED_ONNX_DIR: model.onnx (float32), model_int8.onnx (quantização dinâmica
+int8 dos pesos, com --int8) e tokenizer.json. Precisa de torch/transformers só aqui;
+o servidor com o backend ONNX usa apenas onnxruntime + tokenizers.
+
+Uso:
+    cd backend-dados && python export_onnx.py [--int8]
+"""
+import argparse
+from pathlib import Path
+
+from embeddings import EMBED_MODEL_NAME, EMBED_ONNX_DIR, ONNX_FILE, ONNX_INT8_FILE
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo de embedding para ONNX")
+    parser.add_argument("--saida", type=Path, default=EMBED_ONNX_DIR)
+    parser.add_argument("--int8", action="store_true", help="também gera o grafo quantizado em int8")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    args.saida.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(EMBED_MODEL_NAME)
+    model = AutoModel.from_pretrained(EMBED_MODEL_NAME).eval()
+
+    exemplo = tokenizer(["Como criar uma tabela com RLS?"], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (exemplo["input_ids"], exemplo["attention_mask"]),
+            str(args.saida / ONNX_FILE),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "lote", 1: "tokens"},
+                "attention_mask": {0: "lote", 1: "tokens"},
+                "last_hidden_state": {0: "lote", 1: "tokens"},
+            },
+            opset_version=args.opset,
+        )
+    tokenizer.save_pretrained(str(args.saida))
+    print(f"✅ {args.saida / ONNX_FILE}")
+
+    if args.int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(args.saida / ONNX_FILE), str(args.saida / ONNX_INT8_FILE),
+                         weight_type=QuantType.QInt8)
+        print(f"✅ {args.saida / ONNX_INT8_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,306 @@
+import argparse
+import hashlib
+import json
 import os
 import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
 from llama_index.core import (
-    SimpleDirectoryReader,
     GPTVectorStoreIndex,
+    StorageContext,
+    load_index_from_storage,
     Settings
 )
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.schema import MetadataMode, NodeRelationship, RelatedNodeInfo, TextNode
 
-# Caminho de saída
-INDEX_DIR = "storage"
+import index_store
+from embeddings import criar_embed_model, descricao_backend
+from chunk_flags import anotar_nodes
+from chunking import contar_tokens, dividir_texto
+from lexical_index import LexicalIndex
+from int8_vectors import Int8Vectors
 
-# Apaga índice antigo (importante!)
-if os.path.exists(INDEX_DIR):
-    print("🧹 Limpando índice anterior...")
-    shutil.rmtree(INDEX_DIR)
+BACKEND_DIR = Path(__file__).resolve().parent          # /assistente-fontes/backend-dados
+TRANSCRICOES_PATH = BACKEND_DIR / "transcricoes.txt"
 
-# Define o modelo de embedding (sentence-transformers local, gratuito)
-# Usa modelo multilíngue otimizado para português
-Settings.embed_model = HuggingFaceEmbedding(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-)
+# Extensões lidas quando a entrada é um diretório de transcrições
+EXTENSOES = (".txt", ".md")
+
+# Chunks por chamada ao modelo de embedding (o padrão do llama_index é 10, pequeno demais para CPU)
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+# Embeddings já calculados por um build interrompido (retomado na próxima execução)
+CHECKPOINT_PATH = index_store.INDEX_DIR / "ingest-checkpoint.jsonl"
+
+def _chunk_hash(node) -> str:
+    """Hash do texto exatamente como é embedado (conteúdo + metadados incluídos no embedding)."""
+    texto = node.get_content(metadata_mode=MetadataMode.EMBED)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def coletar_arquivos(caminhos: Iterable[Path]) -> list[Path]:
+    """Expande diretórios (recursivamente) nos arquivos de transcrição que contêm."""
+    arquivos = []
+    for caminho in caminhos:
+        caminho = Path(caminho)
+        if caminho.is_dir():
+            arquivos.extend(
+                p for p in sorted(caminho.rglob("*"))
+                if p.is_file() and p.suffix.lower() in EXTENSOES
+                and not any(parte.startswith(".") for parte in p.relative_to(caminho).parts)
+            )
+        else:
+            arquivos.append(caminho)
+    return arquivos
+
+# Metadados de posição: ficam fora do texto embedado (o hash do chunk não muda
+# quando só o deslocamento muda) e fora do texto enviado ao LLM
+METADADOS_POSICAO = ["file_path", "inicio_byte", "fim_byte", "chunk_indice"]
+
+def _chunk_arquivo(path: str) -> list:
+    """
+    Lê e divide um arquivo em chunks (chunking.dividir_texto) com id = hash do
+    conteúdo (determinístico). Cada chunk leva arquivo, seção, módulo/aula e offsets
+    em bytes; PREVIOUS/NEXT ligam chunks vizinhos para a expansão na busca.
+    Roda nos processos de trabalho.
+    """
+    caminho = Path(path)
+    texto = caminho.read_text(encoding="utf-8", errors="replace")
+    nodes = []
+    for i, trecho in enumerate(dividir_texto(texto, contar=contar_tokens)):
+        metadata = {"file_name": caminho.name, "file_path": str(caminho)}
+        if trecho.secao:
+            metadata["secao"] = trecho.secao
+        if trecho.modulo:
+            metadata["modulo"] = trecho.modulo
+        if trecho.aula:
+            metadata["aula"] = trecho.aula
+        metadata.update(inicio_byte=trecho.inicio_byte, fim_byte=trecho.fim_byte, chunk_indice=i)
+        node = TextNode(
+            text=trecho.texto,
+            metadata=metadata,
+            excluded_embed_metadata_keys=list(METADADOS_POSICAO),
+            excluded_llm_metadata_keys=list(METADADOS_POSICAO),
+        )
+        node.id_ = _chunk_hash(node)
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=str(caminho))
+        nodes.append(node)
+    for anterior, proximo in zip(nodes, nodes[1:]):
+        anterior.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=proximo.id_)
+        proximo.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=anterior.id_)
+    return nodes
+
+def _posicao(node) -> tuple:
+    """Offsets e vizinhos de um chunk (mudam sem mudar o hash quando o arquivo é editado)."""
+    vizinhos = tuple(
+        info.node_id if (info := node.relationships.get(rel)) else None
+        for rel in (NodeRelationship.SOURCE, NodeRelationship.PREVIOUS, NodeRelationship.NEXT)
+    )
+    return tuple(node.metadata.get(k) for k in METADADOS_POSICAO) + vizinhos
+
+def _chunks_por_arquivo(arquivos: list[Path], workers: int) -> Iterator[tuple[Path, list]]:
+    """Chunks de cada arquivo, na ordem, divididos em `workers` processos."""
+    if workers <= 1 or len(arquivos) <= 1:
+        for path in arquivos:
+            yield path, _chunk_arquivo(str(path))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from zip(arquivos, executor.map(_chunk_arquivo, [str(p) for p in arquivos]))
+
+def _carregar_checkpoint() -> dict[str, list[float]]:
+    """Embeddings salvos por um build interrompido (descartados se o modelo mudou)."""
+    embeddings = {}
+    try:
+        with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+            cabecalho = json.loads(f.readline() or "{}")
+            if cabecalho.get("modelo") != descricao_backend():
+                return {}
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    break  # última linha cortada pela interrupção
+                embeddings[registro["hash"]] = registro["embedding"]
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return embeddings
+
+class _Progresso:
+    """Vazão (chunks/s) e ETA estimado pelos bytes de arquivo já processados."""
+
+    def __init__(self, total_bytes: int):
+        self.total_bytes = max(total_bytes, 1)
+        self.bytes_feitos = 0
+        self.embedados = 0
+        self.inicio = time.perf_counter()
+
+    def reportar(self):
+        decorrido = time.perf_counter() - self.inicio
+        taxa = self.embedados / decorrido if decorrido > 0 else 0.0
+        fracao = self.bytes_feitos / self.total_bytes
+        eta = decorrido * (1 - fracao) / fracao if fracao > 0 else 0.0
+        print(f"📈 {self.embedados} chunks embedados | {taxa:.1f} chunks/s | "
+              f"{fracao:.0%} dos arquivos | ETA {int(eta // 60):02d}:{int(eta % 60):02d}")
+
+def atualizar_indice(input_files: list[Path], full: bool = False, workers: Optional[int] = None,
+                     batch_size: int = EMBED_BATCH_SIZE) -> str:
+    """
+    Atualiza o índice de forma incremental e publica uma nova versão.
+
+    - Arquivos (ou diretórios inteiros) são divididos em chunks em `workers` processos.
+    - Chunks cujo hash já existe na versão ativa reaproveitam o embedding salvo.
+    - Só chunks novos/alterados são embedados, em lotes de `batch_size`; cada lote vai
+      para o checkpoint, e um build interrompido retoma de onde parou.
+    - Vetores de chunks removidos são apagados.
+    - Chunks reaproveitados que mudaram de posição (offsets em bytes, vizinhos) têm
+      só os metadados atualizados no docstore, sem re-embedar.
+    - O índice lexical (BM25) é reconstruído a partir do docstore final.
+    - Flags de política (chunk_flags) vão nos metadados dos chunks; se as regras do
+      grupo "contexto" mudaram, são recalculadas em todos e a versão é republicada.
+    - A nova versão é montada num diretório temporário e publicada por rename
+      (index_store.publish_version), sem janela em que o índice some do disco.
+
+    Retorna o nome da versão ativa ao final.
+    """
+    arquivos = coletar_arquivos(input_files)
+    workers = workers or os.cpu_count() or 1
+    print(f"📄 {len(arquivos)} arquivos de transcrição, {workers} processos de chunking")
+
+    anterior = index_store.current_version_dir()
+    tmp_dir = index_store.new_tmp_dir()
+    try:
+        index = None
+        existentes: dict[str, str] = {}
+        flags_desatualizadas: list = []
+        if not full and index_store.has_index(anterior):
+            print(f"📁 Partindo da versão ativa: {anterior}")
+            shutil.copytree(
+                anterior, tmp_dir, dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns("versions", "CURRENT", ".CURRENT*", CHECKPOINT_PATH.name),
+            )
+            index = load_index_from_storage(StorageContext.from_defaults(persist_dir=str(tmp_dir)))
+            docs = index.docstore.docs
+            existentes = {_chunk_hash(node): node_id for node_id, node in docs.items()}
+            # Flags de política calculadas com regras antigas (keyword_rules.json mudou)
+            flags_desatualizadas = anotar_nodes(docs.values())
+
+        checkpoint = _carregar_checkpoint()
+        if checkpoint:
+            print(f"⏯️ Retomando build interrompido: {len(checkpoint)} embeddings no checkpoint")
+
+        vistos: set[str] = set()
+        reposicionados: list = []        # chunks reaproveitados com offsets/vizinhos novos
+        inserir: list = []
+        pendentes: list = []
+        progresso = _Progresso(sum(p.stat().st_size for p in arquivos))
+
+        # Reescreve o checkpoint com o que foi lido (descarta uma última linha cortada)
+        CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(CHECKPOINT_PATH, "w", encoding="utf-8") as ckpt:
+            ckpt.write(json.dumps({"modelo": descricao_backend()}) + "\n")
+            for h, embedding in checkpoint.items():
+                ckpt.write(json.dumps({"hash": h, "embedding": embedding}) + "\n")
+
+            def embedar_pendentes():
+                textos = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in pendentes]
+                embeddings = Settings.embed_model.get_text_embedding_batch(textos)
+                for node, embedding in zip(pendentes, embeddings):
+                    node.embedding = embedding
+                    ckpt.write(json.dumps({"hash": node.id_, "embedding": embedding}) + "\n")
+                ckpt.flush()
+                progresso.embedados += len(pendentes)
+                inserir.extend(pendentes)
+                pendentes.clear()
+                progresso.reportar()
+
+            for path, nodes in _chunks_por_arquivo(arquivos, workers):
+                for node in nodes:
+                    if node.id_ in vistos:
+                        continue  # trechos idênticos viram um chunk só
+                    vistos.add(node.id_)
+                    if node.id_ in existentes:
+                        salvo = index.docstore.get_node(existentes[node.id_])
+                        if _posicao(salvo) != _posicao(node):
+                            for chave in METADADOS_POSICAO:
+                                salvo.metadata[chave] = node.metadata[chave]
+                            salvo.relationships = node.relationships
+                            reposicionados.append(salvo)
+                        continue
+                    if node.id_ in checkpoint:
+                        node.embedding = checkpoint[node.id_]
+                        inserir.append(node)
+                    else:
+                        pendentes.append(node)
+                        if len(pendentes) >= batch_size:
+                            embedar_pendentes()
+                progresso.bytes_feitos += path.stat().st_size
+            if pendentes:
+                embedar_pendentes()
+
+        remover = [node_id for h, node_id in existentes.items() if h not in vistos]
+        print(f"🔁 {len(vistos) - len(inserir)} chunks reaproveitados, "
+              f"{len(inserir)} novos/alterados, {len(remover)} removidos")
+
+        anotar_nodes(inserir)
+
+        if index is not None:
+            if not remover and not inserir and not flags_desatualizadas and not reposicionados:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                CHECKPOINT_PATH.unlink(missing_ok=True)
+                print("✅ Índice já está atualizado.")
+                return index_store.current_version() or ""
+            if remover:
+                index.delete_nodes(remover, delete_from_docstore=True)
+                removidos = set(remover)
+                flags_desatualizadas = [n for n in flags_desatualizadas if n.node_id not in removidos]
+            if flags_desatualizadas:
+                print(f"🚩 Flags de política recalculadas em {len(flags_desatualizadas)} chunks")
+                index.docstore.add_documents(flags_desatualizadas, allow_update=True)
+            if reposicionados:
+                # O docstore devolve cópias: offsets/vizinhos novos precisam ser regravados
+                anotar_nodes(reposicionados)
+                index.docstore.add_documents(reposicionados, allow_update=True)
+            if inserir:
+                index.insert_nodes(inserir)  # já embedados: o índice não recalcula
+        else:
+            index = GPTVectorStoreIndex(inserir)
+
+        index.storage_context.persist(persist_dir=str(tmp_dir))
+        # BM25 dos mesmos chunks, salvo na mesma versão (recalculado inteiro: é barato)
+        LexicalIndex.from_docstore(index.docstore).save(tmp_dir)
+        # Vetores int8 para VECTOR_STORE=int8 no servidor
+        Int8Vectors.from_simple_vector_store(tmp_dir / "default__vector_store.json").save(tmp_dir)
+        version = index_store.publish_version(tmp_dir)
+    except BaseException:
+        # O checkpoint fica para a próxima execução; só o diretório temporário é descartado
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    CHECKPOINT_PATH.unlink(missing_ok=True)
+    print(f"💾 Nova versão publicada: {version} ({index_store.version_dir(version)})")
+    return version
 
-# Lê os dados da transcrição
-print("📄 Lendo o arquivo transcricoes.txt...")
-documents = SimpleDirectoryReader(input_files=["transcricoes.txt"]).load_data()
+def main():
+    parser = argparse.ArgumentParser(description="Gera/atualiza o índice vetorial das transcrições")
+    parser.add_argument("arquivos", nargs="*", type=Path, default=[TRANSCRICOES_PATH],
+                        help="arquivos ou diretórios de transcrição (padrão: transcricoes.txt)")
+    parser.add_argument("--full", action="store_true", help="ignora a versão ativa e re-embeda tudo")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processos de chunking (padrão: número de CPUs)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="chunks por lote de embedding")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="threads do embedding (padrão: EMBED_THREADS ou todos os núcleos)")
+    args = parser.parse_args()
 
-# Gera o índice
-print("⚙️ Gerando o índice vetorial...")
-index = GPTVectorStoreIndex.from_documents(documents)
+    # Modelo de embedding (backend em EMBED_BACKEND: torch ou onnx)
+    Settings.embed_model = criar_embed_model(embed_batch_size=args.batch_size, threads=args.threads)
 
-# Persiste no diretório
-print(f"💾 Salvando índice em: {INDEX_DIR}")
-index.storage_context.persist(persist_dir=INDEX_DIR)
+    inicio = time.perf_counter()
+    atualizar_indice(args.arquivos, full=args.full, workers=args.workers, batch_size=args.batch_size)
+    print(f"✅ Índice criado com sucesso em {time.perf_counter() - inicio:.1f}s.")
 
-print("✅ Índice criado com sucesso.")
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import os
 import re
 import random
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 from dotenv import load_dotenv
+from keyword_matcher import classificar, is_saudacao
 
 # Carrega variáveis do .env
 load_dotenv()
@@ -13,9 +14,19 @@ TRANSCRIPTS_PATH = os.path.join(os.path.dirname(__file__), "transcricoes.txt")
 # Obs: o backend usa base_url da MiniMax, então ambos apontam para o mesmo token JWT.
 _API_KEY = os.getenv("MINIMAX_API_KEY") or os.getenv("ANTHROPIC_AUTH_TOKEN")
 
+# Endpoint compatível com Anthropic (LLM_BASE_URL aponta para outro provedor ou para
+# o servidor falso do bench_e2e.py)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.minimax.io/anthropic")
+
 # Configuração Minimax via API compatível com Anthropic
 client = Anthropic(
-    base_url="https://api.minimax.io/anthropic",
+    base_url=LLM_BASE_URL,
+    api_key=_API_KEY
+)
+# Cliente assíncrono para o streaming do WebSocket: não bloqueia o event loop e,
+# se a task for cancelada, fecha a conexão e o upstream para de gerar
+async_client = AsyncAnthropic(
+    base_url=LLM_BASE_URL,
     api_key=_API_KEY
 )
 
@@ -157,30 +168,9 @@ def resposta_link_externo(titulo, url, icone="🔗"):
 
 # Detecção de cenários simplificada
 def detectar_cenario(pergunta: str) -> str:
-    pergunta = pergunta.lower()
-    
-    # Detecta perguntas técnicas sobre sistemas, banco de dados, arquitetura
-    termos_tecnicos = [
-        "data lake", "crm", "supabase", "postgres", "sql", "rls", "policy", "schema",
-        "bronze", "silver", "gold", "lead", "evento", "função", "trigger", "tabela"
-    ]
-    
-    if any(t in pergunta for t in termos_tecnicos):
-        return "duvida_tecnica"
-    
-    # Detecta perguntas gerais
-    if any(p in pergunta for p in [
-        "tenho uma dúvida", "tenho outra dúvida", "minha dúvida", "não entendi", "duvida", "dúvida", "me explica",
-        "poderia explicar", "por que", "como", "o que", "quais", "qual", "explique", "me fale", "exemplo", "caso prático",
-        "me mostre", "me explique", "?"
-    ]):
-        return "duvida_pontual"
-    elif any(p in pergunta for p in [
-        "exemplo prático", "me dá um exemplo", "passo a passo", "como fazer isso", "como faço", "me ensina", "ensinar", "me mostre como"
-    ]):
-        return "exemplo_pratico"
-    else:
-        return "geral"
+    # Termos técnicos, dúvidas pontuais e pedidos de exemplo ficam em keyword_rules.json,
+    # grupo "cenario", na ordem de prioridade. Sem correspondência: "geral".
+    return classificar("cenario", pergunta)
 
 def atualizar_progresso(pergunta: str, progresso: dict) -> dict:
     # Sistema simplificado - não usa mais módulos/aulas
@@ -199,19 +189,8 @@ def generate_answer(question, context="", history=None, tipo_de_prompt=None, is_
     fechamento = random.choice(CLOSINGS)
     cenario = detectar_cenario(question)
 
-    mensagem_generica = question.strip().lower()
-    saudacoes_vagas = [
-        "olá", "ola", "oi", "bom dia", "boa tarde", "boa noite", "pode me ajudar?", "oi, tudo bem?",
-        "olá bom dia", "tudo bem?", "tudo certo?", "como vai?", "você pode me ajudar?", "me ajuda?", "olá, boa noite"
-    ]
-    apresentacoes_vagas = ["meu nome é", "sou ", "me apresentando", "me apresento", "me chamo"]
-
     # Mensagens vagas ("oi", "tudo bem?") devem ir para a LLM
-    is_saudacao = (
-        mensagem_generica in saudacoes_vagas
-        or any(mensagem_generica.startswith(apr) for apr in apresentacoes_vagas)
-    )
-    if is_saudacao:
+    if is_saudacao(question):
         cenario = "saudacao"
 
     # Construir instruction baseado no cenário
@@ -305,13 +284,7 @@ async def generate_answer_stream(question, context="", history=None, tipo_de_pro
     }
 
     # Detecta mensagens vagas
-    mensagem_generica = question.strip().lower()
-    saudacoes_vagas = [
-        "olá", "ola", "oi", "bom dia", "boa tarde", "boa noite", "pode me ajudar?", "oi, tudo bem?",
-        "olá bom dia", "tudo bem?", "tudo certo?", "como vai?", "você pode me ajudar?", "me ajuda?", "olá, boa noite"
-    ]
-    apresentacoes_vagas = ["meu nome é", "sou ", "me apresentando", "me apresento", "me chamo"]
-    if mensagem_generica in saudacoes_vagas or any(mensagem_generica.startswith(apr) for apr in apresentacoes_vagas):
+    if is_saudacao(question):
         cenario = "saudacao"
 
     # Constrói o prompt baseado no cenário
@@ -357,7 +330,7 @@ Utilize o conteúdo adicional abaixo, se relevante:
 
     try:
         # Chama Minimax com streaming habilitado (via API Anthropic)
-        with client.messages.stream(
+        async with async_client.messages.stream(
             model="MiniMax-M2",
             max_tokens=2048,
             system="Responda SEMPRE em português do Brasil.",
@@ -370,7 +343,7 @@ Utilize o conteúdo adicional abaixo, se relevante:
             full_response = ""
 
             # Itera pelos chunks da resposta
-            for text in stream.text_stream:
+            async for text in stream.text_stream:
                 full_response += text
                 yield {"type": "text", "data": text}
 
@@ -402,6 +375,49 @@ Utilize o conteúdo adicional abaixo, se relevante:
             }
         }
 
+# Tamanho máximo (em caracteres) de cada bloco de conversa enviado ao LLM no resumo
+SUMMARY_BLOCK_CHARS = 3000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Você é um assistente especializado em criar resumos concisos e úteis de conversas. "
+    "Responda SEMPRE em português do Brasil."
+)
+
+def _formatar_conversa(messages: list) -> str:
+    """Converte [{'role', 'content'}] em texto 'Usuário: ... / Assistente: ...'."""
+    partes = []
+    for msg in messages:
+        role = (msg.get('role') or '').lower()
+        content = (msg.get('content') or '').strip()
+        if content:
+            prefix = "Usuário" if role == 'user' else "Assistente"
+            partes.append(f"{prefix}: {content}")
+    return "\n\n".join(partes)
+
+def _dividir_conversa_em_blocos(messages: list, max_chars: int = SUMMARY_BLOCK_CHARS) -> list:
+    """
+    Agrupa as mensagens em blocos de até `max_chars` caracteres, sem cortar a conversa.
+    Uma mensagem isolada maior que o limite é truncada dentro do próprio bloco.
+    """
+    blocos = []
+    atual = []
+    tamanho = 0
+    for msg in messages:
+        texto = _formatar_conversa([msg])
+        if not texto:
+            continue
+        if len(texto) > max_chars:
+            texto = texto[:max_chars] + " [...]"
+        if atual and tamanho + len(texto) > max_chars:
+            blocos.append("\n\n".join(atual))
+            atual = []
+            tamanho = 0
+        atual.append(texto)
+        tamanho += len(texto) + 2
+    if atual:
+        blocos.append("\n\n".join(atual))
+    return blocos
+
 def generate_conversation_summary(messages: list, max_length: int = 500) -> str:
     """
     Gera resumo de uma conversa usando LLM.
@@ -417,13 +433,7 @@ def generate_conversation_summary(messages: list, max_length: int = 500) -> str:
         return "Conversa vazia."
 
     # Extrair texto das mensagens
-    conversation_text = ""
-    for msg in messages:
-        role = msg.get('role', '').lower()
-        content = msg.get('content', '').strip()
-        if content:
-            prefix = "Usuário" if role == 'user' else "Assistente"
-            conversation_text += f"{prefix}: {content}\n\n"
+    conversation_text = _formatar_conversa(messages)
 
     if not conversation_text.strip():
         return "Conversa sem conteúdo textual."
@@ -454,7 +464,7 @@ RESUMO:
         response = client.messages.create(
             model="MiniMax-M2",
             max_tokens=300,
-            system="Você é um assistente especializado em criar resumos concisos e úteis de conversas. Responda SEMPRE em português do Brasil.",
+            system=SUMMARY_SYSTEM_PROMPT,
             messages=[
                 {"role": "user", "content": prompt}
             ],
@@ -473,6 +483,88 @@ RESUMO:
         print(f"❌ Erro ao gerar resumo: {e}")
         return f"Erro ao gerar resumo: {str(e)}"
 
+def update_conversation_summary(previous_summary: str, new_messages: list, max_length: int = 500,
+                                on_progress=None) -> str:
+    """
+    Atualiza um resumo existente com mensagens novas (resumo incremental).
+
+    As mensagens novas são divididas em blocos de até SUMMARY_BLOCK_CHARS e cada bloco
+    é incorporado ao resumo anterior. Assim o custo depende só do trecho novo e sessões
+    longas são resumidas por inteiro, sem truncar no começo da conversa.
+
+    Args:
+        previous_summary: Resumo acumulado até agora ('' para começar do zero)
+        new_messages: Mensagens ainda não resumidas, no formato [{'role', 'content'}]
+        max_length: Comprimento máximo do resumo (padrão: 500 caracteres)
+        on_progress: Callback opcional on_progress(blocos_concluidos, total_blocos)
+
+    Returns:
+        Resumo atualizado. Erros do LLM são propagados para o chamador não avançar
+        o ponto de corte (high-water mark) da sessão.
+    """
+    summary = (previous_summary or "").strip()
+
+    blocos = _dividir_conversa_em_blocos(new_messages)
+    for i, bloco in enumerate(blocos, start=1):
+        if summary:
+            prompt = f"""
+Atualize o resumo de uma conversa em português brasileiro incorporando os novos trechos.
+
+DIRETRIZES:
+- Máximo de {max_length} caracteres
+- 2-3 frases apenas
+- Preserve os tópicos e conclusões do resumo atual que continuam relevantes
+- Acrescente os novos tópicos, conclusões e próximos passos dos novos trechos
+- Use linguagem clara e objetiva
+- Não use markdown ou formatação especial
+
+RESUMO ATUAL:
+{summary}
+
+NOVOS TRECHOS DA CONVERSA:
+{bloco}
+
+RESUMO ATUALIZADO:
+"""
+        else:
+            prompt = f"""
+Por favor, crie um resumo conciso desta conversa em português brasileiro.
+
+DIRETRIZES:
+- Máximo de {max_length} caracteres
+- 2-3 frases apenas
+- Destaque os tópicos principais discutidos
+- Mencione conclusões ou decisões importantes
+- Se houver próximos passos mencionados, inclua-os
+- Use linguagem clara e objetiva
+- Não use markdown ou formatação especial
+
+CONVERSA:
+{bloco}
+
+RESUMO:
+"""
+
+        response = client.messages.create(
+            model="MiniMax-M2",
+            max_tokens=300,
+            system=SUMMARY_SYSTEM_PROMPT,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3
+        )
+        summary = response.content[0].text.strip()
+
+        # Garantir que não excede o limite
+        if len(summary) > max_length:
+            summary = summary[:max_length-3] + "..."
+
+        if on_progress:
+            on_progress(i, len(blocos))
+
+    return summary or "Conversa sem conteúdo textual."
+
 async def generate_conversation_summary_stream(messages: list, max_length: int = 500):
     """
     Gera resumo de uma conversa usando LLM com streaming.
@@ -489,13 +581,7 @@ async def generate_conversation_summary_stream(messages: list, max_length: int =
         return
 
     # Extrair texto das mensagens
-    conversation_text = ""
-    for msg in messages:
-        role = msg.get('role', '').lower()
-        content = msg.get('content', '').strip()
-        if content:
-            prefix = "Usuário" if role == 'user' else "Assistente"
-            conversation_text += f"{prefix}: {content}\n\n"
+    conversation_text = _formatar_conversa(messages)
 
     if not conversation_text.strip():
         yield "Conversa sem conteúdo textual."
@@ -528,7 +614,7 @@ RESUMO:
         with client.messages.stream(
             model="MiniMax-M2",
             max_tokens=300,
-            system="Você é um assistente especializado em criar resumos concisos e úteis de conversas. Responda SEMPRE em português do Brasil.",
+            system=SUMMARY_SYSTEM_PROMPT,
             messages=[
                 {"role": "user", "content": prompt}
             ],
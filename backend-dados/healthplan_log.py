@@ -1,23 +1,119 @@
 import os
 import json
+import sqlite3
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
 
+BASE_DIR = Path(__file__).resolve().parent.parent  # /assistente-fontes
+BACKEND_DIR = Path(__file__).resolve().parent      # /assistente-fontes/backend-dados
+DB_PATH = os.getenv("LOGS_DB_PATH", str(BASE_DIR / "logs.db"))
+
+# Arquivo antigo (array JSON reescrito a cada pergunta). Era relativo ao diretório atual,
+# então procuramos nos dois lugares onde o uvicorn costuma rodar.
 HEALTHPLAN_LOG = "healthplan_perguntas.json"
+LEGACY_PATHS = [BACKEND_DIR / HEALTHPLAN_LOG, BASE_DIR / HEALTHPLAN_LOG]
+
+def _connect() -> sqlite3.Connection:
+    # timeout: espera o lock de escrita de outro worker em vez de falhar
+    conn = sqlite3.connect(DB_PATH, timeout=10)
+    _ensure_healthplan_table(conn)
+    return conn
+
+def _ensure_healthplan_table(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS healthplan_perguntas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pergunta TEXT,
+            usuario TEXT,
+            data TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_healthplan_data ON healthplan_perguntas(data)")
+    conn.commit()
 
 def registrar_healthplan(pergunta: str, usuario: str):
-    registro = {
-        "pergunta": pergunta,
-        "usuario": usuario,
-        "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-
-    if os.path.exists(HEALTHPLAN_LOG):
-        with open(HEALTHPLAN_LOG, "r", encoding="utf-8") as f:
-            dados = json.load(f)
-    else:
-        dados = []
-
-    dados.append(registro)
-
-    with open(HEALTHPLAN_LOG, "w", encoding="utf-8") as f:
-        json.dump(dados, f, ensure_ascii=False, indent=2)
+    """Registra uma pergunta de Health Plan (append O(1), seguro com vários workers)."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO healthplan_perguntas (pergunta, usuario, data) VALUES (?, ?, ?)",
+            (pergunta, usuario, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def listar_healthplan(inicio: Optional[str] = None, fim: Optional[str] = None,
+                      usuario: Optional[str] = None) -> list[dict]:
+    """
+    Perguntas de Health Plan por período, em ordem cronológica.
+    `inicio`/`fim` no formato 'YYYY-MM-DD' ou 'YYYY-MM-DD HH:MM:SS' (fim inclusivo;
+    só a data inclui o dia inteiro).
+    """
+    filtros = []
+    params: list = []
+    if inicio:
+        filtros.append("data >= ?")
+        params.append(inicio)
+    if fim:
+        filtros.append("data <= ?")
+        params.append(f"{fim} 23:59:59" if len(fim) == 10 else fim)
+    if usuario:
+        filtros.append("usuario = ?")
+        params.append(usuario)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT id, pergunta, usuario, data FROM healthplan_perguntas {where} ORDER BY data ASC, id ASC",
+            params,
+        )
+        return [
+            {"id": row[0], "pergunta": row[1], "usuario": row[2], "data": row[3]}
+            for row in cursor.fetchall()
+        ]
+    finally:
+        conn.close()
+
+def migrar_healthplan_json() -> int:
+    """
+    Importa (uma vez) o array de healthplan_perguntas.json para o SQLite e renomeia
+    o arquivo para .migrado, para não importar de novo. Retorna quantos registros entraram.
+    """
+    total = 0
+    for path in LEGACY_PATHS:
+        if not path.exists():
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except Exception as e:
+            print(f"❌ Erro ao ler {path}: {e}")
+            continue
+        if not isinstance(dados, list):
+            continue
+
+        registros = [
+            (r.get("pergunta"), r.get("usuario"), r.get("data"))
+            for r in dados if isinstance(r, dict)
+        ]
+        conn = _connect()
+        try:
+            conn.executemany(
+                "INSERT INTO healthplan_perguntas (pergunta, usuario, data) VALUES (?, ?, ?)",
+                registros,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(path, path.with_name(path.name + ".migrado"))
+        total += len(registros)
+        print(f"✅ {len(registros)} perguntas de Health Plan migradas de {path}")
+    return total
+
+if __name__ == "__main__":
+    migrar_healthplan_json()
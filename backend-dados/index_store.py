@@ -0,0 +1,86 @@
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# Caminhos absolutos (não dependem do diretório atual ao rodar o uvicorn)
+BASE_DIR = Path(__file__).resolve().parent.parent      # /assistente-fontes
+
+# 📁 Layout versionado do índice:
+#   storage/CURRENT            -> nome da versão ativa (trocado atomicamente)
+#   storage/versions/<versão>/ -> diretório persistido pelo llama_index
+# Sem CURRENT, vale o layout antigo (arquivos direto em storage/).
+INDEX_DIR = BASE_DIR / "storage"
+VERSIONS_DIR = INDEX_DIR / "versions"
+CURRENT_FILE = INDEX_DIR / "CURRENT"
+
+# Quantas versões antigas manter em disco (rollback manual e leituras em andamento)
+KEEP_VERSIONS = 3
+
+def current_version() -> Optional[str]:
+    """Nome da versão ativa, ou None no layout antigo."""
+    try:
+        nome = CURRENT_FILE.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return nome or None
+
+def version_dir(version: Optional[str]) -> Path:
+    """Diretório persistido de uma versão (None = layout antigo em storage/)."""
+    return VERSIONS_DIR / version if version else INDEX_DIR
+
+def current_version_dir() -> Path:
+    return version_dir(current_version())
+
+def has_index(path: Path) -> bool:
+    return (path / "docstore.json").exists()
+
+def new_tmp_dir() -> Path:
+    """Diretório temporário para montar a próxima versão sem tocar na ativa."""
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = VERSIONS_DIR / f".tmp-{uuid.uuid4().hex[:8]}"
+    tmp.mkdir()
+    return tmp
+
+def publish_version(tmp_dir: Path) -> str:
+    """
+    Publica a versão montada em `tmp_dir`: renomeia para versions/<versão> e troca
+    o CURRENT por rename atômico. Leitores veem a versão antiga ou a nova, nunca
+    um índice pela metade.
+    """
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    final_dir = VERSIONS_DIR / version
+    os.replace(tmp_dir, final_dir)
+
+    tmp_current = INDEX_DIR / f".CURRENT.{uuid.uuid4().hex[:8]}"
+    with open(tmp_current, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, CURRENT_FILE)
+
+    prune_versions()
+    return version
+
+def prune_versions(keep: int = KEEP_VERSIONS) -> None:
+    """Apaga versões antigas (e temporários abandonados), mantendo a ativa e as `keep` mais recentes."""
+    if not VERSIONS_DIR.exists():
+        return
+    ativa = current_version()
+    versoes = sorted(
+        (p for p in VERSIONS_DIR.iterdir() if p.is_dir() and not p.name.startswith(".")),
+        key=lambda p: p.name,
+        reverse=True,
+    )
+    for path in versoes[keep:]:
+        if path.name != ativa:
+            shutil.rmtree(path, ignore_errors=True)
+    for path in VERSIONS_DIR.glob(".tmp-*"):
+        try:
+            # Temporário com mais de 1 dia: build interrompido
+            if datetime.now().timestamp() - path.stat().st_mtime > 86400:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
@@ -1,8 +1,9 @@
+import os
 import sqlite3
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # /assistente-fontes
-conn = sqlite3.connect(str(BASE_DIR / "logs.db"))
+conn = sqlite3.connect(os.getenv("LOGS_DB_PATH", str(BASE_DIR / "logs.db")))
 cursor = conn.cursor()
 
 cursor.execute("""
@@ -0,0 +1,108 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# 🗜️ Vetores de embedding quantizados em int8 (1 byte por dimensão, escala por dimensão).
+# A busca aproximada roda sobre os códigos int8 em memória; os `top_k * rescore_factor`
+# melhores candidatos são reordenados com o cosseno exato em float32, lido de um
+# arquivo mapeado em memória (só as linhas consultadas entram no RSS).
+
+CODES_FILE = "vectors_int8.npz"
+FLOAT_FILE = "vectors_f32.npy"
+
+# Linhas por bloco na multiplicação aproximada (limita a matriz float temporária)
+BLOCK_ROWS = 8192
+
+def _normalizar(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+class Int8Vectors:
+    def __init__(self, node_ids: np.ndarray, codes: np.ndarray, escalas: np.ndarray,
+                 vetores: Optional[np.ndarray] = None):
+        self.node_ids = node_ids
+        self.codes = codes            # (N, D) int8
+        self.escalas = escalas        # (D,) float32: valor ≈ código * escala
+        self.vetores = vetores        # (N, D) float32 normalizados (mmap) para o rescoring
+        self._posicao = {str(node_id): i for i, node_id in enumerate(node_ids)}
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @classmethod
+    def construir(cls, embeddings: dict[str, list[float]]) -> "Int8Vectors":
+        """Quantiza {node_id: embedding}. Os vetores são normalizados (busca por cosseno)."""
+        node_ids = np.asarray(list(embeddings), dtype=str)
+        if not len(node_ids):
+            return cls(node_ids, np.zeros((0, 0), dtype=np.int8), np.zeros(0, dtype=np.float32),
+                       np.zeros((0, 0), dtype=np.float32))
+        vetores = _normalizar(np.asarray(list(embeddings.values()), dtype=np.float32))
+        escalas = np.abs(vetores).max(axis=0) / 127.0
+        escalas[escalas == 0] = 1.0
+        codes = np.clip(np.rint(vetores / escalas), -127, 127).astype(np.int8)
+        return cls(node_ids, codes, escalas.astype(np.float32), vetores)
+
+    def save(self, persist_dir: Path) -> None:
+        persist_dir = Path(persist_dir)
+        with open(persist_dir / CODES_FILE, "wb") as f:
+            np.savez(f, node_ids=self.node_ids, codes=self.codes, escalas=self.escalas)
+        np.save(persist_dir / FLOAT_FILE, np.ascontiguousarray(self.vetores, dtype=np.float32))
+
+    @classmethod
+    def load(cls, persist_dir: Path) -> Optional["Int8Vectors"]:
+        persist_dir = Path(persist_dir)
+        if not (persist_dir / CODES_FILE).exists() or not (persist_dir / FLOAT_FILE).exists():
+            return None
+        with np.load(persist_dir / CODES_FILE, allow_pickle=False) as dados:
+            node_ids, codes, escalas = dados["node_ids"], dados["codes"], dados["escalas"]
+        vetores = np.load(persist_dir / FLOAT_FILE, mmap_mode="r")
+        return cls(node_ids, codes, escalas, vetores)
+
+    @classmethod
+    def from_simple_vector_store(cls, path: Path) -> "Int8Vectors":
+        """Quantiza um default__vector_store.json do llama_index (SimpleVectorStore)."""
+        with open(path, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        return cls.construir(dados.get("embedding_dict", {}))
+
+    def nbytes_residentes(self) -> int:
+        """Memória que fica residente: códigos, escalas e ids (o float32 é mmap)."""
+        return self.codes.nbytes + self.escalas.nbytes + self.node_ids.nbytes
+
+    def _aproximado(self, consulta: np.ndarray, n: int) -> np.ndarray:
+        """Índices dos `n` maiores produtos aproximados, sem ordem."""
+        q = consulta * self.escalas
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for inicio in range(0, len(self.codes), BLOCK_ROWS):
+            bloco = self.codes[inicio:inicio + BLOCK_ROWS]
+            scores[inicio:inicio + len(bloco)] = bloco @ q
+        if n >= len(scores):
+            return np.arange(len(scores))
+        return np.argpartition(-scores, n - 1)[:n]
+
+    def buscar(self, consulta, top_k: int, rescore_factor: int = 4,
+               ids_permitidos: Optional[list[str]] = None) -> list[tuple[str, float]]:
+        """
+        Os `top_k` vetores mais próximos (cosseno) de `consulta`: [(node_id, score)].
+        Com rescore_factor=0 devolve os scores aproximados do int8, sem rescoring.
+        """
+        if not len(self.codes) or top_k <= 0:
+            return []
+        q = _normalizar(np.asarray(consulta, dtype=np.float32))
+        if ids_permitidos is not None:
+            candidatos = np.asarray(sorted(self._posicao[i] for i in ids_permitidos if i in self._posicao),
+                                    dtype=np.int64)
+        else:
+            candidatos = self._aproximado(q, top_k * max(rescore_factor, 1))
+
+        candidatos = np.sort(candidatos)  # leitura em ordem no arquivo mapeado
+        if rescore_factor > 0 and self.vetores is not None:
+            scores = np.asarray(self.vetores[candidatos] @ q, dtype=np.float32)
+        else:
+            scores = (self.codes[candidatos] @ (q * self.escalas)).astype(np.float32)
+
+        ordem = np.argsort(-scores, kind="stable")[:top_k]
+        return [(str(self.node_ids[candidatos[i]]), float(scores[i])) for i in ordem]
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent          # /assistente-fontes/backend-dados
+
+# 📋 Perguntas de exemplo rotuladas por tipo_prompt (uma centróide por tipo)
+EXAMPLES_PATH = str(BACKEND_DIR / "intent_examples.json")
+
+# Abaixo desta similaridade (cosseno) a classificação por embedding não é confiável
+# e o prompt_router volta para as regras de palavras-chave
+INTENT_MIN_SCORE = float(os.getenv("INTENT_MIN_SCORE", "0.35"))
+
+def _normalizar(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+class IntentClassifier:
+    """
+    Classificador de tipo_prompt por centróide mais próxima.
+
+    Cada tipo tem a média (normalizada) dos embeddings das suas perguntas de exemplo.
+    A classificação reaproveita o embedding da pergunta já calculado para a busca
+    no índice, então custa só um produto matriz-vetor (tipos x 384).
+    """
+
+    def __init__(self, exemplos: dict[str, list[str]],
+                 embed_batch: Callable[[list[str]], list[list[float]]]):
+        self.tipos: list[str] = []
+        centroides = []
+        for tipo, perguntas in exemplos.items():
+            perguntas = [p for p in perguntas if isinstance(p, str) and p.strip()]
+            if not perguntas:
+                continue
+            vetores = _normalizar(np.asarray(embed_batch(perguntas), dtype=np.float32))
+            centroides.append(vetores.mean(axis=0))
+            self.tipos.append(tipo)
+        self.centroides = _normalizar(np.vstack(centroides)) if centroides else np.zeros((0, 0), dtype=np.float32)
+
+    def scores(self, embedding) -> dict[str, float]:
+        """Similaridade (cosseno) da pergunta com cada tipo."""
+        if not self.tipos:
+            return {}
+        vetor = _normalizar(np.asarray(embedding, dtype=np.float32))
+        return dict(zip(self.tipos, (self.centroides @ vetor).tolist()))
+
+    def classificar(self, embedding, min_score: float = INTENT_MIN_SCORE) -> tuple[Optional[str], float]:
+        """(tipo, score) da centróide mais próxima; tipo=None se score < min_score."""
+        if not self.tipos:
+            return (None, 0.0)
+        vetor = _normalizar(np.asarray(embedding, dtype=np.float32))
+        similaridades = self.centroides @ vetor
+        melhor = int(np.argmax(similaridades))
+        score = float(similaridades[melhor])
+        if score < min_score:
+            return (None, score)
+        return (self.tipos[melhor], score)
+
+def carregar_exemplos(path: str = EXAMPLES_PATH) -> dict[str, list[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_lock = threading.Lock()
+_classifier: Optional[IntentClassifier] = None
+
+def get_intent_classifier() -> IntentClassifier:
+    """
+    Classificador global, construído na primeira chamada com o modelo de embedding
+    configurado em llama_index Settings (o mesmo usado na busca).
+    """
+    global _classifier
+    if _classifier is None:
+        with _lock:
+            if _classifier is None:
+                from llama_index.core import Settings
+
+                _classifier = IntentClassifier(carregar_exemplos(), Settings.embed_model.get_text_embedding_batch)
+                print(f"🧭 Classificador de intenção pronto ({len(_classifier.tipos)} tipos)")
+    return _classifier
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import os
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent  # /assistente-fontes
+JOBS_DB_PATH = os.getenv("LOGS_DB_PATH", str(BASE_DIR / "logs.db"))
+
+# Prioridades: jobs disparados pelo usuário passam na frente dos jobs em lote
+PRIORITY_NORMAL = 0
+PRIORITY_BACKGROUND = 10
+
+# Estados persistidos na tabela jobs
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+def _ensure_jobs_table(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            dedupe_key TEXT UNIQUE,
+            payload TEXT,
+            priority INTEGER DEFAULT 0,
+            status TEXT NOT NULL,
+            progress REAL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.commit()
+
+def _row_to_job(row) -> dict[str, Any]:
+    (job_id, kind, dedupe_key, payload, priority, status, progress,
+     message, result, error, created_at, updated_at) = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "dedupe_key": dedupe_key,
+        "payload": json.loads(payload) if payload else {},
+        "priority": priority,
+        "status": status,
+        "progress": progress or 0.0,
+        "message": message,
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+_JOB_COLUMNS = "id, kind, dedupe_key, payload, priority, status, progress, message, result, error, created_at, updated_at"
+
+class JobQueue:
+    """
+    Fila de jobs em processo com estado persistido no SQLite.
+
+    - submit() devolve o job imediatamente; o trabalho roda em background.
+    - Handlers são funções síncronas (ex.: chamadas ao LLM) executadas em thread,
+      com no máximo `concurrency` jobs simultâneos. O acesso ao SQLite também sai do
+      event loop (asyncio.to_thread); get/submit são síncronos, para chamar de thread.
+    - `dedupe_key` torna o submit idempotente: o mesmo conteúdo não é processado duas vezes.
+    - Jobs de prioridade PRIORITY_BACKGROUND têm fila e worker próprios: rodam um por vez
+      e apenas quando `is_idle()` indica que não há chat em andamento.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, concurrency: int = 2,
+                 is_idle: Optional[Callable[[], bool]] = None, idle_poll_seconds: float = 1.0):
+        self.db_path = db_path
+        self.concurrency = max(1, concurrency)
+        self.is_idle = is_idle or (lambda: True)
+        self.idle_poll_seconds = idle_poll_seconds
+        self._handlers: dict[str, Callable[[dict, Callable[[float, str], None]], Any]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._background_queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+
+    # ---------- Persistência ----------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        _ensure_jobs_table(conn)
+        return conn
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return _row_to_job(row) if row else None
+        finally:
+            conn.close()
+
+    def _get_by_dedupe_key(self, conn: sqlite3.Connection, dedupe_key: str) -> Optional[dict[str, Any]]:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE dedupe_key = ?", (dedupe_key,))
+        row = cursor.fetchone()
+        return _row_to_job(row) if row else None
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------- API pública ----------
+    def register(self, kind: str, handler: Callable[[dict, Callable[[float, str], None]], Any]) -> None:
+        """Registra o handler de um tipo de job: handler(payload, report) -> resultado (JSON)."""
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, payload: dict, dedupe_key: Optional[str] = None,
+               priority: int = PRIORITY_NORMAL) -> dict[str, Any]:
+        """
+        Cria (ou reaproveita) um job e o coloca na fila.
+        Se já existe job com o mesmo `dedupe_key` que não falhou, devolve esse job.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+
+        conn = self._connect()
+        try:
+            if dedupe_key:
+                existing = self._get_by_dedupe_key(conn, dedupe_key)
+                if (existing and existing["status"] == STATUS_QUEUED
+                        and priority < (existing["priority"] or PRIORITY_NORMAL)):
+                    # Usuário pediu algo que já estava no lote: promove para a fila normal
+                    conn.execute(
+                        "UPDATE jobs SET priority = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        (priority, existing["id"]),
+                    )
+                    conn.commit()
+                    self._enqueue(priority, existing["id"])
+                    return self._get_by_dedupe_key(conn, dedupe_key)
+                if existing and existing["status"] != STATUS_ERROR:
+                    return existing
+                if existing:
+                    # Job anterior falhou: reenfileira o mesmo id
+                    conn.execute(
+                        """
+                        UPDATE jobs SET status = ?, progress = 0, message = NULL, error = NULL,
+                            result = NULL, priority = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                        """,
+                        (STATUS_QUEUED, priority, existing["id"]),
+                    )
+                    conn.commit()
+                    self._enqueue(priority, existing["id"])
+                    return self._get_by_dedupe_key(conn, dedupe_key)
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                """
+                INSERT INTO jobs(id, kind, dedupe_key, payload, priority, status)
+                VALUES(?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, kind, dedupe_key, json.dumps(payload, ensure_ascii=False), priority, STATUS_QUEUED),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        self._enqueue(priority, job_id)
+        return self.get(job_id)
+
+    def _enqueue(self, priority: int, job_id: str) -> None:
+        # Antes do start() os jobs ficam só no banco e são recuperados na inicialização
+        if self._queue is None:
+            return
+        if priority >= PRIORITY_BACKGROUND:
+            self._background_queue.put_nowait(job_id)
+        else:
+            self._queue.put_nowait(job_id)
+
+    async def start(self) -> None:
+        """Inicia os workers e reenfileira jobs pendentes de uma execução anterior."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._background_queue = asyncio.Queue()
+
+        pending = await asyncio.to_thread(self._recover_pending)
+        for job_id, priority in pending:
+            self._enqueue(priority or PRIORITY_NORMAL, job_id)
+
+        self._workers = [asyncio.create_task(self._worker(self._queue)) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._worker(self._background_queue, background=True)))
+        print(f"⚙️ Fila de jobs iniciada ({self.concurrency} workers, {len(pending)} pendentes)")
+
+    def _recover_pending(self) -> list[tuple[str, int]]:
+        """Jobs interrompidos voltam para a fila; devolve os pendentes (id, prioridade)."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE status = ?",
+                (STATUS_QUEUED, STATUS_RUNNING),
+            )
+            conn.commit()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, priority FROM jobs WHERE status = ? ORDER BY created_at ASC",
+                (STATUS_QUEUED,),
+            )
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._background_queue = None
+
+    async def _worker(self, queue: asyncio.Queue, background: bool = False) -> None:
+        while True:
+            job_id = await queue.get()
+            try:
+                if background:
+                    # Lote: só roda quando o chat está ocioso
+                    while not self.is_idle():
+                        await asyncio.sleep(self.idle_poll_seconds)
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Erro inesperado na fila de jobs: {e}")
+            finally:
+                queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.get, job_id)
+        if not job or job["status"] != STATUS_QUEUED:
+            return
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(
+                self._update, job_id, status=STATUS_ERROR, error=f"Tipo de job desconhecido: {job['kind']}"
+            )
+            return
+
+        await asyncio.to_thread(self._update, job_id, status=STATUS_RUNNING, progress=0.0)
+
+        def report(progress: float, message: str = "") -> None:
+            # Chamado pelo handler, na thread dele
+            self._update(job_id, progress=max(0.0, min(1.0, float(progress))), message=message)
+
+        try:
+            result = await asyncio.to_thread(handler, job["payload"], report)
+        except Exception as e:
+            print(f"❌ Job {job_id} ({job['kind']}) falhou: {e}")
+            await asyncio.to_thread(self._update, job_id, status=STATUS_ERROR, error=str(e))
+            return
+
+        await asyncio.to_thread(
+            self._update,
+            job_id,
+            status=STATUS_DONE,
+            progress=1.0,
+            result=json.dumps(result, ensure_ascii=False),
+        )
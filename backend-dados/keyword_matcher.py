@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent          # /assistente-fontes/backend-dados
+
+# 📋 Tabela de regras (termos por categoria). Pode ser editada com o servidor rodando.
+RULES_PATH = str(BACKEND_DIR / "keyword_rules.json")
+
+# Intervalo mínimo entre verificações de mtime do arquivo de regras
+RELOAD_CHECK_SECONDS = 2.0
+
+class KeywordMatcher:
+    """
+    Classificador por palavras-chave pré-compilado.
+
+    As regras viram uma tabela imutável (termos agrupados por categoria), compilada
+    uma vez em duas funções: `classificar` testa as categorias na ordem das regras e
+    retorna na primeira que casa (como as cadeias de `if` originais), e `categorias`
+    devolve todas as categorias presentes, parando de testar uma categoria no primeiro
+    termo encontrado. Mantém a semântica de substring do `termo in texto` original.
+
+    Obs.: uma alternação única em regex por categoria foi medida mais lenta que a busca
+    de substring em C do CPython para este volume de termos (ver bench_keyword_matcher.py).
+    """
+
+    def __init__(self, regras: list[dict], padrao: Optional[str] = None):
+        self.padrao = padrao
+        self.ordem = tuple(r["categoria"] for r in regras)
+
+        # categoria -> (termos, combinações), na ordem das regras
+        tabela: dict = {}
+        for regra in regras:
+            termos, combinacoes = tabela.setdefault(regra["categoria"], ([], []))
+            for termo in regra.get("termos", []):
+                termo = termo.lower()
+                if termo and termo not in termos:
+                    termos.append(termo)
+            for combinacao in regra.get("combinacoes", []):
+                combinacoes.append(tuple(t.lower() for t in combinacao))
+        self._tabela = tuple(
+            (categoria, tuple(termos), tuple(combinacoes))
+            for categoria, (termos, combinacoes) in tabela.items() if termos or combinacoes
+        )
+        self._classificar, self._categorias = self._compilar()
+
+    def _compilar(self):
+        """
+        Gera funções Python com uma cadeia `or` de `in` por categoria (termos como
+        constantes). É o formato mais barato no CPython: cada teste é uma instrução de
+        busca de substring em C, sem laço interpretado nem listas recriadas por chamada.
+        """
+        testes = []
+        for _, termos, combinacoes in self._tabela:
+            partes = [f"{termo!r} in t" for termo in termos]
+            partes += ["(" + " and ".join(f"{termo!r} in t" for termo in combinacao) + ")"
+                       for combinacao in combinacoes]
+            testes.append(" or ".join(partes))
+        linhas = ["def _classificar(t):"]
+        linhas += [f"    if {teste}: return _C[{i}]" for i, teste in enumerate(testes)]
+        linhas += ["    return _P", "def _categorias(t):", "    r = set()"]
+        linhas += [f"    if {teste}: r.add(_C[{i}])" for i, teste in enumerate(testes)]
+        linhas.append("    return r")
+        namespace = {"_C": [categoria for categoria, _, _ in self._tabela], "_P": self.padrao}
+        exec(compile("\n".join(linhas), "<keyword_matcher>", "exec"), namespace)
+        return namespace["_classificar"], namespace["_categorias"]
+
+    def categorias(self, texto: str) -> set:
+        """Todas as categorias com pelo menos um termo (ou combinação) no texto (já em minúsculas)."""
+        if not texto:
+            return set()
+        return self._categorias(texto)
+
+    def classificar(self, texto: str) -> Optional[str]:
+        """Primeira categoria encontrada, na ordem das regras; `padrao` se nenhuma casar."""
+        return self._classificar(texto)
+
+class _Regras:
+    """Snapshot imutável das regras carregadas (trocado por inteiro no reload)."""
+
+    def __init__(self, dados: dict, mtime: Optional[float]):
+        self.mtime = mtime
+        self.matchers: dict[str, KeywordMatcher] = {}
+        self.fingerprints: dict[str, str] = {}
+        for grupo, conteudo in dados.items():
+            if not (isinstance(conteudo, dict) and "regras" in conteudo):
+                continue
+            self.matchers[grupo] = KeywordMatcher(conteudo["regras"], conteudo.get("padrao"))
+            self.fingerprints[grupo] = hashlib.sha1(
+                json.dumps(conteudo, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            ).hexdigest()[:12]
+
+        saudacao = dados.get("saudacao", {})
+        self.saudacoes_exatas = frozenset(s.lower() for s in saudacao.get("exatas", []))
+        self.saudacoes_prefixos = tuple(p.lower() for p in saudacao.get("prefixos", []))
+
+_lock = threading.Lock()
+_regras: Optional[_Regras] = None
+_ultima_verificacao = 0.0
+
+def reload_rules(path: str = RULES_PATH) -> bool:
+    """
+    Recarrega a tabela de regras do disco e recompila os matchers.
+    Em caso de JSON inválido mantém as regras anteriores e retorna False.
+    """
+    global _regras
+    try:
+        mtime = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        novas = _Regras(dados, mtime)
+    except Exception as e:
+        print(f"❌ Erro ao carregar regras de palavras-chave ({path}): {e}")
+        return False
+    _regras = novas
+    print(f"📋 Regras de palavras-chave carregadas: {', '.join(novas.matchers)}")
+    return True
+
+def _get_regras() -> _Regras:
+    """Regras atuais; recarrega sozinho se o arquivo mudou (verificado no máximo a cada RELOAD_CHECK_SECONDS)."""
+    global _ultima_verificacao
+    agora = time.monotonic()
+    if _regras is not None and agora - _ultima_verificacao < RELOAD_CHECK_SECONDS:
+        return _regras
+    with _lock:
+        if _regras is None or agora - _ultima_verificacao >= RELOAD_CHECK_SECONDS:
+            _ultima_verificacao = agora
+            try:
+                mtime = os.path.getmtime(RULES_PATH)
+            except OSError:
+                mtime = None
+            if _regras is None or (mtime is not None and mtime != _regras.mtime):
+                if not reload_rules() and _regras is None:
+                    raise RuntimeError(f"Não foi possível carregar {RULES_PATH}")
+    return _regras
+
+def get_matcher(grupo: str) -> KeywordMatcher:
+    return _get_regras().matchers[grupo]
+
+def fingerprint(grupo: str) -> str:
+    """Hash das regras do grupo; muda sempre que os termos do grupo mudam no JSON."""
+    return _get_regras().fingerprints[grupo]
+
+def classificar(grupo: str, texto: str) -> Optional[str]:
+    """Categoria do texto no grupo de regras (ex.: 'tipo_prompt', 'cenario')."""
+    return _get_regras().matchers[grupo].classificar(texto.lower())
+
+def categorias(grupo: str, texto: str, minusculo: bool = False) -> set[str]:
+    """
+    Todas as categorias do grupo presentes no texto, numa única chamada.
+    `minusculo=True` quando o texto já vem em minúsculas (evita outra passada no texto).
+    """
+    return _get_regras().matchers[grupo].categorias(texto if minusculo else texto.lower())
+
+def is_saudacao(texto: str) -> bool:
+    """Mensagens vagas ('oi', 'tudo bem?') ou apresentações ('meu nome é ...')."""
+    regras = _get_regras()
+    mensagem = texto.strip().lower()
+    return mensagem in regras.saudacoes_exatas or mensagem.startswith(regras.saudacoes_prefixos)
@@ -0,0 +1,173 @@
+import json
+import math
+import re
+import unicodedata
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+# 🔤 Índice invertido BM25 sobre os mesmos chunks do índice vetorial (docstore.json).
+# Complementa o MiniLM em termos exatos ("RLS", "trigger", nomes de tabela),
+# que a similaridade semântica costuma diluir.
+
+# Arquivo salvo junto com a versão do índice (storage/versions/<versão>/)
+LEXICAL_FILE = "lexical_index.npz"
+
+# Muda quando o tokenizador muda: arquivos de versão anterior são reconstruídos
+TOKENIZER_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em entre era essa
+esse esta estao estas este eu foi for ha isso isto ja la lhe mais mas me mesmo meu minha muito
+na nao nas nem no nos nossa nosso num numa o os ou para pela pelas pelo pelos por pra qual quais
+quando que quem se sem ser seu sua suas seus so sobre tambem tem ter te tu um uma umas uns voce
+voces vou sao estou
+""".split())
+
+def _sem_acento(texto: str) -> str:
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+def _singular(token: str) -> str:
+    """Redução de plural do português (leve; não é um stemmer completo)."""
+    if len(token) <= 3 or (token.endswith(("ss", "us", "is")) and not token.endswith(("ais", "eis"))):
+        return token
+    if token.endswith(("oes", "aes")):
+        return token[:-3] + "ao"
+    if token.endswith("ais"):
+        return token[:-3] + "al"
+    if token.endswith("eis"):
+        return token[:-3] + "el"
+    if token.endswith("ns"):
+        return token[:-2] + "m"
+    if token.endswith(("res", "zes")):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+def tokenizar(texto: str) -> list[str]:
+    """Minúsculas, sem acento, sem stopwords, plural reduzido ao singular."""
+    return [
+        _singular(t)
+        for t in _TOKEN_RE.findall(_sem_acento(texto.lower()))
+        if t not in STOPWORDS
+    ]
+
+class LexicalIndex:
+    """
+    BM25 pré-computado: para cada termo, a lista de chunks (postings) e o peso
+    BM25 de cada ocorrência já calculado no build. A consulta só soma pesos,
+    sem tocar no modelo de embedding.
+    """
+
+    def __init__(self, node_ids: np.ndarray, termos: np.ndarray, offsets: np.ndarray,
+                 postings: np.ndarray, pesos: np.ndarray):
+        self.node_ids = node_ids
+        self.termos = termos
+        self.offsets = offsets
+        self.postings = postings
+        self.pesos = pesos
+        self._faixas = {
+            str(termo): (int(offsets[i]), int(offsets[i + 1])) for i, termo in enumerate(termos)
+        }
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @classmethod
+    def construir(cls, nodes: Iterable[tuple[str, str]]) -> "LexicalIndex":
+        """Constrói a partir de pares (node_id, texto)."""
+        node_ids: list[str] = []
+        tamanhos: list[int] = []
+        ocorrencias: dict[str, dict[int, int]] = {}
+        for node_id, texto in nodes:
+            doc = len(node_ids)
+            node_ids.append(node_id)
+            tokens = tokenizar(texto)
+            tamanhos.append(len(tokens))
+            for token in tokens:
+                por_doc = ocorrencias.setdefault(token, {})
+                por_doc[doc] = por_doc.get(doc, 0) + 1
+
+        n_docs = len(node_ids)
+        media = (sum(tamanhos) / n_docs) if n_docs else 1.0
+        tamanhos_arr = np.asarray(tamanhos, dtype=np.float32)
+
+        termos = sorted(ocorrencias)
+        offsets = np.zeros(len(termos) + 1, dtype=np.int64)
+        postings_partes, pesos_partes = [], []
+        for i, termo in enumerate(termos):
+            por_doc = ocorrencias[termo]
+            docs = np.fromiter(por_doc.keys(), dtype=np.int32, count=len(por_doc))
+            tf = np.fromiter(por_doc.values(), dtype=np.float32, count=len(por_doc))
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norma = BM25_K1 * (1 - BM25_B + BM25_B * tamanhos_arr[docs] / max(media, 1e-9))
+            postings_partes.append(docs)
+            pesos_partes.append((idf * tf * (BM25_K1 + 1) / (tf + norma)).astype(np.float32))
+            offsets[i + 1] = offsets[i] + len(docs)
+
+        return cls(
+            np.asarray(node_ids, dtype=str),
+            np.asarray(termos, dtype=str),
+            offsets,
+            np.concatenate(postings_partes) if postings_partes else np.zeros(0, dtype=np.int32),
+            np.concatenate(pesos_partes) if pesos_partes else np.zeros(0, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_docstore(cls, docstore) -> "LexicalIndex":
+        return cls.construir((node_id, node.get_content()) for node_id, node in docstore.docs.items())
+
+    def save(self, persist_dir: Path) -> None:
+        with open(Path(persist_dir) / LEXICAL_FILE, "wb") as f:
+            np.savez_compressed(
+                f,
+                meta=np.asarray(json.dumps({"tokenizer": TOKENIZER_VERSION, "k1": BM25_K1, "b": BM25_B})),
+                node_ids=self.node_ids,
+                termos=self.termos,
+                offsets=self.offsets,
+                postings=self.postings,
+                pesos=self.pesos,
+            )
+
+    @classmethod
+    def load(cls, persist_dir: Path) -> Optional["LexicalIndex"]:
+        """Índice salvo na versão, ou None se não existir ou for de outro tokenizador."""
+        path = Path(persist_dir) / LEXICAL_FILE
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as dados:
+            meta = json.loads(str(dados["meta"]))
+            if meta.get("tokenizer") != TOKENIZER_VERSION or meta.get("k1") != BM25_K1 or meta.get("b") != BM25_B:
+                return None
+            return cls(dados["node_ids"], dados["termos"], dados["offsets"], dados["postings"], dados["pesos"])
+
+    def conhece(self, termo: str) -> bool:
+        return termo in self._faixas
+
+    def idf(self, termo: str) -> float:
+        """IDF do BM25; termos fora do vocabulário recebem o maior IDF possível."""
+        inicio, fim = self._faixas.get(termo, (0, 0))
+        n_docs = len(self.node_ids)
+        return math.log(1 + (n_docs - (fim - inicio) + 0.5) / ((fim - inicio) + 0.5))
+
+    def buscar(self, texto: str, top_k: int = 10, termos: Optional[list[str]] = None) -> list[tuple[str, float]]:
+        """Os `top_k` chunks com maior BM25 para `texto`: [(node_id, score)]."""
+        termos = set(termos if termos is not None else tokenizar(texto))
+        faixas = [self._faixas[t] for t in termos if t in self._faixas]
+        if not faixas:
+            return []
+        scores = np.zeros(len(self.node_ids), dtype=np.float32)
+        for inicio, fim in faixas:
+            scores[self.postings[inicio:fim]] += self.pesos[inicio:fim]
+        candidatos = np.flatnonzero(scores)
+        if len(candidatos) > top_k:
+            candidatos = candidatos[np.argpartition(-scores[candidatos], top_k - 1)[:top_k]]
+        candidatos = candidatos[np.argsort(-scores[candidatos], kind="stable")]
+        return [(str(self.node_ids[i]), float(scores[i])) for i in candidatos]
@@ -1,18 +1,22 @@
 # logs_route.py
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
+import os
 import sqlite3
 import csv
 import io
 from pathlib import Path
 
 from auth_utils import get_current_user
+from healthplan_log import listar_healthplan
 
 router = APIRouter()
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # /assistente-fontes
-LOGS_DB_PATH = str(BASE_DIR / "logs.db")
+LOGS_DB_PATH = os.getenv("LOGS_DB_PATH", str(BASE_DIR / "logs.db"))
 
 def _ensure_logs_table(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
@@ -59,3 +63,32 @@ def exportar_logs_csv(user: str = Depends(get_current_user)):
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=logs.csv"}
     )
+
+@router.get("/logs/healthplan")
+def exportar_healthplan(
+    inicio: Optional[str] = None,
+    fim: Optional[str] = None,
+    usuario: Optional[str] = None,
+    formato: str = "csv",
+    user: str = Depends(get_current_user),
+):
+    """
+    Perguntas de Health Plan por período (?inicio=YYYY-MM-DD&fim=YYYY-MM-DD).
+    Retorna CSV (padrão) ou JSON com ?formato=json. Só para usuários autenticados.
+    """
+    registros = listar_healthplan(inicio=inicio, fim=fim, usuario=usuario)
+
+    if formato == "json":
+        return JSONResponse({"count": len(registros), "registros": registros})
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["id", "pergunta", "usuario", "data"])
+    writer.writerows([r["id"], r["pergunta"], r["usuario"], r["data"]] for r in registros)
+    output.seek(0)
+
+    return StreamingResponse(
+        output,
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=healthplan_perguntas.csv"}
+    )
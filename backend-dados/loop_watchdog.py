@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import metrics
+
+# 🐢 Vigia do event loop: uma task mede o atraso do loop a cada LOOP_LAG_INTERVAL_MS
+# (quanto o asyncio.sleep acordou depois do previsto) e alimenta o histograma
+# event_loop_lag_seconds. Uma thread confere a última batida dessa task; se o loop passa
+# de LOOP_BLOCK_THRESHOLD_MS sem voltar, ela lê a pilha da thread do loop naquele
+# instante: é o código que está bloqueando (busca, SQLite, SDK síncrono...).
+# Os bloqueios são agrupados por ponto de origem (contagem, tempo total e máximo) em
+# /admin/loop/blocks; zerar com DELETE depois de uma correção mostra se o ponto sumiu.
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "1") == "1"
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "200"))
+# Pontos de bloqueio distintos guardados (os menos recentes saem primeiro)
+LOOP_BLOCK_SITES = int(os.getenv("LOOP_BLOCK_SITES", "100"))
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Frames guardados por pilha (os mais próximos do ponto de bloqueio)
+PROFUNDIDADE_PILHA = 40
+
+_METRIC_LAG = metrics.histogram(
+    "event_loop_lag_seconds", "Atraso do event loop (acordar do sleep depois do previsto)",
+    [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+_METRIC_BLOQUEIOS = metrics.counter(
+    "event_loop_blocks_total", "Vezes que o event loop ficou bloqueado além de LOOP_BLOCK_THRESHOLD_MS"
+)
+
+def _origem(pilha: traceback.StackSummary) -> str:
+    """Frame mais profundo do código do backend (ou a ponta da pilha, se não houver)."""
+    for frame in reversed(pilha):
+        if frame.filename.startswith(str(BACKEND_DIR)) and frame.filename != __file__:
+            return f"{Path(frame.filename).name}:{frame.lineno} em {frame.name}"
+    frame = pilha[-1]
+    return f"{Path(frame.filename).name}:{frame.lineno} em {frame.name}"
+
+class VigiaLoop:
+    """Mede o atraso do event loop e captura a pilha de quem o bloqueia."""
+
+    def __init__(self, intervalo_ms: float = LOOP_LAG_INTERVAL_MS,
+                 limite_ms: float = LOOP_BLOCK_THRESHOLD_MS, max_pontos: int = LOOP_BLOCK_SITES):
+        self.intervalo = max(intervalo_ms, 1.0) / 1000
+        self.limite = max(limite_ms, 1.0) / 1000
+        self.max_pontos = max_pontos
+        self.ultimo_atraso = 0.0
+        self.pontos: OrderedDict[str, dict] = OrderedDict()   # assinatura -> agregado
+        self._batida: Optional[float] = None
+        self._pendente: Optional[dict] = None                # pilha capturada, esperando o loop voltar
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread_loop: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        """Chamar de dentro do event loop a vigiar (startup do app)."""
+        self._thread_loop = threading.get_ident()
+        self._parar.clear()
+        self._task = asyncio.create_task(self._medir())
+        self._thread = threading.Thread(target=self._vigiar, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _medir(self) -> None:
+        while True:
+            inicio = time.monotonic()
+            self._batida = inicio
+            await asyncio.sleep(self.intervalo)
+            atraso = max(time.monotonic() - inicio - self.intervalo, 0.0)
+            self.ultimo_atraso = atraso
+            _METRIC_LAG.observe(atraso)
+            with self._lock:
+                pendente, self._pendente = self._pendente, None
+            if pendente is not None:
+                self._registrar(pendente, atraso)
+
+    def _vigiar(self) -> None:
+        verificacao = max(min(self.intervalo, self.limite) / 4, 0.005)
+        while not self._parar.wait(verificacao):
+            batida = self._batida
+            if batida is None or time.monotonic() - batida <= self.intervalo + self.limite:
+                continue
+            with self._lock:
+                if self._pendente is not None and self._pendente["batida"] == batida:
+                    continue  # este bloqueio já foi capturado
+            frame = sys._current_frames().get(self._thread_loop)
+            if frame is None:
+                continue
+            pilha = traceback.extract_stack(frame)[-PROFUNDIDADE_PILHA:]
+            del frame
+            with self._lock:
+                self._pendente = {"batida": batida, "pilha": pilha, "quando": time.time()}
+
+    def _registrar(self, pendente: dict, duracao: float) -> None:
+        pilha: traceback.StackSummary = pendente["pilha"]
+        # Mesma sequência de funções = mesmo ponto (a linha da ponta varia num laço longo)
+        assinatura = hashlib.sha1(
+            "\n".join(f"{f.filename}:{f.name}" for f in pilha).encode("utf-8")
+        ).hexdigest()[:12]
+        _METRIC_BLOQUEIOS.inc()
+        ponto = self.pontos.pop(assinatura, None)
+        novo = ponto is None
+        if novo:
+            ponto = {"assinatura": assinatura, "origem": _origem(pilha), "vezes": 0,
+                     "total_s": 0.0, "max_s": 0.0}
+        ponto["vezes"] += 1
+        ponto["total_s"] = round(ponto["total_s"] + duracao, 3)
+        ponto["max_s"] = round(max(ponto["max_s"], duracao), 3)
+        ponto["ultimo"] = datetime.fromtimestamp(pendente["quando"]).isoformat(timespec="seconds")
+        ponto["pilha"] = [f"{f.filename}:{f.lineno} em {f.name}" + (f"  |  {f.line}" if f.line else "")
+                          for f in pilha]
+        self.pontos[assinatura] = ponto
+        while len(self.pontos) > self.max_pontos:
+            self.pontos.popitem(last=False)
+        print(f"🐢 Event loop bloqueado por {duracao * 1000:.0f} ms em {ponto['origem']} ({ponto['vezes']}x)")
+        if novo:
+            print("".join(traceback.format_list(pilha)).rstrip())
+
+    def relatorio(self) -> dict:
+        """Pontos de bloqueio, do maior tempo total para o menor."""
+        return {
+            "intervalo_ms": self.intervalo * 1000,
+            "limite_ms": self.limite * 1000,
+            "ultimo_atraso_ms": round(self.ultimo_atraso * 1000, 1),
+            "bloqueios": sorted(self.pontos.values(), key=lambda p: p["total_s"], reverse=True),
+        }
+
+    def zerar(self) -> None:
+        self.pontos.clear()
+
+vigia = VigiaLoop()
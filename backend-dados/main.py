@@ -1,31 +1,47 @@
 import os
 import json
+import math
 import sqlite3
+import threading
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Any
 from pathlib import Path
 from fastapi import FastAPI, Request, Depends, WebSocket, WebSocketDisconnect
 import asyncio
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse, PlainTextResponse, Response, FileResponse
 from fastapi.staticfiles import StaticFiles
 from passlib.context import CryptContext
 from jose import jwt
 
-from search_engine import retrieve_relevant_context
+import search_engine
+from search_engine import retrieve_relevant_context, embed_question_async, lexical_fast_path
+import index_store
+import metrics
+from auth_utils import get_admin_user, usuario_do_token
+import admission
+import profiler
+from loop_watchdog import LOOP_WATCHDOG, vigia as vigia_loop
 from gpt_utils import generate_answer, generate_answer_stream
 from db_logs import registrar_log
 from logs_route import router as logs_router
-from prompt_router import inferir_tipo_de_prompt
-from healthplan_log import registrar_healthplan
+from prompt_router import inferir_tipo_de_prompt, INTENT_CLASSIFIER
+from healthplan_log import registrar_healthplan, migrar_healthplan_json
+from static_assets import AssetsEstaticos, responder, CACHE_IMUTAVEL, CACHE_REVALIDAR
+from ws_stream import EnviadorFrames, TextCoalescer, escolher_subprotocolo
+from jobs import JobQueue, PRIORITY_NORMAL, PRIORITY_BACKGROUND, STATUS_DONE, STATUS_ERROR
 
 import re
 
 app = FastAPI()
+# 🔬 Profiling opt-in das requisições HTTP (o /ws/chat é perfilado por turno)
+app.add_middleware(profiler.ProfilerMiddleware)
 
 # Caminhos absolutos (não dependem do diretório atual ao rodar o uvicorn)
 BASE_DIR = Path(__file__).resolve().parent.parent  # /assistente-fontes
 CHAT_DIR = BASE_DIR / "chat-simples"
-LOGS_DB_PATH = str(BASE_DIR / "logs.db")
+# Banco de logs/sessões/jobs (LOGS_DB_PATH troca, ex.: cópia temporária do bench_e2e)
+LOGS_DB_PATH = os.getenv("LOGS_DB_PATH", str(BASE_DIR / "logs.db"))
 CLAUDE_PROJECTS_DIR = Path.home() / ".claude" / "projects"
 CLAUDE_SESSION_PREFIX = "claude:"
 
@@ -62,6 +78,8 @@ def _ensure_session_meta_table(conn: sqlite3.Connection) -> None:
             hidden INTEGER DEFAULT 0,
             title TEXT,
             summary TEXT,
+            summary_cursor INTEGER DEFAULT 0,
+            summary_resets INTEGER DEFAULT 0,
             tags TEXT,
             updated_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
@@ -78,6 +96,12 @@ def _ensure_session_meta_table(conn: sqlite3.Connection) -> None:
         cursor.execute("ALTER TABLE session_meta ADD COLUMN summary TEXT")
     if 'tags' not in columns:
         cursor.execute("ALTER TABLE session_meta ADD COLUMN tags TEXT")
+    if 'summary_cursor' not in columns:
+        # High-water mark do resumo incremental: último log id (logs.db) ou offset em bytes (JSONL)
+        cursor.execute("ALTER TABLE session_meta ADD COLUMN summary_cursor INTEGER DEFAULT 0")
+    if 'summary_resets' not in columns:
+        # Quantas vezes o resumo foi invalidado (entra na chave de dedupe dos jobs de resumo)
+        cursor.execute("ALTER TABLE session_meta ADD COLUMN summary_resets INTEGER DEFAULT 0")
 
     conn.commit()
 
@@ -148,12 +172,86 @@ def _get_session_metadata(conn: sqlite3.Connection, session_id: str) -> dict:
         }
     return {}
 
+def _get_session_summary_state(conn: sqlite3.Connection, session_id: str) -> tuple[str, int]:
+    """
+    Retorna (resumo, cursor) do resumo incremental da sessão.
+    cursor = 0 significa que nada foi resumido ainda (ou que o resumo precisa ser refeito).
+    """
+    _ensure_session_meta_table(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT summary, summary_cursor FROM session_meta WHERE session_id = ?",
+        (session_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return ("", 0)
+    return (row[0] or "", int(row[1] or 0))
+
+def _save_session_summary_state(conn: sqlite3.Connection, session_id: str, summary: str,
+                                summary_cursor: int, expected_cursor: int) -> bool:
+    """
+    Persiste o resumo acumulado junto com o novo high-water mark, só se o cursor salvo
+    ainda é `expected_cursor` (o lido antes de resumir). Retorna False se outro resumo
+    ou um reset (mensagens apagadas) mudou o cursor no meio: o resultado está velho.
+    """
+    _ensure_session_meta_table(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO session_meta(session_id, summary, summary_cursor, updated_at)
+        VALUES(?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(session_id) DO UPDATE SET
+            summary=excluded.summary,
+            summary_cursor=excluded.summary_cursor,
+            updated_at=CURRENT_TIMESTAMP
+        WHERE COALESCE(session_meta.summary_cursor, 0) = ?
+        """,
+        (session_id, summary, summary_cursor, expected_cursor),
+    )
+    conn.commit()
+    return cursor.rowcount > 0
+
+def _reset_session_summary_cursor(conn: sqlite3.Connection, session_id: str) -> None:
+    """
+    Força o próximo resumo a reler a sessão inteira (ex.: mensagens apagadas).
+    Incrementa summary_resets: apagar uma mensagem que não é a última não muda o MAX(id),
+    e sem isso o job de resumo já concluído (com o conteúdo apagado) seria reaproveitado.
+    """
+    _ensure_session_meta_table(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO session_meta(session_id, summary_cursor, summary_resets, updated_at)
+        VALUES(?, 0, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT(session_id) DO UPDATE SET
+            summary_cursor=0,
+            summary_resets=COALESCE(session_meta.summary_resets, 0) + 1,
+            updated_at=CURRENT_TIMESTAMP
+        """,
+        (session_id,)
+    )
+    conn.commit()
+
+def _get_session_summary_resets(conn: sqlite3.Connection, session_id: str) -> int:
+    _ensure_session_meta_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT summary_resets FROM session_meta WHERE session_id = ?", (session_id,))
+    row = cursor.fetchone()
+    return int(row[0] or 0) if row else 0
+
 def _safe_iso_from_mtime(path: Path) -> str:
     try:
         return datetime.fromtimestamp(path.stat().st_mtime).isoformat()
     except Exception:
         return datetime.utcnow().isoformat()
 
+def _safe_file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except Exception:
+        return 0
+
 def _count_jsonl_lines(path: Path, max_lines: int = 50000) -> int:
     """Conta linhas (aprox) sem carregar tudo em memória."""
     try:
@@ -356,7 +454,102 @@ def _load_claude_session_entries(session_uuid: str) -> tuple[list[dict[str, Any]
 
     return (entries, model)
 
+def _claude_entry_to_summary_message(entry: dict[str, Any]) -> Optional[dict[str, str]]:
+    """Converte uma linha do JSONL do Claude Code em {'role', 'content'} para o resumo."""
+    if entry.get("type") not in ("user", "assistant", "message"):
+        return None
+    msg = entry.get("message")
+    if not isinstance(msg, dict):
+        return None
+    role = "assistant" if (msg.get("role") or entry.get("type")) == "assistant" else "user"
+    content = msg.get("content")
+    # Extrair texto do conteúdo (string, bloco único ou lista de blocos)
+    if isinstance(content, str):
+        text = content
+    elif isinstance(content, dict):
+        text = content.get("text", "")
+    elif isinstance(content, list):
+        text = "\n".join(
+            block.get("text", "") for block in content
+            if isinstance(block, dict) and block.get("type") == "text"
+        )
+    else:
+        text = ""
+    text = (text or "").strip()
+    if not text:
+        return None
+    return {"role": role, "content": text}
+
+def _load_claude_messages_since(session_uuid: str, offset: int) -> tuple[list[dict[str, str]], int]:
+    """
+    Lê apenas as linhas do JSONL a partir de `offset` (bytes) e devolve (mensagens, novo_offset).
+    Linhas incompletas no fim do arquivo (ainda sendo escritas) ficam para a próxima leitura.
+    """
+    path = _find_claude_session_file(session_uuid)
+    if not path:
+        return ([], offset)
+
+    messages: list[dict[str, str]] = []
+    with path.open("rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except Exception:
+                continue
+            message = _claude_entry_to_summary_message(item)
+            if message:
+                messages.append(message)
+
+    return (messages, offset)
+
+def _load_log_messages_since(conn: sqlite3.Connection, session_id: str, last_id: int) -> tuple[list[dict[str, str]], int]:
+    """Lê apenas os turnos do logs.db com id > last_id e devolve (mensagens, último id lido)."""
+    messages: list[dict[str, str]] = []
+    usernames = _session_usernames(session_id)
+    if not usernames:
+        return (messages, last_id)
+
+    _ensure_logs_table(conn)
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, pergunta, resposta FROM logs WHERE usuario IN (?, ?) AND id > ? ORDER BY id ASC",
+        (usernames[0], usernames[1], last_id)
+    )
+    for log_id, pergunta, resposta in cursor.fetchall():
+        last_id = max(last_id, int(log_id))
+        if pergunta:
+            messages.append({'role': 'user', 'content': pergunta})
+        if resposta:
+            messages.append({'role': 'assistant', 'content': resposta})
+    return (messages, last_id)
+
 # Servir arquivos estáticos do chat-simples (sempre funciona, mesmo rodando de backend-dados/)
+# Páginas HTML apontam para /assets/<nome>.<hash>.<ext> (imutáveis, gzip/brotli, JS em bundle);
+# /css e /js continuam servindo os arquivos originais
+assets_estaticos = AssetsEstaticos(CHAT_DIR).construir()
+print(f"📦 Assets estáticos: {len(assets_estaticos.assets)} arquivos, {assets_estaticos.nbytes}")
+
+@app.api_route("/assets/{nome}", methods=["GET", "HEAD"])
+def static_asset(nome: str, request: Request):
+    asset = assets_estaticos.assets.get(nome)
+    if asset is None:
+        return Response(status_code=404)
+    return responder(request, asset, CACHE_IMUTAVEL)
+
+@app.api_route("/html/{nome}", methods=["GET", "HEAD"])
+def static_page(nome: str, request: Request):
+    pagina = assets_estaticos.paginas.get(nome)
+    if pagina is None:
+        return Response(status_code=404)
+    return responder(request, pagina, CACHE_REVALIDAR)
+
 app.mount("/css", StaticFiles(directory=str(CHAT_DIR / "css")), name="css")
 app.mount("/js", StaticFiles(directory=str(CHAT_DIR / "js")), name="js")
 app.mount("/html", StaticFiles(directory=str(CHAT_DIR / "html")), name="html")
@@ -383,6 +576,110 @@ def get_or_create_history(conversation_id):
 
     return conversation_histories[conversation_id]
 
+# ========== FILA DE JOBS (resumos e outras tarefas lentas de LLM) ==========
+# Respostas de chat em andamento; jobs em lote só rodam quando está em zero
+active_generations = 0
+# WebSockets /ws/chat abertos (limite em admission.WS_MAX_CONNECTIONS)
+ws_conexoes = 0
+
+def _parse_offpeak_hours(value: str) -> Optional[tuple[int, int]]:
+    """'0-6' -> (0, 6). Vazio ou inválido -> None (sem janela, roda a qualquer hora)."""
+    try:
+        inicio, fim = (int(p) for p in value.split("-", 1))
+        return (inicio % 24, fim % 24)
+    except Exception:
+        return None
+
+# Janela opcional (hora local) para jobs em lote, ex.: JOBS_OFFPEAK_HOURS=0-6
+JOBS_OFFPEAK_HOURS = _parse_offpeak_hours(os.getenv("JOBS_OFFPEAK_HOURS", ""))
+
+def _jobs_is_idle() -> bool:
+    if active_generations > 0:
+        return False
+    if JOBS_OFFPEAK_HOURS is None:
+        return True
+    inicio, fim = JOBS_OFFPEAK_HOURS
+    hora = datetime.now().hour
+    if inicio <= fim:
+        return inicio <= hora < fim
+    return hora >= inicio or hora < fim
+
+job_queue = JobQueue(
+    concurrency=int(os.getenv("JOBS_CONCURRENCY", "2")),
+    is_idle=_jobs_is_idle,
+)
+
+@app.on_event("startup")
+async def _start_job_queue():
+    await job_queue.start()
+
+@app.on_event("startup")
+async def _migrate_healthplan_log():
+    # Importa o antigo healthplan_perguntas.json (se existir) para o SQLite
+    await asyncio.to_thread(migrar_healthplan_json)
+
+@app.on_event("startup")
+async def _warmup_intent_classifier():
+    # Embeddings das perguntas de exemplo são calculados uma vez, fora do primeiro turno
+    if INTENT_CLASSIFIER == "embedding":
+        from intent_classifier import get_intent_classifier
+        await asyncio.to_thread(get_intent_classifier)
+
+@app.on_event("shutdown")
+async def _stop_job_queue():
+    await job_queue.stop()
+
+# 🔄 Recarga do índice sem reiniciar o processo (WebSockets e conversation_histories continuam)
+# INDEX_WATCH=1 confere storage/CURRENT periodicamente e carrega versões novas do generate_index
+INDEX_WATCH = os.getenv("INDEX_WATCH", "1") == "1"
+INDEX_WATCH_SECONDS = float(os.getenv("INDEX_WATCH_SECONDS", "5"))
+
+_index_watch_task: Optional[asyncio.Task] = None
+
+async def _watch_index_versions():
+    ultimo_mtime = None
+    while True:
+        await asyncio.sleep(INDEX_WATCH_SECONDS)
+        try:
+            mtime = index_store.CURRENT_FILE.stat().st_mtime
+        except OSError:
+            continue
+        if mtime == ultimo_mtime:
+            continue
+        ultimo_mtime = mtime
+        if index_store.current_version() == search_engine.index_version:
+            continue
+        try:
+            await asyncio.to_thread(search_engine.reload_index)
+        except Exception as e:
+            print(f"❌ Erro ao recarregar o índice: {e}")
+
+@app.on_event("startup")
+async def _start_index_watch():
+    global _index_watch_task
+    if INDEX_WATCH:
+        _index_watch_task = asyncio.create_task(_watch_index_versions())
+
+@app.on_event("shutdown")
+async def _stop_index_watch():
+    if _index_watch_task:
+        _index_watch_task.cancel()
+
+# 🐢 Atraso do event loop e pilhas de quem o bloqueia (loop_watchdog; LOOP_WATCHDOG=0 desliga)
+@app.on_event("startup")
+async def _start_loop_watchdog():
+    if LOOP_WATCHDOG:
+        vigia_loop.iniciar()
+
+@app.on_event("shutdown")
+async def _stop_loop_watchdog():
+    vigia_loop.parar()
+
+metrics.gauge("active_generations", "Respostas sendo geradas agora neste worker", lambda: active_generations)
+metrics.gauge("ws_connections", "WebSockets /ws/chat abertos neste worker", lambda: ws_conexoes)
+metrics.gauge("conversation_histories", "Conversas em memória neste worker", lambda: len(conversation_histories))
+_METRIC_WS_CANCELADOS = metrics.counter("ws_generations_cancelled_total", "Respostas do /ws/chat canceladas antes do fim")
+
 # 🔐 Autenticação
 SECRET_KEY = "segredo-teste"
 ALGORITHM = "HS256"
@@ -393,10 +690,22 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Use: pwd_context.hash("N4nd@M4c#2025") para gerar novo hash se necessário
 fake_users = {"aluno1": "$2b$12$kQ8ZqX5y6rC9vD2nH0jO0OeKZqXxYwZqXxYwZqXxYwZqXxYwZqXxYO"}
 
+# bcrypt é lento de propósito (~0,2 s por verificação): roda fora do event loop, com no
+# máximo LOGIN_BCRYPT_CONCURRENCY verificações simultâneas para não tomar o threadpool
+LOGIN_BCRYPT_CONCURRENCY = int(os.getenv("LOGIN_BCRYPT_CONCURRENCY", "2"))
+_bcrypt_slots = asyncio.Semaphore(LOGIN_BCRYPT_CONCURRENCY)
+
 def authenticate_user(username: str, password: str):
     if username not in fake_users:
         return False
-    return pwd_context.verify(password, fake_users[username])
+    try:
+        return pwd_context.verify(password, fake_users[username])
+    except ValueError:  # hash malformado
+        return False
+
+async def authenticate_user_async(username: str, password: str) -> bool:
+    async with _bcrypt_slots:
+        return await asyncio.to_thread(authenticate_user, username, password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -404,6 +713,62 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+@app.post("/login")
+async def login(request: Request):
+    """Login (form ou JSON com username/password): grava o JWT no cookie "token"."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        dados = await request.json()
+    else:
+        dados = await request.form()
+    username = str(dados.get("username") or "")
+    password = str(dados.get("password") or "")
+    if not username or not await authenticate_user_async(username, password):
+        return JSONResponse({"success": False, "error": "Usuário ou senha inválidos"}, status_code=401)
+    resposta = JSONResponse({"success": True, "user": username})
+    resposta.set_cookie(
+        "token", create_access_token({"sub": username}),
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60, httponly=True, samesite="lax",
+    )
+    return resposta
+
+@app.get("/metrics")
+def get_metrics():
+    """Métricas do worker no formato texto do Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/index/reload")
+async def admin_reload_index(user: str = Depends(get_admin_user)):
+    """Carrega a versão do índice apontada por storage/CURRENT e troca sem derrubar conexões."""
+    try:
+        resultado = await asyncio.to_thread(search_engine.reload_index)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+    return JSONResponse({"success": True, **resultado})
+
+@app.get("/admin/loop/blocks")
+async def admin_loop_blocks(user: str = Depends(get_admin_user)):
+    """Pontos que bloquearam o event loop, com pilha, contagem e tempo total/máximo."""
+    return JSONResponse(vigia_loop.relatorio())
+
+@app.delete("/admin/loop/blocks")
+async def admin_reset_loop_blocks(user: str = Depends(get_admin_user)):
+    """Zera os pontos de bloqueio (ex.: para conferir uma correção)."""
+    vigia_loop.zerar()
+    return JSONResponse({"success": True})
+
+@app.get("/admin/profiles")
+def admin_list_profiles(limite: int = 100, user: str = Depends(get_admin_user)):
+    """Capturas do profiler, das mais recentes para as mais antigas (metadados)."""
+    return JSONResponse({"profiles": profiler.listar(limite)})
+
+@app.get("/admin/profiles/{nome}")
+def admin_get_profile(nome: str, user: str = Depends(get_admin_user)):
+    """Pilhas "folded" de uma captura (flamegraph.pl, speedscope, inferno)."""
+    path = profiler.caminho(nome)
+    if path is None:
+        return JSONResponse({"success": False, "error": "Captura não encontrada"}, status_code=404)
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=nome)
+
 @app.get("/")
 def root():
     """Redireciona para o chat-simples"""
@@ -468,38 +833,242 @@ def _parece_lista_modulos(texto: str) -> bool:
     return ("composto por 7 módulos" in t) or ("módulo 01" in t and "módulo 07" in t)
 
 # ====== ENDPOINT WEBSOCKET PARA CHAT-SIMPLES ======
+# 1: só aceita WebSockets com cookie de login válido (0: anônimos identificados pelo IP)
+WS_REQUIRE_AUTH = os.getenv("WS_REQUIRE_AUTH", "0") == "1"
+
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
-    """Endpoint WebSocket para streaming de respostas compatível com chat-simples"""
-    await websocket.accept()
-    print("✅ WebSocket conectado")
+    """
+    Endpoint WebSocket para streaming de respostas compatível com chat-simples.
+
+    Uma task lê o socket o tempo todo; cada pergunta vira uma task de geração.
+    {"type": "cancel"} interrompe a resposta em andamento (e o stream do LLM);
+    uma pergunta nova substitui a anterior; desconectar cancela a geração.
+    Admissão (admission.py): limite de conexões, taxa de mensagens por usuário/IP e
+    fila justa de gerações, com {"type": "queued", "position": N} enquanto espera.
+    Profiling (profiler.py): ?profile=1 / X-Profile no handshake perfila todos os turnos
+    da conexão; {"profile": true} na mensagem, só aquele turno.
+    """
+    global ws_conexoes
+    # Subprotocolo pedido pelo cliente: codificação (JSON/MessagePack) e "result" sem o texto
+    subprotocolo = escolher_subprotocolo(websocket)
+    await websocket.accept(subprotocol=subprotocolo)
+    print(f"✅ WebSocket conectado ({subprotocolo or 'json legado'})")
 
     conversation_id = None
+    # Todos os frames do servidor passam pelo enviador (ordem garantida e contagem por turno)
+    enviador = EnviadorFrames(websocket, subprotocolo)
+    turno: Optional[asyncio.Task] = None
+
+    # Autenticação uma vez, na conexão (token do cookie de login, verificado pelo cache
+    # do auth_utils); identidade para o bucket por usuário e a fila justa: o usuário ou,
+    # sem login, a própria conexão (o IP não serve: quem está atrás do mesmo NAT/proxy
+    # dividiria um bucket só e uma vez na fila; o IP tem o bucket próprio).
+    # O IP é o do cliente só se o uvicorn confiar no proxy: --proxy-headers (padrão) e
+    # --forwarded-allow-ips com o IP do nginx (padrão 127.0.0.1), que deve mandar
+    # X-Forwarded-For; sem isso, todos os clientes aparecem com o IP do proxy.
+    ip = websocket.client.host if websocket.client else "desconhecido"
+    usuario_autenticado = usuario_do_token(websocket.cookies.get("token"))
+    if WS_REQUIRE_AUTH and not usuario_autenticado:
+        admission.rejeitado("sem_login")
+        await enviador.enviar({"type": "error", "error": "Faça login para usar o chat."})
+        await websocket.close(code=1008)  # Policy Violation
+        return
+    usuario = usuario_autenticado or f"conexao:{uuid.uuid4().hex[:12]}"
+    perfilar_conexao = profiler.pedido_explicito(websocket.headers, websocket.url.query)
+
+    if ws_conexoes >= admission.WS_MAX_CONNECTIONS:
+        admission.rejeitado("conexoes")
+        await enviador.enviar({"type": "error", "error": "Servidor cheio no momento. Tente novamente em instantes."})
+        await websocket.close(code=1013)  # Try Again Later
+        return
 
     # Task de keepalive para manter conexão ativa
     async def send_keepalive():
         while True:
             try:
                 await asyncio.sleep(30)  # Ping a cada 30 segundos
-                await websocket.send_json({"type": "ping"})
+                await enviador.enviar({"type": "ping"})
             except Exception:
                 break
 
+    async def gerar_resposta(question: str, conversation_id: str, perfilar: bool = False):
+        """Um turno completo: contexto, streaming da resposta, histórico e log."""
+        global active_generations
+
+        # Recupera ou cria histórico para esta conversa
+        conversation_history = get_or_create_history(conversation_id)
+
+        # Envia confirmação de que mensagem do usuário foi salva
+        await enviador.enviar({
+            "type": "user_message_saved",
+            "conversation_id": conversation_id
+        })
+
+        # Adiciona pergunta ao histórico
+        conversation_history.append({"user": question, "ai": ""})
+
+        async def avisar_posicao(posicao: int):
+            await enviador.enviar({"type": "queued", "position": posicao, "conversation_id": conversation_id})
+
+        full_response = ""
+        texto_transmitido = ""
+        enviador.inicio_turno()
+        coalescer = TextCoalescer(enviador)
+        com_vaga = False
+        captura = profiler.iniciar(
+            "ws/chat turno", profiler.deve_perfilar(perfilar, usuario_autenticado),
+            usuario=usuario, conversation_id=conversation_id,
+        )
+        try:
+            # Espera vaga na fila de gerações (justa entre usuários)
+            await admission.fila_geracoes.entrar(usuario, avisar_posicao)
+            com_vaga = True
+            active_generations += 1
+
+            # Recupera contexto (o embedding da pergunta serve à busca e ao tipo de prompt;
+            # perguntas de termo exato vão só pelo BM25 e dispensam o embedding)
+            query_embedding = None
+            if INTENT_CLASSIFIER == "embedding" or not lexical_fast_path(question):
+                query_embedding = await embed_question_async(question)
+            context = await asyncio.to_thread(retrieve_relevant_context, question, query_embedding=query_embedding)
+            tipo_de_prompt = inferir_tipo_de_prompt(question, embedding=query_embedding)
+            if tipo_de_prompt == "health_plan":
+                registrar_healthplan(question, usuario=f"ws_{conversation_id}")
+
+            # Gera resposta com streaming
+            quick_replies = []
+            progresso = None
+            start_time = datetime.now()
+            is_first = len(conversation_history) == 1
+
+            async for item in generate_answer_stream(
+                question=question,
+                context=context,
+                history=conversation_history[:-1],
+                tipo_de_prompt=tipo_de_prompt,
+                is_first_question=is_first
+            ):
+                item_type = item.get("type")
+                item_data = item.get("data")
+
+                if item_type == "metadata":
+                    # Metadados (progresso, cenário) - não precisa enviar ao cliente
+                    progresso = item_data.get("progresso")
+                    continue
+
+                elif item_type == "text":
+                    # Chunk de texto - envia ao cliente (agrupado pelo coalescer)
+                    text_chunk = item_data
+                    full_response += text_chunk
+                    texto_transmitido += text_chunk
+                    await coalescer.adicionar(text_chunk)
+
+                elif item_type == "complete":
+                    # Dados de conclusão
+                    quick_replies = item_data.get("quick_replies", [])
+                    if "full_response" in item_data:
+                        full_response = item_data["full_response"]
+                    if "progresso" in item_data:
+                        progresso = item_data["progresso"]
+
+            # Texto ainda no buffer sai antes do resultado final
+            await coalescer.flush()
+
+            # Calcula duração
+            duration_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+
+            # Atualiza histórico com resposta completa e progresso
+            conversation_history[-1]["ai"] = full_response
+            if progresso:
+                conversation_history[-1]["progresso"] = progresso
+            if quick_replies:
+                conversation_history[-1]["quick_replies"] = quick_replies
+
+            # Envia resultado final (formato compatível com chat-simples); clientes v2
+            # já têm o texto pelos text_chunk, que só é repetido se a versão final mudou
+            resultado = {
+                "type": "result",
+                "content": full_response,
+                "conversation_id": conversation_id,
+                "duration_ms": duration_ms,
+                "num_turns": len(conversation_history),
+                "quick_replies": quick_replies,
+                "progresso": progresso
+            }
+            if enviador.resultado_sem_texto and full_response == texto_transmitido:
+                del resultado["content"]
+            await enviador.enviar(resultado)
+            frames, bytes_enviados = enviador.fim_turno()
+            print(f"📦 Turno enviado em {frames} frames / {bytes_enviados} bytes "
+                  f"({coalescer.pedacos} pedaços de texto)")
+
+            # Log da conversa
+            registrar_log(
+                usuario=f"ws_{conversation_id}",
+                pergunta=question,
+                resposta=full_response,
+                contexto=context,
+                tipo_prompt=tipo_de_prompt,
+                modulo=str(progresso.get("modulo")) if progresso else None,
+                aula=progresso.get("aula") if progresso else None
+            )
+
+        except asyncio.CancelledError:
+            # Cancelado pelo cliente, por uma pergunta nova ou pela desconexão: o stream
+            # do LLM já foi fechado; o histórico fica com o que chegou a ser gerado
+            print(f"⏹️ Geração cancelada (conversation_id: {conversation_id}, {len(texto_transmitido)} caracteres)")
+            _METRIC_WS_CANCELADOS.inc()
+            conversation_history[-1]["ai"] = texto_transmitido
+            try:
+                await coalescer.flush()
+                await enviador.enviar({"type": "cancelled", "conversation_id": conversation_id})
+            except Exception:
+                pass  # socket já fechado
+            raise
+        except Exception as e:
+            print(f"❌ Erro ao gerar resposta: {e}")
+            await enviador.enviar({
+                "type": "error",
+                "error": f"Erro ao processar sua mensagem: {str(e)}"
+            })
+        finally:
+            coalescer.fechar()
+            if com_vaga:
+                active_generations -= 1
+                admission.fila_geracoes.sair()
+            profiler.encerrar(captura, caracteres=len(full_response), frames=enviador.frames)
+
+    async def cancelar_turno():
+        if turno is not None and not turno.done():
+            turno.cancel()
+            try:
+                await turno
+            except asyncio.CancelledError:
+                pass
+
+    ws_conexoes += 1
     keepalive_task = asyncio.create_task(send_keepalive())
 
     try:
         while True:
-            # Recebe mensagem do cliente
-            data = await websocket.receive_json()
+            # Recebe mensagem do cliente (continua lendo enquanto a resposta é gerada)
+            data = await enviador.receber()
 
             # Responde pong se for ping do cliente
             if data.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
+                await enviador.enviar({"type": "pong"})
                 continue
 
             # Ignora pong do cliente
             if data.get("type") == "pong":
                 continue
+
+            # Interrompe a resposta em andamento
+            if data.get("type") == "cancel":
+                await cancelar_turno()
+                continue
+
             print(f"📨 Mensagem recebida: {data}")
             question = data.get("message", "")
             conversation_id = data.get("conversation_id", conversation_id)
@@ -507,111 +1076,35 @@ async def websocket_chat(websocket: WebSocket):
             if not question:
                 continue
 
+            # Token buckets de mensagens (por IP e por usuário; só gasta se os dois permitem)
+            motivo, espera = admission.consumir_todos([
+                ("taxa_ip", admission.limitador_ips, ip),
+                ("taxa_usuario", admission.limitador_usuarios, usuario),
+            ])
+            if motivo:
+                admission.rejeitado(motivo)
+                await enviador.enviar({
+                    "type": "error",
+                    "error": f"Muitas mensagens em pouco tempo. Tente novamente em {math.ceil(espera)}s.",
+                    "retry_after": math.ceil(espera)
+                })
+                continue
+
             # Gera conversation_id se não existir
             if not conversation_id:
                 conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-            # Recupera ou cria histórico para esta conversa
-            conversation_history = get_or_create_history(conversation_id)
-
-            # Envia confirmação de que mensagem do usuário foi salva
-            await websocket.send_json({
-                "type": "user_message_saved",
-                "conversation_id": conversation_id
-            })
-
-            # Adiciona pergunta ao histórico
-            conversation_history.append({"user": question, "ai": ""})
-
-            # Recupera contexto
-            context = retrieve_relevant_context(question)
-            tipo_de_prompt = inferir_tipo_de_prompt(question)
-
-            # Gera resposta com streaming
-            full_response = ""
-            quick_replies = []
-            progresso = None
-            start_time = datetime.now()
-            is_first = len(conversation_history) == 1
-
-            try:
-                async for item in generate_answer_stream(
-                    question=question,
-                    context=context,
-                    history=conversation_history[:-1],
-                    tipo_de_prompt=tipo_de_prompt,
-                    is_first_question=is_first
-                ):
-                    item_type = item.get("type")
-                    item_data = item.get("data")
-
-                    if item_type == "metadata":
-                        # Metadados (progresso, cenário) - não precisa enviar ao cliente
-                        progresso = item_data.get("progresso")
-                        continue
-
-                    elif item_type == "text":
-                        # Chunk de texto - envia ao cliente
-                        text_chunk = item_data
-                        full_response += text_chunk
-                        await websocket.send_json({
-                            "type": "text_chunk",
-                            "content": text_chunk
-                        })
-
-                    elif item_type == "complete":
-                        # Dados de conclusão
-                        quick_replies = item_data.get("quick_replies", [])
-                        if "full_response" in item_data:
-                            full_response = item_data["full_response"]
-                        if "progresso" in item_data:
-                            progresso = item_data["progresso"]
-
-                # Calcula duração
-                duration_ms = int((datetime.now() - start_time).total_seconds() * 1000)
-
-                # Atualiza histórico com resposta completa e progresso
-                conversation_history[-1]["ai"] = full_response
-                if progresso:
-                    conversation_history[-1]["progresso"] = progresso
-                if quick_replies:
-                    conversation_history[-1]["quick_replies"] = quick_replies
-
-                # Envia resultado final (formato compatível com chat-simples)
-                await websocket.send_json({
-                    "type": "result",
-                    "content": full_response,
-                    "conversation_id": conversation_id,
-                    "duration_ms": duration_ms,
-                    "num_turns": len(conversation_history),
-                    "quick_replies": quick_replies,
-                    "progresso": progresso
-                })
-
-                # Log da conversa
-                registrar_log(
-                    usuario=f"ws_{conversation_id}",
-                    pergunta=question,
-                    resposta=full_response,
-                    contexto=context,
-                    tipo_prompt=tipo_de_prompt,
-                    modulo=str(progresso.get("modulo")) if progresso else None,
-                    aula=progresso.get("aula") if progresso else None
-                )
-
-            except Exception as e:
-                print(f"❌ Erro ao gerar resposta: {e}")
-                await websocket.send_json({
-                    "type": "error",
-                    "error": f"Erro ao processar sua mensagem: {str(e)}"
-                })
+            # Uma resposta por conexão: a pergunta nova substitui a que estava em andamento
+            await cancelar_turno()
+            perfilar = perfilar_conexao or data.get("profile") is True
+            turno = asyncio.create_task(gerar_resposta(question, conversation_id, perfilar))
 
     except WebSocketDisconnect:
         print(f"Cliente desconectado (conversation_id: {conversation_id})")
     except Exception as e:
         print(f"Erro no WebSocket: {e}")
         try:
-            await websocket.send_json({
+            await enviador.enviar({
                 "type": "error",
                 "error": "Erro interno do servidor"
             })
@@ -620,6 +1113,8 @@ async def websocket_chat(websocket: WebSocket):
         await websocket.close()
     finally:
         keepalive_task.cancel()  # Cancela task de keepalive
+        await cancelar_turno()   # Ninguém mais vai ler a resposta: para o LLM
+        ws_conexoes -= 1
 
 # ====== ENDPOINTS REST PARA HISTÓRICO (OPCIONAL) ======
 
@@ -700,7 +1195,7 @@ def list_sessions():
             {
                 "session_id": sid,
                 "file_name": sid,  # compatibilidade com UI
-                "file": str(BASE_DIR / "logs.db"),  # usado pela UI para inferir "projeto"
+                "file": LOGS_DB_PATH,  # usado pela UI para inferir "projeto"
                 "updated_at": updated_at,
                 "message_count": int(message_count or 0),
                 "model": "MiniMax-M2",
@@ -852,67 +1347,242 @@ def delete_session(session_id: str):
     cursor.execute("DELETE FROM logs WHERE usuario IN (?, ?)", (usernames[0], usernames[1]))
     deleted = cursor.rowcount
     conn.commit()
+    _reset_session_summary_cursor(conn, session_id)
     conn.close()
     return JSONResponse({"success": True, "deleted": deleted})
 
-@app.post("/sessions/{session_id}/summary")
-def generate_session_summary(session_id: str, request: Request):
+# Um resumo por sessão de cada vez (a fila roda jobs em paralelo e o endpoint síncrono
+# também resume): o segundo espera e continua do cursor que o primeiro salvou
+_session_summary_locks: dict[str, threading.Lock] = {}
+_session_summary_locks_guard = threading.Lock()
+
+def _session_summary_lock(session_id: str) -> threading.Lock:
+    with _session_summary_locks_guard:
+        return _session_summary_locks.setdefault(session_id, threading.Lock())
+
+def _update_session_summary(session_id: str, regenerate: bool = False, on_progress=None) -> dict[str, Any]:
     """
-    Gera resumo da sessão usando LLM.
+    Atualiza o resumo incremental da sessão (bloqueante: chama o LLM).
+
+    O resumo fica em session_meta junto com um high-water mark (último log id ou offset
+    do JSONL). Cada chamada resume só os turnos novos e os incorpora ao resumo anterior.
+    Chamadas da mesma sessão são serializadas; a gravação confere que o cursor não mudou
+    desde a leitura (outro worker ou mensagens apagadas no meio) e descarta o resultado velho.
     """
-    from gpt_utils import generate_conversation_summary
+    with _session_summary_lock(session_id):
+        return _update_session_summary_locked(session_id, regenerate, on_progress)
+
+def _update_session_summary_locked(session_id: str, regenerate: bool, on_progress) -> dict[str, Any]:
+    from gpt_utils import update_conversation_summary
 
     conn = sqlite3.connect(LOGS_DB_PATH)
-    _ensure_logs_table(conn)
+    try:
+        previous_summary, summary_cursor = _get_session_summary_state(conn, session_id)
+        stored_cursor = summary_cursor
+        if regenerate or summary_cursor <= 0:
+            previous_summary, summary_cursor = "", 0
+
+        # Extrair apenas as mensagens posteriores ao high-water mark
+        if isinstance(session_id, str) and session_id.startswith(CLAUDE_SESSION_PREFIX):
+            claude_uuid = session_id.split(CLAUDE_SESSION_PREFIX, 1)[1]
+            path = _find_claude_session_file(claude_uuid)
+            if path and summary_cursor > path.stat().st_size:
+                # Arquivo foi reescrito/truncado: o resumo anterior não vale mais
+                previous_summary, summary_cursor = "", 0
+            new_messages, new_cursor = _load_claude_messages_since(claude_uuid, summary_cursor)
+        else:
+            new_messages, new_cursor = _load_log_messages_since(conn, session_id, summary_cursor)
+
+        if not new_messages and previous_summary:
+            return {"summary": previous_summary, "new_messages": 0}
+
+        if not new_messages:
+            summary = "Conversa vazia."
+        else:
+            summary = update_conversation_summary(
+                previous_summary, new_messages, max_length=500, on_progress=on_progress
+            )
 
-    # Extrair mensagens da sessão
-    messages = []
+        if not _save_session_summary_state(conn, session_id, summary, new_cursor, stored_cursor):
+            print(f"⚠️ Resumo de {session_id} não gravado: o cursor mudou durante a geração")
+        return {"summary": summary, "new_messages": len(new_messages)}
+    finally:
+        conn.close()
+
+def _session_content_version(session_id: str) -> int:
+    """
+    Versão do conteúdo da sessão (mesma unidade do high-water mark do resumo):
+    maior log id para sessões do logs.db, tamanho em bytes para JSONL do Claude Code.
+    """
     if isinstance(session_id, str) and session_id.startswith(CLAUDE_SESSION_PREFIX):
-        # Sessão do Claude Code (JSONL)
-        claude_uuid = session_id.split(CLAUDE_SESSION_PREFIX, 1)[1]
-        entries, model = _load_claude_session_entries(claude_uuid)
-        # Converter para formato esperado pela função de resumo
-        for entry in entries:
-            if entry.get('type') == 'message':
-                msg = entry.get('message', {})
-                role = 'assistant' if msg.get('role') == 'assistant' else 'user'
-                content = msg.get('content', {})
-                # Extrair texto do conteúdo
-                if isinstance(content, dict):
-                    text = content.get('text', '')
-                elif isinstance(content, str):
-                    text = content
-                else:
-                    text = str(content)
-                if text:
-                    messages.append({'role': role, 'content': text})
-    else:
-        # Sessão do logs.db (WebSocket)
-        usernames = _session_usernames(session_id)
-        if usernames:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT usuario, pergunta, resposta, data FROM logs WHERE usuario IN (?, ?) ORDER BY data ASC",
-                (usernames[0], usernames[1])
-            )
-            rows = cursor.fetchall()
-            for usuario, pergunta, resposta, data in rows:
-                if pergunta:
-                    messages.append({'role': 'user', 'content': pergunta})
-                if resposta:
-                    messages.append({'role': 'assistant', 'content': resposta})
+        path = _find_claude_session_file(session_id.split(CLAUDE_SESSION_PREFIX, 1)[1])
+        return _safe_file_size(path) if path else 0
 
+    usernames = _session_usernames(session_id)
+    if not usernames:
+        return 0
+    conn = sqlite3.connect(LOGS_DB_PATH)
+    _ensure_logs_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(id) FROM logs WHERE usuario IN (?, ?)", (usernames[0], usernames[1]))
+    row = cursor.fetchone()
     conn.close()
+    return int(row[0] or 0) if row else 0
+
+def _run_session_summary_job(payload: dict, report) -> dict[str, Any]:
+    """Handler do job 'session_summary' (roda em thread na fila de jobs)."""
+    report(0.0, "Lendo mensagens novas...")
+    return _update_session_summary(
+        payload["session_id"],
+        regenerate=bool(payload.get("regenerate")),
+        on_progress=lambda done, total: report(done / max(total, 1), f"Bloco {done}/{total} resumido"),
+    )
 
-    # Gerar resumo
-    summary = generate_conversation_summary(messages, max_length=500)
+job_queue.register("session_summary", _run_session_summary_job)
 
-    # Salvar resumo no session_meta
+def _submit_session_summary_job(session_id: str, regenerate: bool = False,
+                                priority: int = PRIORITY_NORMAL) -> dict[str, Any]:
+    # Idempotente por sessão + versão do conteúdo + resets do resumo: cliques repetidos
+    # reaproveitam o mesmo job; apagar mensagens gera um job novo
+    version = _session_content_version(session_id)
     conn = sqlite3.connect(LOGS_DB_PATH)
-    _save_session_metadata(conn, session_id, summary=summary)
-    conn.close()
+    try:
+        resets = _get_session_summary_resets(conn, session_id)
+    finally:
+        conn.close()
+    dedupe_key = f"session_summary:{session_id}:{version}:r{resets}"
+    if regenerate:
+        dedupe_key += ":regenerate"
+    return job_queue.submit(
+        "session_summary",
+        {"session_id": session_id, "regenerate": regenerate},
+        dedupe_key=dedupe_key,
+        priority=priority,
+    )
+
+@app.post("/sessions/{session_id}/summary")
+async def generate_session_summary(session_id: str, request: Request):
+    """
+    Gera/atualiza o resumo da sessão usando LLM, de forma incremental (síncrono).
+    Envie {"regenerate": true} para refazer o resumo da sessão inteira.
+    Para não segurar a requisição durante o LLM, prefira POST /sessions/{id}/summary/job.
+    """
+    try:
+        payload = await request.json()
+    except Exception:
+        payload = {}
+    regenerate = bool(payload.get("regenerate")) if isinstance(payload, dict) else False
+
+    try:
+        result = await asyncio.to_thread(_update_session_summary, session_id, regenerate)
+    except Exception as e:
+        print(f"❌ Erro ao gerar resumo: {e}")
+        return JSONResponse({"success": False, "error": f"Erro ao gerar resumo: {e}"}, status_code=500)
 
-    return JSONResponse({"success": True, "summary": summary})
+    return JSONResponse({"success": True, **result})
+
+@app.post("/sessions/{session_id}/summary/job")
+async def submit_session_summary_job(session_id: str, request: Request):
+    """
+    Enfileira a geração do resumo da sessão e devolve o job imediatamente.
+    Acompanhe por GET /jobs/{job_id} (polling) ou GET /jobs/{job_id}/events (SSE).
+    """
+    try:
+        payload = await request.json()
+    except Exception:
+        payload = {}
+    regenerate = bool(payload.get("regenerate")) if isinstance(payload, dict) else False
+
+    try:
+        job = await asyncio.to_thread(_submit_session_summary_job, session_id, regenerate)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    return JSONResponse({"success": True, "job": job}, status_code=202)
+
+@app.post("/sessions/summaries/bulk")
+async def submit_bulk_session_summaries():
+    """
+    Enfileira, em prioridade de lote, o resumo de todas as sessões com conteúdo ainda não resumido.
+    Os jobs de lote rodam um por vez e só quando não há respostas de chat em andamento.
+    """
+    def _pending_session_ids() -> list[str]:
+        conn = sqlite3.connect(LOGS_DB_PATH)
+        _ensure_logs_table(conn)
+        _ensure_session_meta_table(conn)
+        hidden_ids = _get_hidden_session_ids(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT usuario, MAX(id) FROM logs GROUP BY usuario")
+        # "X" e "ws_X" são a mesma sessão: vale o maior id das duas
+        latest: dict[str, int] = {}
+        for usuario, max_id in cursor.fetchall():
+            sid = _normalize_session_id(usuario)
+            latest[sid] = max(latest.get(sid, 0), int(max_id or 0))
+        cursor.execute("SELECT session_id, summary_cursor FROM session_meta")
+        cursors = {sid: int(cur or 0) for sid, cur in cursor.fetchall()}
+        conn.close()
+
+        for jsonl_path in _iter_claude_project_jsonl_files():
+            if _should_include_claude_jsonl(jsonl_path):
+                latest[f"{CLAUDE_SESSION_PREFIX}{jsonl_path.stem}"] = _safe_file_size(jsonl_path)
+
+        return [
+            sid for sid, version in latest.items()
+            if sid and sid not in hidden_ids and version > cursors.get(sid, 0)
+        ]
+
+    def _submit_all() -> list[dict[str, Any]]:
+        return [
+            _submit_session_summary_job(sid, priority=PRIORITY_BACKGROUND)
+            for sid in _pending_session_ids()
+        ]
+
+    try:
+        jobs = await asyncio.to_thread(_submit_all)
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    return JSONResponse({"success": True, "count": len(jobs), "jobs": jobs}, status_code=202)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Estado de um job (queued, running, done, error), progresso e resultado."""
+    job = job_queue.get(job_id)
+    if not job:
+        return JSONResponse({"success": False, "error": "Job não encontrado"}, status_code=404)
+    return JSONResponse({"success": True, "job": job})
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Acompanha um job via SSE: envia o estado a cada mudança até concluir ou falhar."""
+    if not await asyncio.to_thread(job_queue.get, job_id):
+        return JSONResponse({"success": False, "error": "Job não encontrado"}, status_code=404)
+
+    async def event_generator():
+        last_state = None
+        while True:
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            if not job:
+                yield "data: [ERROR] Job não encontrado\n\n"
+                return
+            state = (job["status"], job["progress"], job["message"])
+            if state != last_state:
+                last_state = state
+                yield f"data: {json.dumps(job, ensure_ascii=False)}\n\n"
+            if job["status"] in (STATUS_DONE, STATUS_ERROR):
+                yield "data: [DONE]\n\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 @app.put("/sessions/{session_id}/metadata")
 async def save_session_metadata(session_id: str, request: Request):
@@ -1100,6 +1770,11 @@ async def delete_session_message(session_id: str, request: Request):
     if deleted <= 0:
         return JSONResponse({"success": False, "error": "Mensagem não encontrada."}, status_code=404)
 
+    # O resumo incremental já incorporou o turno apagado: refaz do zero na próxima vez
+    conn = sqlite3.connect(LOGS_DB_PATH)
+    _reset_session_summary_cursor(conn, session_id)
+    conn.close()
+
     return JSONResponse({"success": True, "deleted": deleted, "log_id": target_log_id})
 
 # =============== DASHBOARD LOGS (DESABILITADO - template removido) =================
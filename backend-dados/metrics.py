@@ -0,0 +1,145 @@
+import math
+import threading
+from typing import Callable, Iterable, Optional
+
+# 📊 Métricas em memória do processo, expostas em /metrics no formato texto do
+# Prometheus. Cada worker do uvicorn tem as suas (sem estado compartilhado).
+
+Labels = tuple[tuple[str, str], ...]
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in labels) + "}"
+
+def _fmt_valor(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+def _chave(labels: Optional[dict]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, ajuda: str):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._lock = threading.Lock()
+
+    def _amostras(self) -> Iterable[tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for nome, labels, valor in self._amostras():
+            linhas.append(f"{nome}{_fmt_labels(labels)} {_fmt_valor(valor)}")
+        return "\n".join(linhas)
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str):
+        super().__init__(nome, ajuda)
+        self._valores: dict[Labels, float] = {}
+
+    def inc(self, valor: float = 1.0, **labels) -> None:
+        chave = _chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def _amostras(self):
+        with self._lock:
+            return [(self.nome, k, v) for k, v in self._valores.items()]
+
+class Gauge(_Metrica):
+    """Valor instantâneo; `funcao` (opcional) é lida a cada coleta."""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, funcao: Optional[Callable[[], float]] = None):
+        super().__init__(nome, ajuda)
+        self._valores: dict[Labels, float] = {}
+        self._funcao = funcao
+
+    def set(self, valor: float, **labels) -> None:
+        with self._lock:
+            self._valores[_chave(labels)] = float(valor)
+
+    def inc(self, valor: float = 1.0, **labels) -> None:
+        chave = _chave(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def dec(self, valor: float = 1.0, **labels) -> None:
+        self.inc(-valor, **labels)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._valores.clear()
+
+    def _amostras(self):
+        if self._funcao is not None:
+            return [(self.nome, (), float(self._funcao()))]
+        with self._lock:
+            return [(self.nome, k, v) for k, v in self._valores.items()]
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, buckets: Iterable[float]):
+        super().__init__(nome, ajuda)
+        self.buckets = sorted(buckets)
+        self._series: dict[Labels, list] = {}  # labels -> [contagens por bucket..., soma, total]
+
+    def observe(self, valor: float, **labels) -> None:
+        chave = _chave(labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def _amostras(self):
+        amostras = []
+        with self._lock:
+            for chave, serie in self._series.items():
+                for limite, contagem in zip(self.buckets, serie):
+                    amostras.append((f"{self.nome}_bucket", chave + (("le", _fmt_valor(limite)),), contagem))
+                amostras.append((f"{self.nome}_bucket", chave + (("le", "+Inf"),), serie[-1]))
+                amostras.append((f"{self.nome}_sum", chave, serie[-2]))
+                amostras.append((f"{self.nome}_count", chave, serie[-1]))
+        return amostras
+
+_registro: dict[str, _Metrica] = {}
+_registro_lock = threading.Lock()
+
+def _registrar(metrica: _Metrica) -> _Metrica:
+    with _registro_lock:
+        existente = _registro.get(metrica.nome)
+        if existente is not None:
+            return existente  # reimportação do módulo: mantém a série já registrada
+        _registro[metrica.nome] = metrica
+        return metrica
+
+def counter(nome: str, ajuda: str) -> Counter:
+    return _registrar(Counter(nome, ajuda))
+
+def gauge(nome: str, ajuda: str, funcao: Optional[Callable[[], float]] = None) -> Gauge:
+    return _registrar(Gauge(nome, ajuda, funcao))
+
+def histogram(nome: str, ajuda: str, buckets: Iterable[float]) -> Histogram:
+    return _registrar(Histogram(nome, ajuda, buckets))
+
+def render() -> str:
+    """Todas as métricas registradas no formato texto do Prometheus (0.0.4)."""
+    with _registro_lock:
+        metricas = list(_registro.values())
+    return "\n".join(m.render() for m in metricas) + "\n"
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.requests import HTTPConnection
+
+import metrics
+from auth_utils import ADMIN_USERS, usuario_do_token
+
+# 🔬 Profiler por amostragem de pilhas, ligado por pedido (opt-in):
+#   - header "X-Profile: 1" ou query "?profile=1" (HTTP e handshake do /ws/chat, que vale
+#     para todos os turnos da conexão), ou {"profile": true} numa mensagem do /ws/chat
+#   - ou por sorteio: PROFILE_SAMPLE_RATE (0.01 = 1% dos turnos/requisições)
+# Uma thread lê as pilhas de todas as threads (sys._current_frames) a cada
+# PROFILE_INTERVAL_MS enquanto houver captura ativa; parada, não custa nada. Cada captura
+# vira um arquivo de pilhas "folded" (flamegraph.pl, speedscope, inferno) em PROFILE_DIR,
+# com um .json de metadados, listados em /admin/profiles.
+#
+# Pilhas do event loop começam por "[este pedido]", "[outra task]" ou "[loop ocioso]",
+# conforme a task que rodava no loop na hora da amostra; threads de trabalho (to_thread,
+# threadpool do Starlette, micro-batcher) aparecem pelo nome e podem misturar pedidos
+# simultâneos. Threads paradas esperando trabalho não entram.
+BASE_DIR = Path(__file__).resolve().parent.parent      # /assistente-fontes
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles")))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Pedido explícito (header/query/mensagem) só vale para usuários em ADMIN_USERS
+PROFILE_ADMIN_ONLY = os.getenv("PROFILE_ADMIN_ONLY", "1") == "1"
+# Capturas simultâneas (as demais são ignoradas) e duração máxima de cada uma
+PROFILE_MAX_ACTIVE = int(os.getenv("PROFILE_MAX_ACTIVE", "2"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+# Retenção em PROFILE_DIR: os mais antigos saem primeiro
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_MB = float(os.getenv("PROFILE_MAX_MB", "100"))
+
+# Profundidade máxima de pilha registrada (as pontas mais próximas da raiz são mantidas)
+MAX_PROFUNDIDADE = 200
+
+HEADER = "x-profile"
+QUERY = "profile"
+
+_NOME_RE = re.compile(r"^[\w.-]+$")
+
+# Funções onde uma thread de trabalho fica parada esperando tarefa (amostra descartada)
+_OCIOSAS = {
+    ("threading.py", "wait"),
+    ("futures/thread.py", "_worker"),    # concurrent.futures (to_thread): fila vazia
+}
+
+_METRIC_CAPTURAS = metrics.counter("profiles_total", "Capturas do profiler, por origem e resultado")
+
+class Captura:
+    """Uma captura em andamento: pilhas folded -> número de amostras."""
+
+    def __init__(self, descricao: str, origem: str, meta: dict):
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.descricao = descricao
+        self.origem = origem
+        self.meta = meta
+        self.loop = asyncio.get_running_loop()
+        self.tarefa = asyncio.current_task()
+        self.thread_loop = threading.get_ident()
+        self.inicio = time.monotonic()
+        self.inicio_wall = time.time()
+        self.amostras = 0
+        self.truncada = False
+        self.pilhas: Counter[str] = Counter()
+
+class _Amostrador:
+    """Thread única que amostra as pilhas para todas as capturas ativas."""
+
+    def __init__(self, intervalo_s: float):
+        self.intervalo = max(intervalo_s, 0.001)
+        self.capturas: list[Captura] = []
+        self._lock = threading.Lock()
+        self._ativo = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rotulos: dict = {}     # code -> "função (arquivo:linha)"
+
+    def adicionar(self, captura: Captura) -> bool:
+        with self._lock:
+            if len(self.capturas) >= PROFILE_MAX_ACTIVE:
+                return False
+            self.capturas.append(captura)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._rodar, name="profiler", daemon=True)
+                self._thread.start()
+            self._ativo.set()
+        return True
+
+    def remover(self, captura: Captura) -> None:
+        with self._lock:
+            if captura in self.capturas:
+                self.capturas.remove(captura)
+            if not self.capturas:
+                self._ativo.clear()
+
+    def _rotulo(self, code) -> str:
+        rotulo = self._rotulos.get(code)
+        if rotulo is None:
+            arquivo = "/".join(Path(code.co_filename).parts[-2:])
+            rotulo = f"{code.co_name} ({arquivo}:{code.co_firstlineno})".replace(";", ",")
+            if len(self._rotulos) < 50_000:
+                self._rotulos[code] = rotulo
+        return rotulo
+
+    def _ociosa(self, frame) -> bool:
+        code = frame.f_code
+        return any(code.co_name == nome and code.co_filename.endswith(arquivo) for arquivo, nome in _OCIOSAS)
+
+    def _pilha(self, frame) -> list[str]:
+        pilha = []
+        while frame is not None:
+            pilha.append(self._rotulo(frame.f_code))
+            frame = frame.f_back
+        pilha.reverse()
+        return pilha[:MAX_PROFUNDIDADE]
+
+    def _rodar(self) -> None:
+        proprio = threading.get_ident()
+        tasks_atuais = getattr(asyncio.tasks, "_current_tasks", None)
+        while True:
+            self._ativo.wait()
+            time.sleep(self.intervalo)
+            with self._lock:
+                capturas = list(self.capturas)
+            if not capturas:
+                continue
+            nomes = {t.ident: t.name for t in threading.enumerate()}
+            pilhas = {}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == proprio:
+                    continue
+                eh_loop = any(c.thread_loop == ident for c in capturas)
+                if not eh_loop and self._ociosa(frame):
+                    continue
+                pilhas[ident] = self._pilha(frame)
+            del frames
+
+            agora = time.monotonic()
+            for captura in capturas:
+                if agora - captura.inicio > PROFILE_MAX_SECONDS:
+                    captura.truncada = True
+                    self.remover(captura)
+                    continue
+                captura.amostras += 1
+                for ident, pilha in pilhas.items():
+                    raiz = nomes.get(ident, f"thread-{ident}")
+                    if ident == captura.thread_loop:
+                        atual = tasks_atuais.get(captura.loop) if tasks_atuais is not None else None
+                        if atual is None:
+                            marca = "[loop ocioso]"
+                        elif atual is captura.tarefa:
+                            marca = "[este pedido]"
+                        else:
+                            marca = "[outra task]"
+                        raiz = f"{raiz};{marca}"
+                    captura.pilhas[";".join([raiz, *pilha])] += 1
+
+_amostrador = _Amostrador(PROFILE_INTERVAL_MS / 1000)
+
+def pedido_explicito(headers, query_string: str) -> bool:
+    """True se a requisição pede profiling (header X-Profile ou ?profile=)."""
+    valor = headers.get(HEADER)
+    if valor is None:
+        valor = (parse_qs(query_string).get(QUERY) or [None])[0]
+    return valor is not None and valor.strip().lower() in ("1", "true", "yes", "sim")
+
+def deve_perfilar(pedido: bool, usuario: Optional[str]) -> Optional[str]:
+    """Origem da captura ("pedido" ou "amostra"), ou None para não perfilar."""
+    if pedido and (not PROFILE_ADMIN_ONLY or usuario in ADMIN_USERS):
+        return "pedido"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "amostra"
+    return None
+
+def iniciar(descricao: str, origem: Optional[str], **meta) -> Optional[Captura]:
+    """
+    Começa a perfilar a task atual (chamar de dentro dela). Retorna None se `origem` é
+    None ou se já há PROFILE_MAX_ACTIVE capturas em andamento.
+    """
+    if origem is None:
+        return None
+    captura = Captura(descricao, origem, meta)
+    if not _amostrador.adicionar(captura):
+        _METRIC_CAPTURAS.inc(origem=origem, resultado="ignorada")
+        return None
+    return captura
+
+def encerrar(captura: Optional[Captura], **meta) -> None:
+    """Para a captura e grava os arquivos numa thread (não bloqueia o event loop)."""
+    if captura is None:
+        return
+    _amostrador.remover(captura)
+    captura.meta.update(meta)
+    duracao = time.monotonic() - captura.inicio
+    threading.Thread(target=_gravar, args=(captura, duracao), name="profiler-gravar", daemon=True).start()
+
+def _gravar(captura: Captura, duracao: float) -> None:
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        folded = PROFILE_DIR / f"{captura.id}.folded"
+        with open(folded, "w", encoding="utf-8") as f:
+            for pilha, n in sorted(captura.pilhas.items()):
+                f.write(f"{pilha} {n}\n")
+        info = {
+            "nome": folded.name,
+            "descricao": captura.descricao,
+            "origem": captura.origem,
+            "inicio": datetime.fromtimestamp(captura.inicio_wall).isoformat(timespec="seconds"),
+            "duracao_ms": round(duracao * 1000, 1),
+            "amostras": captura.amostras,
+            "intervalo_ms": PROFILE_INTERVAL_MS,
+            "truncada": captura.truncada,
+            "bytes": folded.stat().st_size,
+            **captura.meta,
+        }
+        tmp = PROFILE_DIR / f".{captura.id}.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False, default=str)
+        os.replace(tmp, PROFILE_DIR / f"{captura.id}.json")
+        _METRIC_CAPTURAS.inc(origem=captura.origem, resultado="salva")
+        _aplicar_retencao()
+    except OSError as e:
+        _METRIC_CAPTURAS.inc(origem=captura.origem, resultado="erro")
+        print(f"⚠️ Profiler: não consegui gravar {captura.id}: {e}")
+
+_retencao_lock = threading.Lock()
+
+def _aplicar_retencao() -> None:
+    """Apaga as capturas mais antigas além de PROFILE_MAX_FILES ou PROFILE_MAX_MB."""
+    with _retencao_lock:
+        capturas = sorted(PROFILE_DIR.glob("*.folded"), key=lambda p: p.name, reverse=True)
+        limite_bytes = PROFILE_MAX_MB * 1024 * 1024
+        total = 0
+        for i, folded in enumerate(capturas):
+            try:
+                total += folded.stat().st_size
+            except OSError:
+                continue
+            if i >= PROFILE_MAX_FILES or total > limite_bytes:
+                folded.unlink(missing_ok=True)
+                folded.with_suffix(".json").unlink(missing_ok=True)
+
+def listar(limite: int = 100) -> list[dict]:
+    """Metadados das capturas salvas, das mais recentes para as mais antigas."""
+    if not PROFILE_DIR.exists():
+        return []
+    resultado = []
+    for info in sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.name, reverse=True)[:limite]:
+        try:
+            with open(info, "r", encoding="utf-8") as f:
+                resultado.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return resultado
+
+def caminho(nome: str) -> Optional[Path]:
+    """Arquivo .folded de uma captura salva (None se o nome é inválido ou não existe)."""
+    if not _NOME_RE.match(nome) or not nome.endswith(".folded"):
+        return None
+    path = PROFILE_DIR / nome
+    return path if path.is_file() else None
+
+class ProfilerMiddleware:
+    """
+    Middleware ASGI (puro, para o handler rodar na mesma task) que perfila requisições
+    HTTP pedidas por header/query ou sorteadas. O WebSocket é tratado por turno no /ws/chat.
+    """
+
+    IGNORAR = ("/assets/", "/html/", "/metrics", "/admin/profiles")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.IGNORAR):
+            await self.app(scope, receive, send)
+            return
+        origem = None
+        if PROFILE_SAMPLE_RATE > 0 or any(k.lower() == HEADER.encode() for k, _ in scope["headers"]) \
+                or QUERY.encode() in scope.get("query_string", b""):
+            conexao = HTTPConnection(scope)
+            pedido = pedido_explicito(conexao.headers, scope.get("query_string", b"").decode("latin-1"))
+            origem = deve_perfilar(pedido, usuario_do_token(conexao.cookies.get("token")) if pedido else None)
+        captura = iniciar(f"{scope['method']} {scope['path']}", origem)
+        if captura is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = None
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            encerrar(captura, status=status)
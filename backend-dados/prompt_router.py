@@ -1,80 +1,24 @@
-def inferir_tipo_de_prompt(pergunta: str) -> str:
-    pergunta_lower = pergunta.lower()
-
-    # 📩 Mensagens automáticas (WhatsApp, e-mail, direct, etc.)
-    termos_mensagem_auto = [
-        "mensagem automática", "resposta automática", "mensagem padrão",
-        "robô", "responder depois", "responder mais tarde", "sem tempo para responder",
-        "fim de semana", "fora do horário", "mensagem fora do expediente"
-    ]
-    if any(t in pergunta_lower for t in termos_mensagem_auto):
-        return "mensagem_automatica"
-
-    # 🔎 Health Plan
-    if (
-        "health plan" in pergunta_lower
-        or "plano de tratamento" in pergunta_lower
-        or "meu health plan" in pergunta_lower
-        or "fazer meu health plan" in pergunta_lower
-        or "fazer meu plano" in pergunta_lower
-        or "dúvida no health" in pergunta_lower
-        or "dúvida no plano" in pergunta_lower
-        or "como montar meu health" in pergunta_lower
-        or "como montar meu plano" in pergunta_lower
-        or "criar meu plano" in pergunta_lower
-        or "montar health plan" in pergunta_lower
-        or "montar plano" in pergunta_lower
-        or ("sou pediatra" in pergunta_lower and "health" in pergunta_lower)
-        or ("sou psicóloga" in pergunta_lower and "ansiedade" in pergunta_lower)
-    ):
-        return "health_plan"
-
-    # 💰 Precificação
-    if (
-        "preço" in pergunta_lower
-        or "valor" in pergunta_lower
-        or "cobrar" in pergunta_lower
-        or "precificar" in pergunta_lower
-    ):
-        return "precificacao"
-
-    # 📣 Captação sem marketing digital
-    if (
-        "atrair pacientes" in pergunta_lower
-        or "sem marketing" in pergunta_lower
-        or "sem instagram" in pergunta_lower
-    ):
-        return "capitacao_sem_marketing_digital"
-
-    # 🔧 Aplicação prática
-    if (
-        "como aplicar" in pergunta_lower
-        or "exemplo prático" in pergunta_lower
-        or "na prática" in pergunta_lower
-    ):
-        return "aplicacao"
-
-    # ❌ Correção de erro
-    if (
-        "errei" in pergunta_lower
-        or "confundi" in pergunta_lower
-        or "não entendi" in pergunta_lower
-    ):
-        return "correcao"
-
-    # 🧠 Revisão rápida
-    if (
-        "resumo" in pergunta_lower
-        or "revisão" in pergunta_lower
-    ):
-        return "revisao"
-
-    # ❓ Dúvida frequente
-    if (
-        "muitos perguntam" in pergunta_lower
-        or "pergunta comum" in pergunta_lower
-    ):
-        return "faq"
-
-    # 📘 Explicação padrão
-    return "explicacao"
+import os
+
+from keyword_matcher import classificar
+
+# Classificador de tipo_prompt: "regras" (palavras-chave, padrão) ou "embedding"
+# (centróide mais próxima sobre o embedding da pergunta, com fallback para as regras)
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "regras").strip().lower()
+
+def inferir_tipo_de_prompt(pergunta: str, embedding=None) -> str:
+    # Com INTENT_CLASSIFIER=embedding, reaproveita o embedding já calculado para a busca.
+    if embedding is not None and INTENT_CLASSIFIER == "embedding":
+        try:
+            from intent_classifier import get_intent_classifier
+
+            tipo, _ = get_intent_classifier().classificar(embedding)
+            if tipo:
+                return tipo
+        except Exception as e:
+            print(f"❌ Erro no classificador de intenção, usando regras: {e}")
+
+    # Regras (mensagem automática, health plan, precificação, captação, aplicação,
+    # correção, revisão, faq) ficam em keyword_rules.json, grupo "tipo_prompt",
+    # na ordem de prioridade. Sem correspondência: "explicacao".
+    return classificar("tipo_prompt", pergunta)
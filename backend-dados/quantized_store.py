@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+from typing import Any, List, Optional
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from int8_vectors import Int8Vectors
+
+# Candidatos aproximados (int8) por resultado pedido, reordenados pelo cosseno exato
+RESCORE_FACTOR = int(os.getenv("INT8_RESCORE_FACTOR", "10"))
+
+class Int8VectorStore(BasePydanticVectorStore):
+    """
+    Vector store somente leitura sobre Int8Vectors, no lugar do SimpleVectorStore
+    (que carrega default__vector_store.json como listas de floats Python).
+    Os textos continuam no docstore; as versões são geradas pelo generate_index.
+    """
+
+    stores_text: bool = False
+    _vetores: Int8Vectors = PrivateAttr()
+    _rescore_factor: int = PrivateAttr()
+
+    def __init__(self, vetores: Int8Vectors, rescore_factor: int = RESCORE_FACTOR, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._vetores = vetores
+        self._rescore_factor = rescore_factor
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: Path) -> Optional["Int8VectorStore"]:
+        vetores = Int8Vectors.load(persist_dir)
+        return cls(vetores) if vetores is not None else None
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        raise NotImplementedError("Int8VectorStore é somente leitura; atualize o índice com generate_index.py")
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        raise NotImplementedError("Int8VectorStore é somente leitura; atualize o índice com generate_index.py")
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.query_embedding is None:
+            raise ValueError("Int8VectorStore precisa do embedding da consulta")
+        hits = self._vetores.buscar(
+            query.query_embedding,
+            query.similarity_top_k,
+            rescore_factor=self._rescore_factor,
+            ids_permitidos=query.node_ids,
+        )
+        return VectorStoreQueryResult(
+            ids=[node_id for node_id, _ in hits],
+            similarities=[score for _, score in hits],
+        )
@@ -0,0 +1,95 @@
+import math
+import os
+import threading
+from typing import Optional
+
+from llama_index.core.schema import NodeWithScore
+
+from lexical_index import LexicalIndex, tokenizar
+
+# 🥇 Reordenação dos candidatos da busca antes de montar o contexto.
+# "overlap" (padrão): cobertura dos termos da pergunta no chunk, ponderada por IDF,
+#   misturada à similaridade de cosseno crua do lado vetorial; custa microssegundos.
+#   Os dois sinais são absolutos (não dependem dos outros candidatos), então o
+#   RERANK_MIN_SCORE separa de fato o que é relevante; chunk sem nenhum termo da
+#   pergunta nunca entra.
+# "cross-encoder": modelo pequeno (CPU) que lê pergunta e chunk juntos; mais preciso,
+#   dezenas de ms por pergunta. Requer sentence-transformers (já vem com o embedding).
+RERANKER = os.getenv("RERANKER", "overlap").strip().lower()
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+
+# Peso da cobertura lexical no score do "overlap" (o resto é o cosseno do lado vetorial)
+RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.5"))
+
+# Chunks abaixo deste score ficam fora do contexto (escala 0..1 nos dois rerankers)
+_MIN_SCORE_PADRAO = {"overlap": "0.3", "cross-encoder": "0.1"}
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE", _MIN_SCORE_PADRAO.get(RERANKER, "0.3")))
+
+def _cobertura(termos: set[str], texto: str, lexical: Optional[LexicalIndex]) -> float:
+    """Fração (ponderada por IDF) dos termos da pergunta que aparecem no chunk."""
+    if not termos:
+        return 0.0
+    presentes = set(tokenizar(texto))
+    pesos = {t: (lexical.idf(t) if lexical is not None else 1.0) for t in termos}
+    total = sum(pesos.values())
+    return sum(p for t, p in pesos.items() if t in presentes) / total if total else 0.0
+
+def _rerank_overlap(question: str, nodes: list[NodeWithScore], lexical: Optional[LexicalIndex],
+                    similaridades: dict[str, float]) -> list[NodeWithScore]:
+    """
+    Score absoluto: peso * cobertura + (1 - peso) * cosseno. O score da busca (RRF, BM25)
+    é só uma posição relativa e não entra; chunks que o lado vetorial não trouxe contam
+    cosseno 0. Cobertura zero = chunk descartado (score 0).
+    """
+    termos = set(tokenizar(question))
+    pontuados = []
+    for n in nodes:
+        cobertura = _cobertura(termos, n.node.get_content(), lexical)
+        cosseno = min(max(similaridades.get(n.node.node_id, 0.0), 0.0), 1.0)
+        score = RERANK_LEXICAL_WEIGHT * cobertura + (1 - RERANK_LEXICAL_WEIGHT) * cosseno if cobertura else 0.0
+        pontuados.append(NodeWithScore(node=n.node, score=score))
+    return pontuados
+
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+
+def _get_cross_encoder():
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+
+                _cross_encoder = CrossEncoder(CROSS_ENCODER_MODEL, max_length=512)
+                print(f"🥇 Cross-encoder carregado: {CROSS_ENCODER_MODEL}")
+    return _cross_encoder
+
+def _rerank_cross_encoder(question: str, nodes: list[NodeWithScore]) -> list[NodeWithScore]:
+    logits = _get_cross_encoder().predict([(question, n.node.get_content()) for n in nodes])
+    return [
+        NodeWithScore(node=n.node, score=1.0 / (1.0 + math.exp(-float(logit))))
+        for n, logit in zip(nodes, logits)
+    ]
+
+def rerank(question: str, nodes: list[NodeWithScore], top_k: int,
+           lexical: Optional[LexicalIndex] = None,
+           min_score: float = RERANK_MIN_SCORE,
+           similaridades: Optional[dict[str, float]] = None) -> list[NodeWithScore]:
+    """
+    Reordena `nodes` (candidatos da busca) e devolve até `top_k` com score >= `min_score`,
+    do melhor para o pior. Os scores devolvidos são os do reranker (0..1).
+    `similaridades`: node_id -> cosseno cru da busca vetorial (sinal do "overlap").
+    """
+    similaridades = similaridades or {}
+    if not nodes:
+        return []
+    if RERANKER == "cross-encoder":
+        try:
+            pontuados = _rerank_cross_encoder(question, nodes)
+        except Exception as e:
+            print(f"❌ Erro no cross-encoder, usando overlap: {e}")
+            pontuados = _rerank_overlap(question, nodes, lexical, similaridades)
+    else:
+        pontuados = _rerank_overlap(question, nodes, lexical, similaridades)
+    pontuados.sort(key=lambda n: n.score, reverse=True)
+    return [n for n in pontuados if n.score > 0 and n.score >= min_score][:top_k]
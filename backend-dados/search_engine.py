@@ -1,14 +1,25 @@
+import gc
 import os
+import threading
+import time
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from llama_index.core import (
-    SimpleDirectoryReader,
-    GPTVectorStoreIndex,
     StorageContext,
     load_index_from_storage,
     Settings,
 )
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from chunk_flags import FLAG_VAZIO, flags_do_node
+from chunking import contar_tokens
+import index_store
+import metrics
+from embeddings import criar_embed_model
+from embed_batcher import MicroBatcher, embed_queries_batch
+from lexical_index import LexicalIndex, tokenizar
+from reranker import rerank
+from generate_index import atualizar_indice
 
 # Carrega variáveis do .env
 load_dotenv()
@@ -17,83 +28,329 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent      # /assistente-fontes
 BACKEND_DIR = Path(__file__).resolve().parent          # /assistente-fontes/backend-dados
 
-# 📁 Diretório e caminho do índice
-INDEX_DIR = str(BASE_DIR / "storage")
-INDEX_FILE = str(Path(INDEX_DIR) / "index.json")
+# 📁 Diretório do índice (layout versionado em index_store)
+INDEX_DIR = str(index_store.INDEX_DIR)
 TRANSCRICOES_PATH = str(BACKEND_DIR / "transcricoes.txt")
 
-# 🤖 Define o modelo de embedding (sentence-transformers local, gratuito)
-# Usa modelo multilíngue otimizado para português
-Settings.embed_model = HuggingFaceEmbedding(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-)
+# 🔀 Busca: "hybrid" (BM25 + vetorial com RRF, padrão), "vector" ou "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").strip().lower()
+# Candidatos de cada lado antes da fusão (múltiplo de top_k) e constante do RRF
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", "4"))
+RRF_K = 60
+# Perguntas com até N termos, todos presentes no vocabulário (ex.: "RLS", "o que é trigger?"),
+# são respondidas só pelo BM25, sem calcular embedding. 0 desliga.
+LEXICAL_FAST_PATH_MAX_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MAX_TERMS", "3"))
+# Vetores: "simple" (SimpleVectorStore do llama_index, floats em memória) ou "int8"
+# (quantizados, com rescoring exato via mmap; ver int8_vectors.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "simple").strip().lower()
+# Candidatos trazidos da busca para o reranker escolher os top_k
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "12"))
+
+# 🤖 Define o modelo de embedding (MiniLM multilíngue; backend em EMBED_BACKEND: torch ou onnx)
+Settings.embed_model = criar_embed_model()
 
 def load_or_build_index():
-    """Carrega o índice existente ou cria um novo a partir de transcricoes.txt."""
-    if os.path.exists(INDEX_FILE):
-        print("📁 Índice encontrado. Carregando do disco...")
-        storage_context = StorageContext.from_defaults(persist_dir=INDEX_DIR)
-        return load_index_from_storage(storage_context)
-    else:
+    """Carrega a versão ativa do índice ou cria uma nova a partir de transcricoes.txt."""
+    path = index_store.current_version_dir()
+    if not index_store.has_index(path):
         print("⚙️ Índice não encontrado. Construindo novo...")
-        docs = SimpleDirectoryReader(input_files=[TRANSCRICOES_PATH]).load_data()
-        index = GPTVectorStoreIndex.from_documents(docs)
-        index.storage_context.persist(persist_dir=INDEX_DIR)
-        print(f"✅ Índice construído com {len(docs)} documentos.")
-        return index
+        atualizar_indice([Path(TRANSCRICOES_PATH)])
+        path = index_store.current_version_dir()
+    print(f"📁 Índice encontrado. Carregando do disco ({path})...")
+    return load_vector_index(path)
+
+def load_vector_index(path: Path):
+    """Carrega o índice persistido em `path`, com o vector store de VECTOR_STORE."""
+    vector_store = None
+    if VECTOR_STORE == "int8":
+        from quantized_store import Int8VectorStore
+
+        vector_store = Int8VectorStore.from_persist_dir(path)
+        if vector_store is None:
+            print("⚠️ Versão sem vetores int8 (rode o generate_index). Usando o SimpleVectorStore.")
+    storage_context = StorageContext.from_defaults(persist_dir=str(path), vector_store=vector_store)
+    return load_index_from_storage(storage_context)
+
+def load_lexical_index(path: Path, vector_index) -> LexicalIndex:
+    """BM25 salvo com a versão; versões antigas (sem o arquivo) constroem em memória."""
+    lexical = LexicalIndex.load(path)
+    if lexical is None:
+        print("🔤 Índice lexical não encontrado nesta versão. Construindo a partir do docstore...")
+        lexical = LexicalIndex.from_docstore(vector_index.docstore)
+    return lexical
+
+_METRIC_INDEX_INFO = metrics.gauge("index_info", "Versão do índice vetorial em uso (valor sempre 1)")
+_METRIC_LOAD_SECONDS = metrics.gauge("index_load_seconds", "Tempo da última carga do índice")
+_METRIC_LOADED_AT = metrics.gauge("index_loaded_timestamp_seconds", "Quando a versão atual do índice foi carregada")
+_METRIC_RELOADS = metrics.counter("index_reloads_total", "Recargas do índice em execução, por resultado")
+
+def _registrar_carga(version: Optional[str], segundos: float):
+    _METRIC_INDEX_INFO.clear()
+    _METRIC_INDEX_INFO.set(1, version=version or "legado")
+    _METRIC_LOAD_SECONDS.set(segundos)
+    _METRIC_LOADED_AT.set(time.time())
 
 # ⚡ Inicializa o índice na importação deste módulo
+_inicio = time.perf_counter()
 index = load_or_build_index()
+index_version: Optional[str] = index_store.current_version()
+lexical_index = load_lexical_index(index_store.version_dir(index_version), index)
+_registrar_carga(index_version, time.perf_counter() - _inicio)
+
+_reload_lock = threading.Lock()
+
+def reload_index() -> dict:
+    """
+    Carrega a versão apontada por storage/CURRENT e troca o índice global.
+
+    A carga roda fora do caminho das buscas; a troca é só a reatribuição de `index`.
+    Buscas em andamento seguram a referência antiga até terminar, e a versão antiga
+    é liberada quando a última delas solta a referência.
+    Retorna {"reloaded", "version", "load_seconds"}.
+    """
+    global index, lexical_index, index_version
+    with _reload_lock:
+        version = index_store.current_version()
+        if version == index_version:
+            return {"reloaded": False, "version": index_version, "load_seconds": 0.0}
+        path = index_store.version_dir(version)
+        if not index_store.has_index(path):
+            _METRIC_RELOADS.inc(resultado="erro")
+            raise FileNotFoundError(f"Versão {version} do índice não encontrada em {path}")
+
+        inicio = time.perf_counter()
+        try:
+            novo = load_vector_index(path)
+            novo_lexical = load_lexical_index(path, novo)
+        except Exception:
+            _METRIC_RELOADS.inc(resultado="erro")
+            raise
+        segundos = time.perf_counter() - inicio
+
+        index, lexical_index, index_version = novo, novo_lexical, version
+        del novo, novo_lexical
+        _registrar_carga(version, segundos)
+        _METRIC_RELOADS.inc(resultado="ok")
+        gc.collect()  # os vetores da versão antiga são grandes; não espera o próximo ciclo
+        print(f"🔄 Índice trocado para a versão {version} em {segundos:.2f}s")
+        return {"reloaded": True, "version": version, "load_seconds": round(segundos, 3)}
+
+def embed_question(question: str) -> list[float]:
+    """
+    Embedding da pergunta (MiniLM). Calcule uma vez por turno e repasse para
+    retrieve_relevant_context e para o classificador de intenção.
+    """
+    return Settings.embed_model.get_query_embedding(question)
+
+_batcher: Optional[MicroBatcher] = None
+
+async def embed_question_async(question: str) -> list[float]:
+    """
+    Igual a embed_question, mas via micro-batcher: perguntas que chegam juntas
+    (vários WebSockets) viram um só forward pass, fora do event loop.
+    """
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(embed_queries_batch(Settings.embed_model))
+    return await _batcher.embed(question)
+
+def lexical_fast_path(question: str) -> bool:
+    """
+    True quando a pergunta é uma busca por termo exato: poucos termos, todos no
+    vocabulário do BM25. Nesse caso a busca dispensa o modelo de embedding.
+    """
+    if RETRIEVAL_MODE == "lexical":
+        return True
+    if RETRIEVAL_MODE != "hybrid" or LEXICAL_FAST_PATH_MAX_TERMS <= 0:
+        return False
+    termos = set(tokenizar(question))
+    lexical = lexical_index
+    return 0 < len(termos) <= LEXICAL_FAST_PATH_MAX_TERMS and all(lexical.conhece(t) for t in termos)
+
+def _fundir_rrf(listas: list[list[str]], top_k: int) -> list[tuple[str, float]]:
+    """Reciprocal rank fusion: soma 1/(RRF_K + posição) de cada lista."""
+    scores: dict[str, float] = {}
+    for lista in listas:
+        for posicao, node_id in enumerate(lista, start=1):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (RRF_K + posicao)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+def retrieve_nodes(
+    question: str,
+    top_k: int = 3,
+    query_embedding: Optional[list[float]] = None
+) -> list[NodeWithScore]:
+    """
+    Os `top_k` chunks para `question`, segundo RETRIEVAL_MODE.
+    No modo híbrido, BM25 e vetorial trazem `top_k * HYBRID_CANDIDATES_FACTOR`
+    candidatos cada e a ordem final vem do RRF (score = RRF).
+    """
+    return _buscar(question, top_k, query_embedding)[0]
+
+def _buscar(
+    question: str,
+    top_k: int,
+    query_embedding: Optional[list[float]]
+) -> tuple[list[NodeWithScore], dict[str, float]]:
+    """retrieve_nodes + similaridade de cosseno (crua) de cada chunk achado pelo lado vetorial."""
+    # Referências locais: uma recarga do índice no meio da busca não afeta esta chamada
+    vetorial, lexical = index, lexical_index
+
+    # RETRIEVAL_MODE=lexical nunca consulta o vector store, mesmo com embedding pronto;
+    # nos outros modos, o atalho lexical só vale quando o embedding não foi calculado
+    if RETRIEVAL_MODE == "lexical" or (query_embedding is None and lexical_fast_path(question)):
+        print("🔎 DEBUG — Busca só lexical (termo exato)")
+        hits = lexical.buscar(question, top_k)
+        return [
+            NodeWithScore(node=node, score=score)
+            for node_id, score in hits
+            if (node := vetorial.docstore.get_node(node_id, raise_error=False)) is not None
+        ], {}
+
+    if RETRIEVAL_MODE == "vector":
+        retriever = vetorial.as_retriever(similarity_top_k=top_k)
+        nodes = retriever.retrieve(QueryBundle(query_str=question, embedding=query_embedding))
+        return nodes, {n.node.node_id: n.score or 0.0 for n in nodes}
+
+    candidatos = top_k * max(HYBRID_CANDIDATES_FACTOR, 1)
+    retriever = vetorial.as_retriever(similarity_top_k=candidatos)
+    por_vetor = {n.node.node_id: n for n in retriever.retrieve(QueryBundle(query_str=question, embedding=query_embedding))}
+    por_lexico = [node_id for node_id, _ in lexical.buscar(question, candidatos)]
+
+    resultado = []
+    for node_id, score in _fundir_rrf([list(por_vetor), por_lexico], top_k):
+        node = por_vetor[node_id].node if node_id in por_vetor else vetorial.docstore.get_node(node_id, raise_error=False)
+        if node is not None:
+            resultado.append(NodeWithScore(node=node, score=score))
+    return resultado, {node_id: n.score or 0.0 for node_id, n in por_vetor.items()}
+
+def _chunk_bloqueado(node) -> Optional[str]:
+    """Motivo para deixar o chunk fora do contexto, ou None se ele pode entrar."""
+    # Flags pré-calculadas no build (chunk_flags); só recalcula se as regras mudaram
+    flags = flags_do_node(node)
+    if FLAG_VAZIO in flags:
+        return "vazio"
+    if "incerteza" in flags:
+        return "frase de incerteza"
+    if "proibido" in flags:
+        return "termo proibido"
+    return None
+
+def retrieve_scored_context(
+    question: str,
+    top_k: int = 3,
+    query_embedding: Optional[list[float]] = None
+) -> list[NodeWithScore]:
+    """
+    Busca `RERANK_CANDIDATES` candidatos, descarta os chunks bloqueados (um a um,
+    sem derrubar o contexto inteiro) e devolve até `top_k` reordenados pelo
+    reranker, com score (0..1) acima de RERANK_MIN_SCORE. O score é absoluto
+    (cobertura dos termos + cosseno cru), então perguntas fora do tema voltam vazias.
+    """
+    lexical = lexical_index
+    candidatos, similaridades = _buscar(question, max(top_k, RERANK_CANDIDATES), query_embedding)
+
+    aceitos = []
+    for candidato in candidatos:
+        motivo = _chunk_bloqueado(candidato.node)
+        if motivo:
+            print(f"🔎 DEBUG — Chunk {candidato.node.node_id[:8]} descartado: {motivo}")
+            continue
+        aceitos.append(candidato)
+
+    return rerank(question, aceitos, top_k, lexical, similaridades=similaridades)
+
+def _expandir_vizinhos(nodes: list, chunk_size: int, docstore) -> list[list]:
+    """
+    Expande cada trecho encontrado para os chunks vizinhos (PREVIOUS/NEXT do build)
+    enquanto couber em `chunk_size` tokens (contar_tokens, o mesmo tokenizador que
+    dimensionou os chunks no build), e junta trechos do mesmo arquivo que se
+    tocam. Retorna grupos de chunks em ordem de documento, na ordem de relevância.
+    """
+    grupos: list[list] = []
+    for node in nodes:
+        grupo = [node]
+        tokens = contar_tokens(node.get_content())
+        lados = {"anterior": True, "proximo": True}
+        while any(lados.values()):
+            for lado in ("anterior", "proximo"):
+                if not lados[lado]:
+                    continue
+                ponta = grupo[0] if lado == "anterior" else grupo[-1]
+                info = ponta.prev_node if lado == "anterior" else ponta.next_node
+                vizinho = docstore.get_node(info.node_id, raise_error=False) if info else None
+                custo = contar_tokens(vizinho.get_content()) if vizinho is not None else 0
+                if vizinho is None or tokens + custo > chunk_size or _chunk_bloqueado(vizinho):
+                    lados[lado] = False
+                    continue
+                tokens += custo
+                if lado == "anterior":
+                    grupo.insert(0, vizinho)
+                else:
+                    grupo.append(vizinho)
+        grupos.append(grupo)
+
+    # Grupos do mesmo arquivo que se sobrepõem ou são contíguos viram um só
+    # (fica na posição do mais relevante)
+    def faixa(grupo):
+        inicio, fim = grupo[0].metadata.get("chunk_indice"), grupo[-1].metadata.get("chunk_indice")
+        return grupo[0].metadata.get("file_path"), inicio, fim
+
+    juntos: list[list] = []
+    for grupo in grupos:
+        arquivo, inicio, fim = faixa(grupo)
+        for existente in juntos:
+            e_arquivo, e_inicio, e_fim = faixa(existente)
+            if None not in (inicio, e_inicio) and arquivo == e_arquivo \
+                    and inicio <= e_fim + 1 and e_inicio <= fim + 1:
+                por_id = {n.node_id: n for n in existente + grupo}
+                existente[:] = sorted(por_id.values(), key=lambda n: n.metadata["chunk_indice"])
+                break
+        else:
+            juntos.append(grupo)
+    return juntos
+
+def _texto_do_grupo(grupo: list) -> str:
+    """Concatena chunks vizinhos sem repetir a sobreposição (pelos offsets em bytes)."""
+    partes = []
+    fim_anterior = None
+    for node in grupo:
+        texto = node.get_content()
+        inicio = node.metadata.get("inicio_byte")
+        if fim_anterior is not None and inicio is not None and inicio < fim_anterior:
+            texto = texto.encode("utf-8")[fim_anterior - inicio:].decode("utf-8", errors="ignore").strip()
+        if texto:
+            partes.append(texto)
+        fim_anterior = node.metadata.get("fim_byte", fim_anterior)
+    return "\n".join(partes)
 
 def retrieve_relevant_context(
     question: str,
     top_k: int = 3,
-    chunk_size: int = 512
+    chunk_size: int = 512,
+    query_embedding: Optional[list[float]] = None
 ) -> str:
     """
     Busca no índice até `top_k` trechos que respondam à `question`.
-    Usa `chunk_size` para controlar o tamanho dos blocos de texto.
+    `chunk_size` é o orçamento em tokens de cada trecho: o chunk encontrado é
+    expandido para os vizinhos no arquivo até esse limite (0 desliga a expansão).
+    Se `query_embedding` vier pronto (embed_question), não recalcula o embedding;
+    se vier None e a pergunta for de termo exato (lexical_fast_path), não embeda.
     Retorna string vazia se não encontrar algo relevante.
     """
     # DEBUG: confira nos logs qual pergunta chegou
     print("🔎 DEBUG — Pergunta para contexto:", question)
 
-    # Usa retriever em vez de query_engine (não precisa de LLM)
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    nodes = retriever.retrieve(question)
-
-    # Combina os textos dos nodes recuperados
+    docstore = index.docstore
+    nodes = retrieve_scored_context(question, top_k=top_k, query_embedding=query_embedding)
     if not nodes:
-        print("🔎 DEBUG — Nenhum nó recuperado")
-        return ""
-
-    response_str = "\n\n".join([node.text for node in nodes])
-    # DEBUG: confira o texto bruto retornado
-    print("🔎 DEBUG — Contexto bruto retornado:", response_str[:200] + "...")
-
-    lower = response_str.lower()
-    # se vazio ou sem sentido
-    if not lower or lower in ("none", "null"):
-        print("🔎 DEBUG — Contexto vazio após normalização")
+        print("🔎 DEBUG — Nenhum chunk acima do score mínimo")
         return ""
 
-    # bloqueia respostas genéricas
-    for frase in ("não tenho certeza", "desculpe", "não sei"):
-        if frase in lower:
-            print("🔎 DEBUG — Contexto bloqueado por frase de incerteza")
-            return ""
-
-    # filtra termos fora de escopo
-    proibidos = [
-        "instagram", "vídeos para instagram", "celular para gravar", "smartphone",
-        "tiktok", "post viral", "gravar vídeos", "microfone", "câmera",
-        "edição de vídeo", "hashtags", "stories", "marketing de conteúdo",
-        "produção de vídeo", "influencer"
-    ]
-    if any(tp in lower for tp in proibidos):
-        print("🔎 DEBUG — Contexto bloqueado por termo proibido")
-        return ""
+    print("🔎 DEBUG — Scores:", ", ".join(f"{n.score:.2f}" for n in nodes))
+    grupos = _expandir_vizinhos([n.node for n in nodes], chunk_size, docstore)
+    response_str = "\n\n".join(_texto_do_grupo(grupo) for grupo in grupos)
 
     # DEBUG: contexto aprovado
-    print("🔎 DEBUG — Contexto final aceito:", response_str)
+    print("🔎 DEBUG — Contexto final aceito:", response_str[:200] + "...")
     return response_str
@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só gzip
+    brotli = None
+
+# 📦 Arquivos estáticos do chat-simples (css/js), montados uma vez na subida do servidor:
+#   - URL com hash do conteúdo (/assets/style.3f2a9c1b7d4e.css), servida com
+#     Cache-Control immutable: o navegador só baixa de novo quando o arquivo muda
+#   - variantes gzip/brotli pré-calculadas, escolhidas pelo Accept-Encoding
+#   - ETag + 304 também para as páginas HTML (que apontam para as URLs com hash)
+#   - STATIC_BUNDLE_JS=1: cada sequência de <script src="../js/..."> de uma página vira
+#     um único bundle.<hash>.js (mesma ordem de execução)
+STATIC_BUNDLE_JS = os.getenv("STATIC_BUNDLE_JS", "1") == "1"
+ASSETS_PREFIX = "/assets/"
+
+# Abaixo disso a compressão não compensa
+MIN_COMPRESS_BYTES = 1024
+
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+
+_REF_RE = re.compile(r'(?P<attr>src|href)="(?:\.\./|/)(?P<dir>css|js)/(?P<nome>[^"?#]+)"')
+_SCRIPTS_RE = re.compile(r'(?:[ \t]*<script src="(?:\.\./|/)js/[^"?#]+"></script>[ \t]*\r?\n){2,}')
+_SCRIPT_SRC_RE = re.compile(r'src="(?:\.\./|/)js/([^"?#]+)"')
+
+@dataclass
+class Asset:
+    conteudo: bytes
+    media_type: str
+    etag: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+def _hash(conteudo: bytes) -> str:
+    return hashlib.sha256(conteudo).hexdigest()[:12]
+
+def _criar_asset(conteudo: bytes, nome: str) -> Asset:
+    media_type = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+    if media_type in ("application/javascript", "application/json"):
+        media_type += "; charset=utf-8"   # text/* já recebe charset do Starlette
+    asset = Asset(conteudo, media_type, f'"{_hash(conteudo)}"')
+    if len(conteudo) >= MIN_COMPRESS_BYTES:
+        comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+        if len(comprimido) < len(conteudo):
+            asset.gzip = comprimido
+        if brotli is not None:
+            comprimido = brotli.compress(conteudo, quality=11)
+            if len(comprimido) < len(conteudo):
+                asset.br = comprimido
+    return asset
+
+def _nome_com_hash(nome: str, conteudo: bytes) -> str:
+    base, ext = os.path.splitext(nome)
+    return f"{base}.{_hash(conteudo)}{ext}"
+
+class AssetsEstaticos:
+    """Manifesto em memória: URLs com hash dos css/js e páginas HTML reescritas."""
+
+    def __init__(self, chat_dir: Path, bundle_js: bool = STATIC_BUNDLE_JS):
+        self.chat_dir = chat_dir
+        self.bundle_js = bundle_js
+        self.assets: dict[str, Asset] = {}      # nome com hash -> asset
+        self.paginas: dict[str, Asset] = {}     # nome do .html -> página reescrita
+        self.urls: dict[str, str] = {}          # "js/app.js" -> "/assets/app.<hash>.js"
+
+    def construir(self) -> "AssetsEstaticos":
+        for pasta in ("css", "js"):
+            for arquivo in sorted((self.chat_dir / pasta).glob("*")):
+                if arquivo.is_file():
+                    conteudo = arquivo.read_bytes()
+                    nome = _nome_com_hash(arquivo.name, conteudo)
+                    self.assets[nome] = _criar_asset(conteudo, nome)
+                    self.urls[f"{pasta}/{arquivo.name}"] = ASSETS_PREFIX + nome
+        for pagina in sorted((self.chat_dir / "html").glob("*.html")):
+            html = pagina.read_text(encoding="utf-8")
+            self.paginas[pagina.name] = _criar_asset(self._reescrever(html).encode("utf-8"), pagina.name)
+        return self
+
+    def _bundle(self, nomes: list[str]) -> Optional[str]:
+        partes = []
+        for nome in nomes:
+            arquivo = self.chat_dir / "js" / nome
+            if not arquivo.is_file():
+                return None
+            partes.append(f"/* {nome} */\n".encode("utf-8") + arquivo.read_bytes().rstrip() + b"\n;\n")
+        conteudo = b"".join(partes)
+        nome = _nome_com_hash("bundle.js", conteudo)
+        self.assets.setdefault(nome, _criar_asset(conteudo, nome))
+        return ASSETS_PREFIX + nome
+
+    def _reescrever(self, html: str) -> str:
+        if self.bundle_js:
+            def juntar(m: re.Match) -> str:
+                url = self._bundle(_SCRIPT_SRC_RE.findall(m.group(0)))
+                if url is None:
+                    return m.group(0)
+                recuo = m.group(0)[:len(m.group(0)) - len(m.group(0).lstrip(" \t"))]
+                return f'{recuo}<script src="{url}"></script>\n'
+            html = _SCRIPTS_RE.sub(juntar, html)
+
+        def trocar(m: re.Match) -> str:
+            url = self.urls.get(f"{m.group('dir')}/{m.group('nome')}")
+            return f'{m.group("attr")}="{url}"' if url else m.group(0)
+        return _REF_RE.sub(trocar, html)
+
+    @property
+    def nbytes(self) -> dict[str, int]:
+        todos = list(self.assets.values()) + list(self.paginas.values())
+        return {
+            "original": sum(len(a.conteudo) for a in todos),
+            "gzip": sum(len(a.gzip or a.conteudo) for a in todos),
+            "br": sum(len(a.br or a.gzip or a.conteudo) for a in todos),
+        }
+
+def responder(request: Request, asset: Asset, cache_control: str) -> Response:
+    """Resposta com a melhor variante comprimida aceita pelo cliente e ETag/304 (por variante)."""
+    aceitas = {
+        parte.split(";")[0].strip().lower()
+        for parte in request.headers.get("accept-encoding", "").split(",")
+    }
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    corpo, etag = asset.conteudo, asset.etag
+    if asset.br is not None and "br" in aceitas:
+        corpo, etag = asset.br, asset.etag[:-1] + '-br"'
+        headers["Content-Encoding"] = "br"
+    elif asset.gzip is not None and "gzip" in aceitas:
+        corpo, etag = asset.gzip, asset.etag[:-1] + '-gz"'
+        headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = etag
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(corpo))
+        return Response(status_code=200, headers=headers, media_type=asset.media_type)
+    return Response(content=corpo, headers=headers, media_type=asset.media_type)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from starlette.websockets import WebSocketDisconnect
+
+import metrics
+
+try:
+    import msgpack
+except ImportError:  # opcional: sem ele, só o subprotocolo JSON é aceito
+    msgpack = None
+
+# 📦 Coalescência dos text_chunk do /ws/chat: o primeiro pedaço de cada resposta sai na
+# hora (tempo até o primeiro token igual); os seguintes se acumulam por até
+# WS_COALESCE_MS ou WS_COALESCE_BYTES e saem num único frame. WS_COALESCE_MS=0 desliga.
+WS_COALESCE_MS = float(os.getenv("WS_COALESCE_MS", "40"))
+WS_COALESCE_BYTES = int(os.getenv("WS_COALESCE_BYTES", "2048"))
+
+# 🗜️ Subprotocolos do /ws/chat (Sec-WebSocket-Protocol, na ordem de preferência do cliente):
+#   sem subprotocolo: JSON, e o "result" final repete o texto inteiro (clientes antigos)
+#   "chat.v2.json":    JSON; o "result" não repete o texto que já chegou em text_chunk
+#   "chat.v2.msgpack": como o v2.json, mas frames binários MessagePack nos dois sentidos
+# A compressão permessage-deflate é negociada pelo uvicorn (--ws-per-message-deflate).
+SUBPROTOCOLO_JSON = "chat.v2.json"
+SUBPROTOCOLO_MSGPACK = "chat.v2.msgpack"
+
+def escolher_subprotocolo(websocket) -> Optional[str]:
+    """Primeiro subprotocolo pedido pelo cliente que o servidor suporta (ou None)."""
+    suportados = {SUBPROTOCOLO_JSON}
+    if msgpack is not None:
+        suportados.add(SUBPROTOCOLO_MSGPACK)
+    for pedido in websocket.scope.get("subprotocols", []):
+        if pedido in suportados:
+            return pedido
+    return None
+
+_METRIC_FRAMES = metrics.counter("ws_frames_total", "Frames enviados pelo /ws/chat, por tipo")
+_METRIC_BYTES = metrics.counter("ws_bytes_total", "Bytes de payload enviados pelo /ws/chat, por tipo")
+_METRIC_TURN_FRAMES = metrics.histogram(
+    "ws_turn_frames", "Frames por resposta no /ws/chat", [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+)
+_METRIC_TURN_BYTES = metrics.histogram(
+    "ws_turn_bytes", "Bytes por resposta no /ws/chat",
+    [1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000],
+)
+
+class EnviadorFrames:
+    """
+    Serializa (JSON ou MessagePack, conforme o subprotocolo) e envia os frames de um
+    WebSocket, um por vez e na ordem de chamada (o keepalive e o flush por tempo enviam
+    de outras tasks), contando frames e bytes do turno atual.
+    """
+
+    def __init__(self, websocket, subprotocolo: Optional[str] = None):
+        self.websocket = websocket
+        self.binario = subprotocolo == SUBPROTOCOLO_MSGPACK
+        # Clientes v2 montam o texto final com os text_chunk recebidos
+        self.resultado_sem_texto = subprotocolo in (SUBPROTOCOLO_JSON, SUBPROTOCOLO_MSGPACK)
+        self._lock = asyncio.Lock()
+        self.frames = 0
+        self.bytes = 0
+
+    async def enviar(self, mensagem: dict) -> None:
+        tipo = mensagem.get("type", "")
+        if self.binario:
+            payload = msgpack.packb(mensagem, use_bin_type=True)
+            tamanho = len(payload)
+            async with self._lock:
+                await self.websocket.send_bytes(payload)
+        else:
+            # Mesmo JSON compacto do send_json do Starlette
+            payload = json.dumps(mensagem, separators=(",", ":"), ensure_ascii=False)
+            tamanho = len(payload.encode("utf-8"))
+            async with self._lock:
+                await self.websocket.send_text(payload)
+        self.frames += 1
+        self.bytes += tamanho
+        _METRIC_FRAMES.inc(tipo=tipo)
+        _METRIC_BYTES.inc(tamanho, tipo=tipo)
+
+    async def receber(self) -> dict:
+        """Próxima mensagem do cliente: frame de texto JSON ou binário MessagePack."""
+        mensagem = await self.websocket.receive()
+        if mensagem["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(mensagem.get("code", 1000))
+        if mensagem.get("bytes") is not None:
+            if msgpack is None:
+                raise ValueError("frame binário sem suporte a MessagePack")
+            dados = msgpack.unpackb(mensagem["bytes"], raw=False)
+        else:
+            dados = json.loads(mensagem.get("text") or "null")
+        if not isinstance(dados, dict):
+            raise ValueError("mensagem do cliente não é um objeto")
+        return dados
+
+    def inicio_turno(self) -> None:
+        self.frames = 0
+        self.bytes = 0
+
+    def fim_turno(self) -> tuple[int, int]:
+        """Registra frames/bytes do turno nos histogramas e os devolve."""
+        _METRIC_TURN_FRAMES.observe(self.frames)
+        _METRIC_TURN_BYTES.observe(self.bytes)
+        return self.frames, self.bytes
+
+class TextCoalescer:
+    """
+    Junta pedaços de texto de uma resposta em frames text_chunk. Usar um por turno:
+    `await adicionar(texto)` a cada pedaço e `await flush()` antes do frame final.
+    """
+
+    def __init__(self, enviador: EnviadorFrames, window_ms: float = WS_COALESCE_MS,
+                 max_bytes: int = WS_COALESCE_BYTES):
+        self.enviador = enviador
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_bytes = max(max_bytes, 1)
+        self.pedacos = 0
+        self._buffer: list[str] = []
+        self._bytes_buffer = 0
+        self._timer: Optional[asyncio.Task] = None
+
+    async def adicionar(self, texto: str) -> None:
+        if not texto:
+            return
+        self.pedacos += 1
+        self._buffer.append(texto)
+        self._bytes_buffer += len(texto.encode("utf-8"))
+        if self.pedacos == 1 or self.window == 0 or self._bytes_buffer >= self.max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_apos_janela())
+
+    async def _flush_apos_janela(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self._enviar_buffer()
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._enviar_buffer()
+
+    async def _enviar_buffer(self) -> None:
+        if not self._buffer:
+            return
+        texto = "".join(self._buffer)
+        self._buffer.clear()
+        self._bytes_buffer = 0
+        await self.enviador.enviar({"type": "text_chunk", "content": texto})
+
+    def fechar(self) -> None:
+        """Descarta o flush pendente (turno abortado)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -337,6 +337,8 @@ class ClaudeChatApp {
                 if (e.key === 'Enter' && !e.shiftKey) {
                     e.preventDefault();
                     this.sendMessage();
+                } else if (e.key === 'Escape') {
+                    this.cancelCurrentRequest();
                 }
             });
 
@@ -394,7 +396,8 @@ class ClaudeChatApp {
 
         this.updateStatus('connecting');
 
-        this.ws = new WebSocket(wsUrl);
+        // chat.v2.json: o "result" final não repete o texto já recebido nos text_chunk
+        this.ws = new WebSocket(wsUrl, ['chat.v2.json']);
 
         this.ws.onopen = () => {
             const wasReconnecting = this.hasConnectedOnce && this.connectionState === 'disconnected';
@@ -500,6 +503,10 @@ class ClaudeChatApp {
                 break;
 
             case 'text_chunk':
+                if (this.typingTextDefault !== undefined) {
+                    const typingText = this.typingIndicator?.querySelector('.typing-text');
+                    if (typingText) typingText.textContent = this.typingTextDefault;
+                }
                 this.appendToCurrentMessage(data.content || '');
                 break;
 
@@ -517,6 +524,14 @@ class ClaudeChatApp {
                 });
                 break;
 
+            case 'queued':
+                this.showQueuePosition(data.position);
+                break;
+
+            case 'cancelled':
+                this.handleRequestInterrupted();
+                break;
+
             case 'error':
                 this.showError(data.error || 'Erro desconhecido');
                 window.debugVisual?.log('error', `❌ Erro: ${data.error || 'Sem detalhes'}`);
@@ -1074,9 +1089,23 @@ class ClaudeChatApp {
         this.scrollToBottom({ behavior: 'smooth' });
     }
 
+    showQueuePosition(position) {
+        // Servidor cheio: a pergunta espera na fila de gerações
+        const typingText = this.typingIndicator?.querySelector('.typing-text');
+        if (!typingText) return;
+        if (this.typingTextDefault === undefined) {
+            this.typingTextDefault = typingText.textContent;
+        }
+        typingText.textContent = `Na fila: posição ${position}...`;
+    }
+
     hideTypingIndicator() {
         if (this.typingIndicator) {
             this.typingIndicator.style.display = 'none';
+            const typingText = this.typingIndicator.querySelector('.typing-text');
+            if (typingText && this.typingTextDefault !== undefined) {
+                typingText.textContent = this.typingTextDefault;
+            }
         }
         this.stopResponseTimer();
     }
@@ -1207,6 +1236,13 @@ class ClaudeChatApp {
         });
     }
 
+    cancelCurrentRequest() {
+        // Pede ao servidor para interromper a resposta em andamento (e o LLM)
+        if (!this.ws || this.ws.readyState !== WebSocket.OPEN) return;
+        if (!this.currentMessage && !this.pendingAssistantContent) return;
+        this.ws.send(JSON.stringify({ type: 'cancel' }));
+    }
+
     handleRequestInterrupted() {
         // Verifica se há uma mensagem em processamento
         if (!this.currentMessage && !this.pendingAssistantContent) {
@@ -177,7 +177,8 @@ class SessionManager {
         statusText.innerHTML = '<span class="spinner"></span> Gerando resumo...';
 
         try {
-            const response = await fetch(`/sessions/${this.currentSessionId}/summary`, {
+            // Enfileira o resumo e acompanha o job (não segura a requisição durante o LLM)
+            const response = await fetch(`/sessions/${this.currentSessionId}/summary/job`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -185,7 +186,15 @@ class SessionManager {
                 body: JSON.stringify({ regenerate: false }),
             });
 
-            const data = await response.json();
+            const submitted = await response.json();
+            if (!submitted.success) {
+                throw new Error(submitted.error || 'Erro ao gerar resumo');
+            }
+
+            const job = await this.waitForJob(submitted.job, statusText);
+            const data = job.status === 'done'
+                ? { success: true, summary: job.result && job.result.summary }
+                : { success: false, error: job.error };
 
             if (data.success && data.summary) {
                 document.getElementById('summary-textarea').value = data.summary;
@@ -203,6 +212,23 @@ class SessionManager {
         }
     }
 
+    async waitForJob(job, statusText, intervalMs = 1000) {
+        // Polling de GET /jobs/{id} até o job concluir ou falhar
+        while (job.status === 'queued' || job.status === 'running') {
+            if (job.status === 'running' && job.progress > 0) {
+                statusText.innerHTML = `<span class="spinner"></span> Gerando resumo... ${Math.round(job.progress * 100)}%`;
+            }
+            await new Promise((resolve) => setTimeout(resolve, intervalMs));
+            const response = await fetch(`/jobs/${job.id}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.error || 'Job não encontrado');
+            }
+            job = data.job;
+        }
+        return job;
+    }
+
     async saveMetadata() {
         if (!this.currentSessionId) {
             alert('Nenhuma sessão selecionada');
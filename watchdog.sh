@@ -10,7 +10,7 @@ while true; do
     if ! curl -s -o /dev/null -w "" http://localhost:$PORT/docs 2>/dev/null; then
         echo "[$(date)] Backend caiu. Reiniciando..." >> /home/dados/assistente-dados/watchdog.log
         cd "$DIR"
-        nohup $VENV -m uvicorn main:app --host 0.0.0.0 --port $PORT >> "$LOG" 2>&1 &
+        nohup $VENV -m uvicorn main:app --host 0.0.0.0 --port $PORT --ws websockets --ws-per-message-deflate true >> "$LOG" 2>&1 &
         sleep 5
     fi
     sleep 30